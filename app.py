@@ -1,83 +1,157 @@
-from flask import Flask, render_template, request, jsonify, send_from_directory
-import json
-import re
-import os
+from flask import Flask, render_template, request, jsonify, send_from_directory, Response, stream_with_context, g
+from flask.json.provider import DefaultJSONProvider
 import shutil
 from datetime import datetime
-from pathlib import Path
 import subprocess
 import sys
+import time
+
+import collab
+import json_codec
+import layout_ops
+import metrics
+import revisions
+import tag_index
+import trigram_index
+from core.storage import (
+    BASE_DIR, INVENTORY_FILE, init_storage, load_inventory, save_inventory, inventory_lock,
+    get_page_dir, get_layout_file, load_layout, save_layout, get_layout_version, page_lock,
+    write_layout, generate_pages_metadata, SAVE_STAGE_DURATION
+)
+from core.render import CUSTOM_ASSET_PATTERN, generate_html, html_cache, slugify, _component_html_cache
+
+class CodecJSONProvider(DefaultJSONProvider):
+    """jsonify() et request.json via json_codec (orjson/msgspec si installés)"""
+
+    def dumps(self, obj, **kwargs):
+        try:
+            return json_codec.dumps(obj, sort_keys=self.sort_keys)
+        except TypeError:
+            # Dates, dataclasses... : sérialisation par défaut de Flask
+            return super().dumps(obj, **kwargs)
 
-try:
-    from slugify import slugify
-except ImportError:
-    import re
-    def slugify(text):
-        text = text.lower()
-        text = re.sub(r'[^\w\s-]', '', text)
-        text = re.sub(r'[-\s]+', '-', text)
-        return text.strip('-')
+    def loads(self, s, **kwargs):
+        return json_codec.loads(s)
 
 app = Flask(__name__)
+app.json = CodecJSONProvider(app)
 app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max pour vidéos
 
-# Configuration des chemins
-BASE_DIR = Path(__file__).parent
-PAGES_DIR = BASE_DIR / 'pages'
-DATA_DIR = BASE_DIR / 'data'
-STATIC_DIR = BASE_DIR / 'static'
-INVENTORY_FILE = DATA_DIR / 'inventory.json'
+# Stockage et rendu : voir core/storage.py et core/render.py (sans Flask)
 
-# Initialisation des dossiers
-PAGES_DIR.mkdir(exist_ok=True)
-DATA_DIR.mkdir(exist_ok=True)
-STATIC_DIR.mkdir(exist_ok=True)
+# Canal temps réel entre éditeurs (SSE)
+live_channel = collab.Channel()
 
-if not INVENTORY_FILE.exists() or INVENTORY_FILE.stat().st_size == 0:
-    with open(INVENTORY_FILE, 'w', encoding='utf-8') as f:
-        json.dump([], f)
+# Index de trigrammes écrit par generate_wiki_pages.py (suggestions de la 404)
+did_you_mean_index = trigram_index.IndexLoader(BASE_DIR / 'wiki' / trigram_index.INDEX_FILENAME)
 
-# --- Helpers ---
+# Index des tags de tout l'inventaire (reconstruit quand inventory.json change)
+tags_index = tag_index.IndexLoader(INVENTORY_FILE)
 
-def load_inventory():
-    try:
-        with open(INVENTORY_FILE, 'r', encoding='utf-8') as f:
-            content = f.read().strip()
-            return json.loads(content) if content else []
-    except:
-        return []
+# Métriques Prometheus (exposées sur /metrics)
+REQUEST_DURATION = metrics.histogram(
+    'wiki_http_request_duration_seconds', "Durée des requêtes par route", ('endpoint', 'method'))
+REQUESTS_TOTAL = metrics.counter(
+    'wiki_http_requests_total', "Requêtes par route et code de statut", ('endpoint', 'status'))
+REGENERATIONS_TOTAL = metrics.counter(
+    'wiki_regenerations_total', "Exécutions de generate_wiki_pages.py", ('result',))
+UPLOAD_BYTES_TOTAL = metrics.counter(
+    'wiki_upload_bytes_total', "Octets reçus par upload", ('kind',))
+PAGE_CACHE_TOTAL = metrics.counter(
+    'wiki_page_cache_total', "Pages HTML servies depuis la mémoire ou relues", ('result',))
 
-def save_inventory(inventory):
-    with open(INVENTORY_FILE, 'w', encoding='utf-8') as f:
-        json.dump(inventory, f, indent=2, ensure_ascii=False)
+def create_app():
+    """
+    Point d'entrée des serveurs de production (voir wsgi.py / gunicorn.conf.py)
+    Compatible --preload : aucun thread ni fichier ouvert n'est conservé
+    """
+    init_storage()
+    return app
 
-def get_page_dir(slug):
-    """Retourne le dossier d'une page"""
-    return PAGES_DIR / slug
+# --- Helpers ---
 
-def get_layout_file(slug):
-    """Retourne le fichier layout.json d'une page"""
-    return get_page_dir(slug) / 'layout.json'
+def clean_tags(tags):
+    """Nettoie une liste de tags (lowercase, trim, dédupliquer, ordre stable)"""
+    return sorted(set([t.strip().lower() for t in tags if t.strip()]))
 
-def create_backup(slug):
-    """Crée une sauvegarde du layout"""
-    page_dir = get_page_dir(slug)
-    layout_file = get_layout_file(slug)
-    
-    if not layout_file.exists():
-        return
-    
-    backup_dir = page_dir / 'backups'
-    backup_dir.mkdir(exist_ok=True)
+def new_page_entry(title, inventory, tags=None, hidden=False):
+    """Entrée d'inventaire d'une nouvelle page (slug unique dans inventory)"""
+    slug = slugify(title)
     
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    backup_file = backup_dir / f'layout_{timestamp}.json'
-    shutil.copy(layout_file, backup_file)
+    # Éviter les doublons
+    existing = {p['slug'] for p in inventory}
+    if slug in existing:
+        suffix = len(inventory)
+        while f"{slug}-{suffix}" in existing:
+            suffix += 1
+        slug = f"{slug}-{suffix}"
+    
+    return {
+        "title": title,
+        "slug": slug,
+        "hidden_from_nav": hidden,
+        "created_at": datetime.now().isoformat(),
+        "tags": clean_tags(tags or [])
+    }
+
+def init_page_files(slug):
+    """
+    Crée le dossier d'une page et son layout vide
+    images/, assets/ et l'historique sont créés au premier fichier qui y est écrit
+    """
+    get_page_dir(slug).mkdir(parents=True, exist_ok=True)
     
-    # Garder seulement les 5 dernières
-    backups = sorted(backup_dir.glob('layout_*.json'), reverse=True)
-    for old_backup in backups[5:]:
-        old_backup.unlink()
+    # Créer le layout vide (au format de stockage courant)
+    save_layout(slug, [])
+
+def remove_page_files(slug):
+    """Supprime le dossier d'une page et ses entrées en cache"""
+    page_dir = get_page_dir(slug)
+    with page_lock(slug):
+        if page_dir.exists():
+            shutil.rmtree(page_dir)
+    _component_html_cache.pop(slug, None)
+    html_cache.invalidate(page_dir / 'index.html')
+
+def layout_etag(version):
+    """ETag d'une version de layout"""
+    return f'r{version}'
+
+def get_expected_version():
+    """
+    Version attendue par le client, lue dans l'en-tête If-Match
+    None si absent ou "*", -1 si l'ETag n'est pas une version connue
+    """
+    if not request.if_match or request.if_match.star_tag:
+        return None
+    for tag in request.if_match:
+        if tag.startswith('r') and tag[1:].isdigit():
+            return int(tag[1:])
+    return -1
+
+def merge_with_current(slug, base_version, ours):
+    """
+    Fusion à trois voies d'un layout proposé (dérivé de base_version)
+    avec le layout actuel. Retourne (layout, conflits) ou (None, None)
+    si la version de base n'est plus dans l'historique.
+    """
+    try:
+        base = revisions.load_revision(get_page_dir(slug), base_version)
+    except KeyError:
+        return None, None
+    return layout_ops.merge_layouts(base, ours, load_layout(slug))
+
+def conflict_response(slug, conflicts=None):
+    """Réponse 409 avec la version actuelle du layout"""
+    version = get_layout_version(slug)
+    response = jsonify({
+        "error": "Conflit d'édition" if conflicts else "Version obsolète",
+        "version": version,
+        "conflicts": conflicts or []
+    })
+    response.set_etag(layout_etag(version))
+    return response, 409
+
 
 def regenerate_wiki_pages():
     """
@@ -85,25 +159,74 @@ def regenerate_wiki_pages():
     Fonctionne même si le script échoue (graceful degradation)
     """
     try:
-        result = subprocess.run(
-            [sys.executable, 'generate_wiki_pages.py'],
-            capture_output=True,
-            text=True,
-            encoding='utf-8',
-            timeout=30
-        )
+        with SAVE_STAGE_DURATION.labels('subprocess').time():
+            result = subprocess.run(
+                [sys.executable, 'generate_wiki_pages.py'],
+                capture_output=True,
+                text=True,
+                encoding='utf-8',
+                timeout=30
+            )
+        
+        for generated in (BASE_DIR / 'wiki' / 'index.html', BASE_DIR / 'wiki' / '404.html', BASE_DIR / '404.html'):
+            html_cache.invalidate(generated)
         
         if result.returncode == 0:
+            REGENERATIONS_TOTAL.labels('success').inc()
             print("✅ Pages wiki régénérées")
             return True
         else:
+            REGENERATIONS_TOTAL.labels('error').inc()
             print(f"⚠️ Erreur génération wiki: {result.stderr}")
             return False
             
     except Exception as e:
+        REGENERATIONS_TOTAL.labels('error').inc()
         print(f"⚠️ Impossible de régénérer le wiki: {e}")
         return False
 
+# --- Métriques des requêtes ---
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        endpoint = request.endpoint or 'not_found'
+        REQUEST_DURATION.labels(endpoint, request.method).observe(time.perf_counter() - started)
+        REQUESTS_TOTAL.labels(endpoint, str(response.status_code)).inc()
+    return response
+
+def cached_html_response(path, status=200):
+    """
+    Réponse HTML depuis le cache mémoire (None si le fichier n'existe pas)
+    Les réponses 200 portent ETag / Last-Modified et gèrent les requêtes conditionnelles
+    """
+    entry = html_cache.peek(path)
+    if entry is not None:
+        PAGE_CACHE_TOTAL.labels('hit').inc()
+    else:
+        entry = html_cache.get(path)
+        if entry is None:
+            return None
+        PAGE_CACHE_TOTAL.labels('miss').inc()
+    
+    response = Response(entry.body, status=status, mimetype='text/html')
+    if status != 200:
+        return response
+    response.headers['ETag'] = entry.etag
+    response.headers['Last-Modified'] = entry.last_modified
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Métriques au format texte Prometheus"""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
 # --- Routes Pages (HTML) ---
 
 @app.route('/')
@@ -113,53 +236,53 @@ def dashboard():
 
 @app.errorhandler(404)
 def page_not_found(e):
-    root_404 = BASE_DIR / '404.html'
-    if root_404.exists():
-        with open(root_404, 'r', encoding='utf-8') as f:
-            return f.read(), 404
-    return "404", 404
+    """404.html avec les pages proches de l'URL demandée (même index que son script)"""
+    response = cached_html_response(BASE_DIR / '404.html', status=404)
+    if response is None:
+        return "404", 404
+    
+    index = did_you_mean_index.get()
+    query = trigram_index.path_query(request.path)
+    matches = index.search(query) if index is not None and query else []
+    if matches:
+        body = response.get_data(as_text=True).replace(
+            trigram_index.DID_YOU_MEAN_MARKER, trigram_index.render_matches_html(matches), 1)
+        response.set_data(body)
+    return response
 
 @app.route('/editor/<slug>')
 def editor(slug):
     page_dir = get_page_dir(slug)
-    layout_file = get_layout_file(slug)
     
     if not page_dir.exists():
         return "Page non trouvée", 404
     
-    layout = []
-    if layout_file.exists():
-        try:
-            with open(layout_file, 'r', encoding='utf-8') as f:
-                layout = json.load(f)
-        except:
-            layout = []
+    try:
+        layout = load_layout(slug)
+    except:
+        layout = []
     
-    return render_template('editor.html', slug=slug, layout=layout)
+    return render_template('editor.html', slug=slug, layout=layout, version=get_layout_version(slug))
 
 @app.route('/pages/<slug>/')
 @app.route('/wiki/<slug>')
 def viewer(slug):
     """Vue de consultation d'une page"""
-    page_dir = get_page_dir(slug)
-    index_file = page_dir / 'index.html'
-    
-    if not index_file.exists():
+    response = cached_html_response(get_page_dir(slug) / 'index.html')
+    if response is None:
+        if not get_page_dir(slug).exists():
+            return page_not_found(None)
         return "Page non trouvée. Sauvegardez-la dans l'éditeur pour la générer.", 404
-    
-    with open(index_file, 'r', encoding='utf-8') as f:
-        return f.read()
+    return response
     
 @app.route('/wiki/')
 @app.route('/wiki/index.html')
 def wiki_home():
     """Sert la page d'accueil statique du wiki"""
-    wiki_file = BASE_DIR / 'wiki' / 'index.html'
-    
     # Si le fichier existe, le servir
-    if wiki_file.exists():
-        with open(wiki_file, 'r', encoding='utf-8') as f:
-            return f.read()
+    response = cached_html_response(BASE_DIR / 'wiki' / 'index.html')
+    if response is not None:
+        return response
     
     # Sinon, retourner un message
     return """
@@ -204,38 +327,101 @@ def create_page():
     if not title:
         return jsonify({"error": "Titre requis"}), 400
     
-    slug = slugify(title)
-    inventory = load_inventory()
-    
-    # Éviter les doublons
-    if any(p['slug'] == slug for p in inventory):
-        slug = f"{slug}-{len(inventory)}"
-    
-    # Créer le dossier de la page
-    page_dir = get_page_dir(slug)
-    page_dir.mkdir(exist_ok=True)
-    (page_dir / 'images').mkdir(exist_ok=True)
-    (page_dir / 'assets' / 'js').mkdir(parents=True, exist_ok=True)
-    (page_dir / 'assets' / 'css').mkdir(parents=True, exist_ok=True)
+    with inventory_lock():
+        inventory = load_inventory()
+        new_page = new_page_entry(title, inventory)
+        
+        # Créer le dossier de la page
+        init_page_files(new_page['slug'])
+        
+        # Ajouter à l'inventaire
+        inventory.append(new_page)
+        save_inventory(inventory)
+    generate_pages_metadata()
+    regenerate_wiki_pages()
+    return jsonify(new_page)
+
+BATCH_OPS = ('create', 'update-tags', 'set-visibility', 'delete')
+
+def validate_batch_op(op):
+    """Message d'erreur si l'opération est mal formée, sinon None"""
+    if not isinstance(op, dict) or op.get('op') not in BATCH_OPS:
+        return f"type inconnu (attendu : {', '.join(BATCH_OPS)})"
+    if op['op'] == 'create':
+        if not isinstance(op.get('title'), str) or not op['title'].strip():
+            return "titre requis"
+    elif not isinstance(op.get('slug'), str):
+        return "slug requis"
+    if 'tags' in op and not (isinstance(op['tags'], list) and all(isinstance(t, str) for t in op['tags'])):
+        return "tags doit être une liste de chaînes"
+    if op['op'] == 'update-tags' and 'tags' not in op:
+        return "tags requis"
+    return None
+
+@app.route('/api/pages/batch', methods=['POST'])
+def batch_pages():
+    """
+    Applique plusieurs opérations sur les pages en une seule écriture de
+    l'inventaire, suivie d'une seule régénération :
+      {"op": "create", "title": "...", "tags": [...], "hidden": false}
+      {"op": "update-tags", "slug": "...", "tags": [...]}
+      {"op": "set-visibility", "slug": "...", "hidden": true}
+      {"op": "delete", "slug": "..."}
+    Tout ou rien : une opération invalide rejette le lot entier
+    """
+    ops = (request.json or {}).get('ops')
+    if not isinstance(ops, list) or not ops:
+        return jsonify({"error": "ops requis"}), 400
     
-    # Créer layout.json vide
-    with open(get_layout_file(slug), 'w', encoding='utf-8') as f:
-        json.dump([], f)
+    for index, op in enumerate(ops):
+        error = validate_batch_op(op)
+        if error:
+            return jsonify({"error": f"Opération {index} : {error}", "index": index}), 400
     
-    # Ajouter à l'inventaire
-    new_page = {
-        "title": title,
-        "slug": slug,
-        "hidden_from_nav": False,
-        "created_at": datetime.now().isoformat(),
-        "tags": []
-    }
+    with inventory_lock():
+        inventory = load_inventory()
+        original_slugs = {p['slug'] for p in inventory}
+        results = []
+        
+        # 1. Appliquer les opérations en mémoire (aucune écriture en cas d'erreur)
+        for index, op in enumerate(ops):
+            if op['op'] == 'create':
+                page = new_page_entry(op['title'].strip(), inventory, op.get('tags'), bool(op.get('hidden', False)))
+                inventory.append(page)
+                results.append({"op": "create", "slug": page['slug']})
+                continue
+            
+            page = next((p for p in inventory if p['slug'] == op['slug']), None)
+            if page is None:
+                return jsonify({"error": f"Opération {index} : page '{op['slug']}' non trouvée", "index": index}), 404
+            
+            if op['op'] == 'update-tags':
+                page['tags'] = clean_tags(op['tags'])
+                results.append({"op": "update-tags", "slug": page['slug'], "tags": page['tags']})
+            elif op['op'] == 'set-visibility':
+                page['hidden_from_nav'] = bool(op.get('hidden', False))
+                results.append({"op": "set-visibility", "slug": page['slug'], "hidden": page['hidden_from_nav']})
+            else:
+                inventory.remove(page)
+                results.append({"op": "delete", "slug": page['slug']})
+        
+        # 2. Dossiers : suppressions puis créations (un slug supprimé peut être réutilisé)
+        final_slugs = {p['slug'] for p in inventory}
+        deleted = {r['slug'] for r in results if r['op'] == 'delete'} & original_slugs
+        for slug in deleted:
+            remove_page_files(slug)
+        for result in results:
+            slug = result['slug']
+            if result['op'] == 'create' and slug in final_slugs and not get_page_dir(slug).exists():
+                init_page_files(slug)
+        
+        save_inventory(inventory)
     
-    inventory.append(new_page)
-    save_inventory(inventory)
+    # 3. Une seule régénération pour tout le lot
     generate_pages_metadata()
     regenerate_wiki_pages()
-    return jsonify(new_page)
+    
+    return jsonify({"success": True, "results": results, "pages": len(inventory)})
 
 @app.route('/api/pages/<slug>', methods=['GET'])
 def get_page(slug):
@@ -246,51 +432,60 @@ def get_page(slug):
     if not page:
         return jsonify({"error": "Page non trouvée"}), 404
     
-    layout_file = get_layout_file(slug)
-    layout = []
-    
-    if layout_file.exists():
-        with open(layout_file, 'r', encoding='utf-8') as f:
-            layout = json.load(f)
+    version = get_layout_version(slug)
+    if request.if_none_match.contains(layout_etag(version)):
+        return "", 304
     
-    return jsonify({
+    response = jsonify({
         **page,
-        "layout": layout
+        "layout": load_layout(slug),
+        "version": version
     })
+    response.set_etag(layout_etag(version))
+    return response
 
 @app.route('/api/pages/<slug>', methods=['PUT'])
 def update_page(slug):
     """Sauvegarde le layout d'une page"""
     data = request.json
     layout = data.get('layout', [])
+    expected = get_expected_version()
+    merged = False
     
-    # Créer un backup
-    create_backup(slug)
-    
-    # Sauvegarder le layout
-    layout_file = get_layout_file(slug)
-    with open(layout_file, 'w', encoding='utf-8') as f:
-        json.dump(layout, f, indent=2, ensure_ascii=False)
+    with page_lock(slug):
+        # If-Match : la version de départ doit être la version actuelle,
+        # sinon fusion à trois voies si les modifications ne se chevauchent pas
+        if expected is not None and expected != get_layout_version(slug):
+            layout, conflicts = merge_with_current(slug, expected, layout)
+            if layout is None or conflicts:
+                return conflict_response(slug, conflicts)
+            merged = True
+        
+        # Sauvegarder le layout (avec backup)
+        entry = write_layout(slug, layout)
+        
+        # Générer le HTML
+        generate_html(slug, layout)
     
-    # Générer le HTML
-    generate_html(slug, layout)
     generate_pages_metadata()
     regenerate_wiki_pages()
-    return jsonify({"success": True})
+    
+    response = jsonify({"success": True, "version": entry['rev'], "merged": merged})
+    response.set_etag(layout_etag(entry['rev']))
+    return response
 
 @app.route('/api/pages/<slug>', methods=['DELETE'])
 def delete_page(slug):
     """Supprime une page et ses données"""
     try:
         # Supprimer du dossier
-        page_dir = get_page_dir(slug)
-        if page_dir.exists():
-            shutil.rmtree(page_dir)
+        remove_page_files(slug)
         
         # Supprimer de l'inventaire
-        inventory = load_inventory()
-        inventory = [p for p in inventory if p['slug'] != slug]
-        save_inventory(inventory)
+        with inventory_lock():
+            inventory = load_inventory()
+            inventory = [p for p in inventory if p['slug'] != slug]
+            save_inventory(inventory)
         generate_pages_metadata()
         regenerate_wiki_pages()
         return jsonify({"success": True})
@@ -300,13 +495,126 @@ def delete_page(slug):
 @app.route('/api/pages/<slug>/layout', methods=['GET'])
 def get_page_layout(slug):
     """Récupère uniquement le layout d'une page"""
-    layout_file = get_layout_file(slug)
+    version = get_layout_version(slug)
+    if request.if_none_match.contains(layout_etag(version)):
+        return "", 304
+    
+    response = jsonify(load_layout(slug))
+    response.set_etag(layout_etag(version))
+    return response
+
+@app.route('/api/pages/<slug>/layout', methods=['PATCH'])
+def patch_page_layout(slug):
+    """
+    Sauvegarde incrémentale : applique des opérations par composant
+    (upsert, update, delete, reorder) sur la version attendue du layout
+    """
+    if not get_page_dir(slug).exists():
+        return jsonify({"error": "Page non trouvée"}), 404
     
-    if not layout_file.exists():
-        return jsonify([])
+    data = request.json or {}
+    ops = data.get('ops', [])
+    base_version = data.get('version', get_expected_version())
     
-    with open(layout_file, 'r', encoding='utf-8') as f:
-        return jsonify(json.load(f))
+    if base_version is None:
+        return jsonify({"error": "version requise"}), 400
+    
+    with page_lock(slug):
+        current_version = get_layout_version(slug)
+        
+        if base_version == current_version:
+            base_layout = load_layout(slug)
+        else:
+            try:
+                base_layout = revisions.load_revision(get_page_dir(slug), base_version)
+            except KeyError:
+                return conflict_response(slug)
+        
+        try:
+            layout, touched = layout_ops.apply_ops(base_layout, ops)
+        except layout_ops.LayoutOpError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        if not touched:
+            return jsonify({"success": True, "version": current_version, "touched": [], "merged": False})
+        
+        # Base obsolète : fusion avec les modifications concurrentes
+        merged = base_version != current_version
+        if merged:
+            layout, conflicts = layout_ops.merge_layouts(base_layout, layout, load_layout(slug))
+            if conflicts:
+                return conflict_response(slug, conflicts)
+        
+        entry = write_layout(slug, layout)
+        
+        # Si le layout avait été modifié hors éditeur, tout re-rendre
+        incremental = not merged and entry['rev'] == current_version + 1
+        generate_html(slug, layout, touched=set(touched) if incremental else None)
+    
+    generate_pages_metadata()
+    regenerate_wiki_pages()
+    
+    live_channel.publish(slug, {
+        "type": "saved",
+        "client": data.get('client'),
+        "version": entry['rev'],
+        "touched": touched
+    }, sender=data.get('client'))
+    
+    response = jsonify({"success": True, "version": entry['rev'], "touched": touched, "merged": merged})
+    response.set_etag(layout_etag(entry['rev']))
+    return response
+
+# --- Routes Collaboration temps réel ---
+
+def collab_disabled_response():
+    """503 : l'éditeur (EventSource) ne se reconnecte pas"""
+    return jsonify({"error": f"Collaboration temps réel désactivée ({collab.ENV_VAR}=0)"}), 503
+
+@app.route('/api/pages/<slug>/events')
+def page_events(slug):
+    """Flux SSE des opérations des autres éditeurs de la page"""
+    if not collab.is_enabled():
+        return collab_disabled_response()
+    client_id = request.args.get('client')
+    if not client_id:
+        return jsonify({"error": "client requis"}), 400
+    
+    response = Response(
+        stream_with_context(collab.event_stream(live_channel, slug, client_id)),
+        mimetype='text/event-stream'
+    )
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+def ops_message(data):
+    """Message "ops" à diffuser depuis le corps d'un POST .../ops : (message, erreur)"""
+    client_id = data.get('client') if isinstance(data, dict) else None
+    ops = data.get('ops', []) if isinstance(data, dict) else None
+    
+    if not client_id:
+        return None, "client requis"
+    if not isinstance(ops, list) or not all(
+        isinstance(op, dict) and op.get('op') in layout_ops.OP_TYPES for op in ops
+    ):
+        return None, "ops invalides"
+    return {"type": "ops", "client": client_id, "ops": ops}, None
+
+@app.route('/api/pages/<slug>/ops', methods=['POST'])
+def publish_page_ops(slug):
+    """
+    Diffuse un lot d'opérations (non persistées) aux autres éditeurs
+    La persistance passe par PATCH /api/pages/<slug>/layout
+    """
+    if not collab.is_enabled():
+        return collab_disabled_response()
+    message, error = ops_message(request.json or {})
+    if error:
+        return jsonify({"error": error}), 400
+    
+    delivered = live_channel.publish(slug, message, sender=message['client'])
+    return jsonify({"success": True, "delivered": delivered})
 
 @app.route('/api/pages/<slug>/copy', methods=['POST'])
 def copy_page_layout(slug):
@@ -316,29 +624,143 @@ def copy_page_layout(slug):
     if not source_slug:
         return jsonify({"error": "source_slug requis"}), 400
     
-    source_file = get_layout_file(source_slug)
-    target_file = get_layout_file(slug)
-    
-    if not source_file.exists():
+    if not get_layout_file(source_slug).exists():
         return jsonify({"error": "Page source non trouvée"}), 404
     
-    # Copier le layout
-    shutil.copy(source_file, target_file)
+    if not get_page_dir(slug).exists():
+        return jsonify({"error": "Page cible non trouvée"}), 404
     
-    return jsonify({"success": True})
+    layout = load_layout(source_slug)
+    with page_lock(slug):
+        # Même chemin qu'une sauvegarde : révision, puis HTML
+        entry = write_layout(slug, layout)
+        generate_html(slug, layout)
+    
+    generate_pages_metadata()
+    regenerate_wiki_pages()
+    
+    live_channel.publish(slug, {
+        "type": "saved",
+        "client": None,
+        "version": entry['rev'],
+        "touched": [comp.get('id') for comp in layout]
+    })
+    
+    response = jsonify({"success": True, "version": entry['rev']})
+    response.set_etag(layout_etag(entry['rev']))
+    return response
+
+# --- Routes Révisions ---
+
+def revision_summary(entry):
+    """Version publique d'une entrée d'index de révision"""
+    return {
+        "rev": entry['rev'],
+        "timestamp": datetime.fromtimestamp(entry['ts']).isoformat(),
+        "components": entry['count'],
+        "kind": entry['kind'],
+        "size": entry['size']
+    }
+
+@app.route('/api/pages/<slug>/revisions', methods=['GET'])
+def list_page_revisions(slug):
+    """Liste l'historique des révisions d'une page (plus récente en premier)"""
+    page_dir = get_page_dir(slug)
+    if not page_dir.exists():
+        return jsonify({"error": "Page non trouvée"}), 404
+    
+    entries = revisions.list_revisions(page_dir)
+    return jsonify({
+        "head": entries[-1]['rev'] if entries else None,
+        "revisions": [revision_summary(e) for e in reversed(entries)]
+    })
+
+@app.route('/api/pages/<slug>/revisions/<int:rev>', methods=['GET'])
+def get_page_revision(slug, rev):
+    """Récupère le layout d'une révision"""
+    page_dir = get_page_dir(slug)
+    entries = {e['rev']: e for e in revisions.list_revisions(page_dir)}
+    
+    if rev not in entries:
+        return jsonify({"error": "Révision non trouvée"}), 404
+    
+    return jsonify({
+        **revision_summary(entries[rev]),
+        "layout": revisions.load_revision(page_dir, rev)
+    })
+
+@app.route('/api/pages/<slug>/revisions/<int:rev>/diff', methods=['GET'])
+def diff_page_revision(slug, rev):
+    """
+    Compare une révision à une autre (?against=<rev>)
+    Par défaut : comparaison avec la révision précédente
+    """
+    page_dir = get_page_dir(slug)
+    entries = revisions.list_revisions(page_dir)
+    revs = [e['rev'] for e in entries]
+    
+    if rev not in revs:
+        return jsonify({"error": "Révision non trouvée"}), 404
+    
+    against = request.args.get('against', type=int)
+    if against is None:
+        position = revs.index(rev)
+        against = revs[position - 1] if position > 0 else None
+    elif against not in revs:
+        return jsonify({"error": "Révision de comparaison non trouvée"}), 404
+    
+    old_layout = revisions.load_revision(page_dir, against) if against is not None else []
+    new_layout = revisions.load_revision(page_dir, rev)
+    
+    return jsonify({
+        "rev": rev,
+        "against": against,
+        **revisions.diff_layouts(old_layout, new_layout)
+    })
+
+@app.route('/api/pages/<slug>/revisions/<int:rev>/restore', methods=['POST'])
+def restore_page_revision(slug, rev):
+    """Restaure une révision (crée une nouvelle révision, l'historique est conservé)"""
+    page_dir = get_page_dir(slug)
+    if not page_dir.exists():
+        return jsonify({"error": "Page non trouvée"}), 404
+    
+    try:
+        layout = revisions.load_revision(page_dir, rev)
+    except KeyError:
+        return jsonify({"error": "Révision non trouvée"}), 404
+    
+    with page_lock(slug):
+        entry = write_layout(slug, layout)
+        generate_html(slug, layout)
+    
+    generate_pages_metadata()
+    regenerate_wiki_pages()
+    
+    live_channel.publish(slug, {
+        "type": "saved",
+        "client": None,
+        "version": entry['rev'],
+        "touched": [comp.get('id') for comp in layout]
+    })
+    
+    response = jsonify({"success": True, "rev": entry['rev'], "restored_from": rev})
+    response.set_etag(layout_etag(entry['rev']))
+    return response
 
 @app.route('/api/pages/<slug>/visibility', methods=['PUT'])
 def toggle_visibility(slug):
     """Change la visibilité d'une page dans la navigation"""
     hidden = request.json.get('hidden', False)
     
-    inventory = load_inventory()
-    for page in inventory:
-        if page['slug'] == slug:
-            page['hidden_from_nav'] = hidden
-            break
-    
-    save_inventory(inventory)
+    with inventory_lock():
+        inventory = load_inventory()
+        for page in inventory:
+            if page['slug'] == slug:
+                page['hidden_from_nav'] = hidden
+                break
+        
+        save_inventory(inventory)
     generate_pages_metadata()
     regenerate_wiki_pages()
     return jsonify({"success": True})
@@ -364,6 +786,7 @@ def upload_image(slug):
     
     filepath = images_dir / filename
     file.save(str(filepath))
+    UPLOAD_BYTES_TOTAL.labels('image').inc(filepath.stat().st_size)
     
     # Chemin relatif
     relative_path = f'images/{filename}'
@@ -394,882 +817,15 @@ def upload_video(slug):
     
     filepath = videos_dir / filename
     file.save(str(filepath))
+    UPLOAD_BYTES_TOTAL.labels('video').inc(filepath.stat().st_size)
     
     # Chemin relatif
     relative_path = f'assets/videos/{filename}'
     
     return jsonify({"path": relative_path})
 
-def extract_page_preview(slug):
-    """Extrait un aperçu textuel d'une page"""
-    layout_file = get_layout_file(slug)
-    
-    if not layout_file.exists():
-        return "Page sans contenu"  # ✅ Valeur par défaut
-    
-    try:
-        with open(layout_file, 'r', encoding='utf-8') as f:
-            layout = json.load(f)
-        
-        if not layout:
-            return "Page vide"  # ✅ Gérer layouts vides
-        
-        texts = []
-        for comp in layout:
-            if comp.get('type') == 'text' and comp.get('content'):
-                content = comp.get('content', '')
-                clean_text = re.sub(r'<[^>]+>', ' ', content)
-                clean_text = re.sub(r'\s+', ' ', clean_text).strip()
-                if clean_text:
-                    texts.append(clean_text)
-        
-        full_text = ' '.join(texts)
-        
-        if not full_text:
-            return "Page sans texte"  # ✅ Gérer absence de texte
-        
-        if len(full_text) > 200:
-            return full_text[:200] + '...'
-        return full_text
-        
-    except Exception as e:
-        print(f"⚠️ Erreur extraction {slug}: {e}")
-        return "Aperçu non disponible"
-
-
-def generate_pages_metadata():
-    """Génère data/pages-metadata.json avec tous les aperçus"""
-    inventory = load_inventory()
-    metadata = {}
-    
-    for page in inventory:
-        slug = page['slug']
-        metadata[slug] = {
-            'title': page['title'],
-            'slug': slug,
-            'preview': extract_page_preview(slug),
-            'hidden_from_nav': page.get('hidden_from_nav', False),
-            'tags': page.get('tags', [])
-        }
-    
-    metadata_file = DATA_DIR / 'pages-metadata.json'
-    with open(metadata_file, 'w', encoding='utf-8') as f:
-        json.dump(metadata, f, indent=2, ensure_ascii=False)
-    
-    print(f"✅ Métadonnées générées: {len(metadata)} pages")
-    return metadata
-
-
-# --- Génération HTML ---
-def generate_html(slug, layout):
-    """Génère le fichier index.html avec prévisualisations statiques"""
-    import json
-    import re
-    
-    page_dir = get_page_dir(slug)
-    
-    inventory = load_inventory()
-    page_info = next((p for p in inventory if p['slug'] == slug), {})
-    title = page_info.get('title', slug)
-    is_hidden = page_info.get('hidden_from_nav', False)
-    
-    # Calculer hauteur et extraire les titres
-    max_bottom = 0
-    page_headings = []
-    internal_links = set()
-    
-    for comp in layout:
-        bottom = comp['y'] + comp['h']
-        if bottom > max_bottom:
-            max_bottom = bottom
-        
-        if comp.get('type') == 'text' and comp.get('content'):
-            content = comp.get('content', '')
-            
-            # Trouver tous les h1, h2, h3
-            h1_matches = re.findall(r'<h1[^>]*>(.*?)</h1>', content, re.IGNORECASE | re.DOTALL)
-            h2_matches = re.findall(r'<h2[^>]*>(.*?)</h2>', content, re.IGNORECASE | re.DOTALL)
-            h3_matches = re.findall(r'<h3[^>]*>(.*?)</h3>', content, re.IGNORECASE | re.DOTALL)
-            
-            for h1 in h1_matches:
-                clean_text = re.sub(r'<[^>]+>', '', h1).strip()
-                if clean_text:
-                    page_headings.append({'level': 1, 'text': clean_text, 'id': slugify(clean_text)})
-            
-            for h2 in h2_matches:
-                clean_text = re.sub(r'<[^>]+>', '', h2).strip()
-                if clean_text:
-                    page_headings.append({'level': 2, 'text': clean_text, 'id': slugify(clean_text)})
-            
-            for h3 in h3_matches:
-                clean_text = re.sub(r'<[^>]+>', '', h3).strip()
-                if clean_text:
-                    page_headings.append({'level': 3, 'text': clean_text, 'id': slugify(clean_text)})
-            
-            # Extraire les liens internes
-            internal_link_matches = re.findall(r'href="\.\.\/([^\/]+)\/"', content)
-            internal_links.update(internal_link_matches)
-    
-    # Charger les métadonnées
-    metadata_file = DATA_DIR / 'pages-metadata.json'
-    pages_metadata = {}
-    
-    if metadata_file.exists():
-        try:
-            with open(metadata_file, 'r', encoding='utf-8') as f:
-                pages_metadata = json.load(f)
-        except Exception as e:
-            print(f"⚠️ Erreur lecture métadonnées: {e}")
-            pages_metadata = {}
-    
-    # Si pas de métadonnées, les générer
-    if not pages_metadata:
-        print("⚠️ Métadonnées vides, génération...")
-        pages_metadata = generate_pages_metadata()
-    #regenerate_wiki_pages()
-    
-    # Convertir en JSON pour JavaScript
-    headings_json = json.dumps(page_headings, ensure_ascii=False)
-    internal_links_list = list(internal_links)
-    internal_links_json = json.dumps(internal_links_list, ensure_ascii=False)
-    pages_metadata_json = json.dumps(pages_metadata, ensure_ascii=False)
-    
-    # HTML avec chargement du CSS externe
-    html = f'''<!DOCTYPE html>
-<html lang="fr">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>{title}</title>
-    
-    <link rel="stylesheet" href="../../static/css/viewer.css">
-    
-    <style>
-        /* Hauteur minimale du canvas */
-        .canvas-container {{
-            min-height: {max_bottom + 100}px;
-        }}
-        
-        /* Style du bouton d'accueil */
-        .home-btn {{
-            display: block;
-            width: calc(100% - 4px); /* Légèrement plus petit pour éviter le débordement */
-            padding: 10px;
-            background: linear-gradient(135deg, #4a9eff, #667eea);
-            border: none;
-            color: white;
-            border-radius: 6px;
-            text-decoration: none;
-            text-align: center;
-            font-weight: bold;
-            font-size: 13px;
-            margin: 12px 0 0 0; /* Retirer les marges latérales */
-            transition: all 0.3s;
-            box-shadow: 0 2px 8px rgba(74, 158, 255, 0.3);
-        }}
-        
-        .home-btn:hover {{
-            transform: translateY(-2px);
-            box-shadow: 0 4px 15px rgba(74, 158, 255, 0.5);
-        }}
-        
-        /* Ajustement de la sidebar header pour un meilleur espacement */
-        .sidebar-header {{
-            margin-bottom: 20px;
-            padding-bottom: 15px;
-            border-bottom: 2px solid #4a9eff;
-        }}
-
-        /* 🎨 BANNIÈRE DE PAGE SIMPLIFIÉE */
-        .page-header {{
-            background: linear-gradient(135deg, #1a1a2e 0%, #16213e 100%);
-            border-bottom: 3px solid #4a9eff;
-            margin-bottom: 30px;
-            border-radius: 15px;
-            box-shadow: 0 4px 20px rgba(0, 0, 0, 0.3);
-        }}
-        
-        .page-header-content {{
-            display: flex;
-            align-items: center;
-            gap: 20px;
-            padding: 20px 30px;
-        }}
-        
-        .page-icon {{
-            font-size: 42px;
-            animation: float 3s ease-in-out infinite;
-        }}
-        
-        @keyframes float {{
-            0%, 100% {{ transform: translateY(0); }}
-            50% {{ transform: translateY(-8px); }}
-        }}
-        
-        .page-main-title {{
-            font-size: 28px;
-            color: #e0e0e0;
-            font-weight: 700;
-            margin: 0;
-            background: linear-gradient(135deg, #4a9eff, #667eea);
-            -webkit-background-clip: text;
-            -webkit-text-fill-color: transparent;
-            background-clip: text;
-        }}
-        
-        /* 📱 RESPONSIVE */
-        @media (max-width: 768px) {{
-            .page-header-content {{
-                padding: 15px 20px;
-            }}
-            
-            .page-icon {{
-                font-size: 32px;
-            }}
-            
-            .page-main-title {{
-                font-size: 22px;
-            }}
-        }}
-    </style>
-</head>
-<body>
-    <nav class="sidebar">
-        <div class="sidebar-header">
-            <h2>📚 {title}</h2>
-            <a href="../../wiki/" class="home-btn">
-                🏠 Retour à l'accueil
-            </a>
-        </div>
-        <div class="nav-toggle">
-            <button class="nav-btn active" data-tab="links">🔗 Liens</button>
-            <button class="nav-btn" data-tab="toc">📋 Sommaire</button>
-        </div>
-        
-        <div class="nav-content" id="nav-links">
-            <div class="nav-section" id="internal-links-section" style="display:none;">
-                <div class="nav-section-title">Liens référencés</div>
-                <ul class="sidebar-nav" id="internal-links-list"></ul>
-            </div>
-            
-            <div class="nav-section">
-                <div class="nav-section-title">Autres pages</div>
-                <ul class="sidebar-nav" id="other-pages-list"></ul>
-            </div>
-        </div>
-        
-        <div class="nav-content" id="nav-toc" style="display:none;">
-            <ul class="toc-list" id="toc-list">
-                <li style="color: #666; font-size: 12px; padding: 10px;">Aucun titre trouvé</li>
-            </ul>
-        </div>
-    </nav>
-    
-    <main class="content">
-        <!-- 🎨 BANNIÈRE SIMPLIFIÉE -->
-        <div class="page-header">
-            <div class="page-header-content">
-                <div class="page-icon">🗺️</div>
-                <h1 class="page-main-title">{title}</h1>
-            </div>
-        </div>
-        
-        <div class="canvas-container">
-'''
-    
-    # Composants triés avec IDs sur les titres
-    sorted_components = sorted(layout, key=lambda x: x.get('z', 0))
-    
-    for comp in sorted_components:
-        html += render_component_html_with_anchors(comp, slug)
-    
-    # Fermeture du HTML avec script
-    html += f'''
-        </div>
-    </main>
-    
-    <div class="link-preview" id="link-preview">
-        <div class="preview-header" id="preview-title"></div>
-        <div class="preview-content" id="preview-content"></div>
-        <div class="preview-footer">Cliquez pour ouvrir →</div>
-    </div>
-    
-    <script>
-        const PAGE_HEADINGS = {headings_json};
-        const INTERNAL_LINKS = {internal_links_json};
-        const CURRENT_SLUG = "{slug}";
-        const PAGES_METADATA = {pages_metadata_json};
-
-        const homeBtn = document.querySelector('.home-btn');
-        if (homeBtn) {{
-            homeBtn.addEventListener('mouseenter', () => {{
-                homeBtn.style.transform = 'translateY(-2px)';
-                homeBtn.style.boxShadow = '0 4px 15px rgba(74, 158, 255, 0.5)';
-            }});
-            homeBtn.addEventListener('mouseleave', () => {{
-                homeBtn.style.transform = 'translateY(0)';
-                homeBtn.style.boxShadow = '0 2px 8px rgba(74, 158, 255, 0.3)';
-            }});
-        }}
-        
-        fetch('../../data/inventory.json')
-            .then(res => res.json())
-            .then(pages => {{
-                const visiblePages = pages.filter(p => !p.hidden_from_nav);
-                const referencedPages = visiblePages.filter(p => INTERNAL_LINKS.includes(p.slug) && p.slug !== CURRENT_SLUG);
-                const otherPages = visiblePages.filter(p => !INTERNAL_LINKS.includes(p.slug) && p.slug !== CURRENT_SLUG);
-                
-                if (referencedPages.length > 0) {{
-                    document.getElementById('internal-links-section').style.display = 'block';
-                    const internalList = document.getElementById('internal-links-list');
-                    referencedPages.forEach(page => {{
-                        const li = document.createElement('li');
-                        const a = document.createElement('a');
-                        a.href = `../${{page.slug}}/`;
-                        a.textContent = page.title;
-                        li.appendChild(a);
-                        internalList.appendChild(li);
-                    }});
-                }}
-                
-                const otherList = document.getElementById('other-pages-list');
-                otherPages.forEach(page => {{
-                    const li = document.createElement('li');
-                    const a = document.createElement('a');
-                    a.href = `../${{page.slug}}/`;
-                    a.textContent = page.title;
-                    li.appendChild(a);
-                    otherList.appendChild(li);
-                }});
-            }})
-            .catch(err => console.error('Erreur chargement navigation:', err));
-        
-        if (PAGE_HEADINGS.length > 0) {{
-            const tocList = document.getElementById('toc-list');
-            tocList.innerHTML = '';
-            PAGE_HEADINGS.forEach(heading => {{
-                const li = document.createElement('li');
-                const a = document.createElement('a');
-                a.href = `#${{heading.id}}`;
-                a.textContent = heading.text;
-                a.classList.add(`level-${{heading.level}}`);
-                a.addEventListener('click', (e) => {{
-                    e.preventDefault();
-                    const target = document.getElementById(heading.id);
-                    if (target) target.scrollIntoView({{ behavior: 'smooth', block: 'start' }});
-                }});
-                li.appendChild(a);
-                tocList.appendChild(li);
-            }});
-        }}
-        
-        document.querySelectorAll('.nav-btn').forEach(btn => {{
-            btn.addEventListener('click', () => {{
-                document.querySelectorAll('.nav-btn').forEach(b => b.classList.remove('active'));
-                btn.classList.add('active');
-                const tab = btn.dataset.tab;
-                document.getElementById('nav-links').style.display = tab === 'links' ? 'block' : 'none';
-                document.getElementById('nav-toc').style.display = tab === 'toc' ? 'block' : 'none';
-            }});
-        }});
-        
-        const preview = document.getElementById('link-preview');
-        let previewTimeout;
-        let isOverPreview = false;
-        
-        function showLinkPreview(linkElement) {{
-            const href = linkElement.getAttribute('href');
-            const match = href.match(/\.\.\/([^\/]+)\//);
-            if (!match) return;
-            
-            const targetSlug = match[1];
-            const metadata = PAGES_METADATA[targetSlug];
-            
-            if (!metadata) {{
-                console.warn('Pas de métadonnées pour', targetSlug);
-                return;
-            }}
-            
-            document.getElementById('preview-title').textContent = metadata.title;
-            document.getElementById('preview-content').textContent = metadata.preview;
-            
-            const rect = linkElement.getBoundingClientRect();
-            preview.style.display = 'block';
-            
-            let left = rect.right + 15;
-            let top = rect.top;
-            
-            if (left + 400 > window.innerWidth) {{
-                left = rect.left - 415;
-            }}
-            
-            if (top + 250 > window.innerHeight) {{
-                top = window.innerHeight - 260;
-            }}
-            
-            preview.style.left = left + 'px';
-            preview.style.top = top + 'px';
-        }}
-        
-        document.querySelectorAll('.text-content a[href*="../"]').forEach(link => {{
-            link.addEventListener('mouseenter', (e) => {{
-                clearTimeout(previewTimeout);
-                previewTimeout = setTimeout(() => {{
-                    showLinkPreview(e.target);
-                }}, 300);
-            }});
-            
-            link.addEventListener('mouseleave', () => {{
-                clearTimeout(previewTimeout);
-                setTimeout(() => {{
-                    if (!isOverPreview) {{
-                        preview.style.display = 'none';
-                    }}
-                }}, 200);
-            }});
-        }});
-        
-        preview.addEventListener('mouseenter', () => {{
-            isOverPreview = true;
-        }});
-        
-        preview.addEventListener('mouseleave', () => {{
-            isOverPreview = false;
-            preview.style.display = 'none';
-        }});
-        
-        document.querySelectorAll('.component-gallery img').forEach(img => {{
-            img.addEventListener('click', () => {{
-                const lightbox = document.createElement('div');
-                lightbox.style.cssText = 'position:fixed;top:0;left:0;width:100%;height:100%;background:rgba(0,0,0,0.9);display:flex;align-items:center;justify-content:center;z-index:10000;cursor:pointer';
-                const enlargedImg = document.createElement('img');
-                enlargedImg.src = img.src;
-                enlargedImg.style.cssText = 'max-width:90%;max-height:90%;object-fit:contain';
-                lightbox.appendChild(enlargedImg);
-                lightbox.onclick = () => lightbox.remove();
-                document.body.appendChild(lightbox);
-            }});
-        }});
-        
-        const observer = new IntersectionObserver((entries) => {{
-            entries.forEach(entry => {{
-                if (entry.isIntersecting) {{
-                    entry.target.style.opacity = '1';
-                    entry.target.style.transform = 'translateY(0)';
-                }}
-            }});
-        }}, {{ threshold: 0.1, rootMargin: '0px 0px -50px 0px' }});
-        
-        document.querySelectorAll('.component').forEach(component => {{
-            component.style.opacity = '0';
-            component.style.transform = 'translateY(20px)';
-            component.style.transition = 'opacity 0.5s ease-out, transform 0.5s ease-out';
-            observer.observe(component);
-        }});
-        
-        console.log('✅ Viewer initialisé');
-        console.log('📊 Métadonnées:', Object.keys(PAGES_METADATA).length, 'pages');
-    </script>
-    '''
-
-    # --- CORRECTION ICI --- 
-    # Gestion correcte de l'affichage conditionnel de la pop-in
-    warning_html = ""
-    if is_hidden:
-        warning_html = '''
-    <div id="hidden-page-warning" class="hidden-warning-overlay">
-        <div class="hidden-warning-modal">
-            <div class="warning-icon">⚠️</div>
-            <h2>Page à accès restreint</h2>
-            <p class="warning-text">
-                Les informations contenues dans cette page <strong>ne sont pas publiques en RP</strong>.
-            </p>
-            <p class="warning-subtext">
-                Elles ne peuvent être exploitées sans l'accord explicite d'un <strong>Maître de Jeu</strong> 
-                ou du <strong>joueur du pays concerné</strong>.
-            </p>
-            <div class="warning-actions">
-                <button id="accept-warning" class="btn-accept">
-                    J'ai compris
-                </button>
-            </div>
-        </div>
-    </div>
-    '''
-    else:
-        warning_html = "\n    \n"
-        
-    html += warning_html
-
-    # Ajout du CSS/JS restant
-    html += f'''
-    <style>
-        .hidden-warning-overlay {{
-            position: fixed;
-            top: 0;
-            left: 0;
-            width: 100%;
-            height: 100%;
-            background: rgba(0, 0, 0, 0.95);
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            z-index: 10000;
-            animation: fadeIn 0.3s ease-out;
-        }}
-        
-        @keyframes fadeIn {{
-            from {{ opacity: 0; }}
-            to {{ opacity: 1; }}
-        }}
-        
-        .hidden-warning-modal {{
-            background: linear-gradient(135deg, #1a1a2e 0%, #2d2d44 100%);
-            border: 2px solid #ff6b6b;
-            border-radius: 20px;
-            padding: 50px 40px;
-            max-width: 600px;
-            text-align: center;
-            box-shadow: 0 20px 60px rgba(255, 107, 107, 0.3);
-            animation: slideUp 0.4s ease-out;
-        }}
-        
-        @keyframes slideUp {{
-            from {{
-                opacity: 0;
-                transform: translateY(50px);
-            }}
-            to {{
-                opacity: 1;
-                transform: translateY(0);
-            }}
-        }}
-        
-        .warning-icon {{
-            font-size: 80px;
-            margin-bottom: 25px;
-            animation: pulse 2s ease-in-out infinite;
-        }}
-        
-        @keyframes pulse {{
-            0%, 100% {{ transform: scale(1); }}
-            50% {{ transform: scale(1.1); }}
-        }}
-        
-        .hidden-warning-modal h2 {{
-            color: #ff6b6b;
-            font-size: 32px;
-            margin-bottom: 25px;
-            font-weight: 700;
-        }}
-        
-        .warning-text {{
-            color: #e0e0e0;
-            font-size: 18px;
-            line-height: 1.6;
-            margin-bottom: 20px;
-        }}
-        
-        .warning-text strong {{
-            color: #ff6b6b;
-            font-weight: 700;
-        }}
-        
-        .warning-subtext {{
-            color: #999;
-            font-size: 15px;
-            line-height: 1.6;
-            margin-bottom: 35px;
-            padding: 20px;
-            background: rgba(255, 107, 107, 0.1);
-            border-radius: 10px;
-            border-left: 4px solid #ff6b6b;
-        }}
-        
-        .warning-subtext strong {{
-            color: #4a9eff;
-        }}
-        
-        .warning-actions {{
-            margin-top: 30px;
-        }}
-        
-        .btn-accept {{
-            background: linear-gradient(135deg, #4a9eff, #667eea);
-            color: white;
-            border: none;
-            padding: 15px 50px;
-            border-radius: 50px;
-            font-size: 16px;
-            font-weight: 600;
-            cursor: pointer;
-            transition: all 0.3s;
-            box-shadow: 0 4px 15px rgba(74, 158, 255, 0.3);
-        }}
-        
-        .btn-accept:hover {{
-            transform: translateY(-3px);
-            box-shadow: 0 6px 20px rgba(74, 158, 255, 0.5);
-        }}
-        
-        .btn-accept:active {{
-            transform: translateY(-1px);
-        }}
-        
-        @media (max-width: 768px) {{
-            .hidden-warning-modal {{
-                margin: 20px;
-                padding: 40px 30px;
-            }}
-            
-            .warning-icon {{
-                font-size: 60px;
-            }}
-            
-            .hidden-warning-modal h2 {{
-                font-size: 24px;
-            }}
-            
-            .warning-text {{
-                font-size: 16px;
-            }}
-        }}
-    </style>
-    
-    <script>
-        // Gestion de la pop-in d'avertissement
-        const warningOverlay = document.getElementById('hidden-page-warning');
-        const acceptBtn = document.getElementById('accept-warning');
-        
-        if (warningOverlay && acceptBtn) {{
-            // Empêcher le scroll en arrière-plan
-            document.body.style.overflow = 'hidden';
-            
-            acceptBtn.addEventListener('click', () => {{
-                warningOverlay.style.animation = 'fadeOut 0.3s ease-out';
-                
-                setTimeout(() => {{
-                    warningOverlay.remove();
-                    document.body.style.overflow = '';
-                }}, 300);
-            }});
-            
-            // Empêcher la fermeture en cliquant à côté
-            warningOverlay.addEventListener('click', (e) => {{
-                if (e.target === warningOverlay) {{
-                    // Animation de secousse pour indiquer qu'on doit cliquer sur le bouton
-                    const modal = warningOverlay.querySelector('.hidden-warning-modal');
-                    modal.style.animation = 'shake 0.5s ease-in-out';
-                    setTimeout(() => {{
-                        modal.style.animation = '';
-                    }}, 500);
-                }}
-            }});
-        }}
-    </script>
-    
-    <style>
-        @keyframes fadeOut {{
-            from {{ opacity: 1; }}
-            to {{ opacity: 0; }}
-        }}
-        
-        @keyframes shake {{
-            0%, 100% {{ transform: translateX(0); }}
-            25% {{ transform: translateX(-10px); }}
-            75% {{ transform: translateX(10px); }}
-        }}
-    </style>
-</body>
-</html>'''
-    
-    # Écrire le fichier
-    try:
-        with open(page_dir / 'index.html', 'w', encoding='utf-8') as f:
-            f.write(html)
-        print(f"✅ HTML généré pour {slug}")
-    except Exception as e:
-        print(f"❌ Erreur écriture HTML pour {slug}: {e}")
-        raise
 
-def render_component_html_with_anchors(comp, slug):
-    """Génère le HTML avec ancres sur les titres"""
-    import re
-    
-    style = f'left:{comp["x"]}px;top:{comp["y"]}px;width:{comp["w"]}px;height:{comp["h"]}px;z-index:{comp.get("z", 0)};'
-    if comp.get('custom_css'):
-        style += comp['custom_css']
-    
-    html = f'<div class="component component-{comp["type"]}" id="{comp["id"]}" style="{style}">\n'
-    
-    comp_type = comp['type']
-    
-    if comp_type == 'text':
-        content = comp.get("content", "")
-        
-        # Ajouter des IDs aux titres pour le scroll
-        def add_id_to_heading(match):
-            tag = match.group(1)
-            attrs = match.group(2)
-            text = match.group(3)
-            clean_text = re.sub(r'<[^>]+>', '', text).strip()
-            heading_id = slugify(clean_text)
-            return f'<{tag} id="{heading_id}"{attrs}>{text}</{tag}>'
-        
-        content = re.sub(r'<(h[123])([^>]*)>(.*?)</\1>', add_id_to_heading, content, flags=re.IGNORECASE | re.DOTALL)
-        
-        html += f'<div class="text-content">{content}</div>\n'
-    
-    elif comp_type == 'image':
-        html += f'<img src="{comp.get("image_path", "")}" alt="Image" />\n'
-    
-    elif comp_type == 'gallery':
-        # 🔧 FIX: Générer un carousel fonctionnel avec toutes les images
-        images = comp.get('images', [])
-        
-        if len(images) == 0:
-            html += '<div style="display: flex; align-items: center; justify-content: center; height: 100%; color: #666;">Aucune image dans la galerie</div>\n'
-        elif len(images) == 1:
-            # Une seule image, affichage simple
-            html += f'<img src="{images[0]}" style="width: 100%; height: 100%; object-fit: cover;" alt="Image galerie" />\n'
-        else:
-            # Plusieurs images, créer un carousel
-            gallery_id = f'gallery-{comp["id"]}'
-            html += f'''
-            <div class="gallery-carousel" id="{gallery_id}" style="position: relative; width: 100%; height: 100%; overflow: hidden;">
-                <div class="gallery-slides" style="position: relative; width: 100%; height: 100%;">
-'''
-            
-            for idx, img_path in enumerate(images):
-                display = 'block' if idx == 0 else 'none'
-                html += f'''
-                    <img class="gallery-slide" src="{img_path}" 
-                         style="position: absolute; top: 0; left: 0; width: 100%; height: 100%; object-fit: cover; display: {display};" 
-                         alt="Image {idx + 1}" />
-'''
-            
-            html += '''
-                </div>
-                
-                <!-- Boutons de navigation -->
-                <button class="gallery-prev" style="position: absolute; left: 10px; top: 50%; transform: translateY(-50%); background: rgba(0,0,0,0.7); color: white; border: none; padding: 15px 20px; cursor: pointer; border-radius: 5px; font-size: 24px; z-index: 10;">‹</button>
-                <button class="gallery-next" style="position: absolute; right: 10px; top: 50%; transform: translateY(-50%); background: rgba(0,0,0,0.7); color: white; border: none; padding: 15px 20px; cursor: pointer; border-radius: 5px; font-size: 24px; z-index: 10;">›</button>
-                
-                <!-- Indicateurs -->
-                <div class="gallery-indicators" style="position: absolute; bottom: 15px; left: 50%; transform: translateX(-50%); display: flex; gap: 8px; z-index: 10;">
-'''
-            
-            for idx in range(len(images)):
-                active_style = 'background: #4a9eff;' if idx == 0 else 'background: rgba(255,255,255,0.5);'
-                html += f'''
-                    <div class="gallery-indicator" data-index="{idx}" style="width: 12px; height: 12px; border-radius: 50%; {active_style} cursor: pointer; transition: background 0.3s;"></div>
-'''
-            
-            html += f'''
-                </div>
-            </div>
-            
-            <script>
-            (function() {{
-                const gallery = document.getElementById('{gallery_id}');
-                const slides = gallery.querySelectorAll('.gallery-slide');
-                const prevBtn = gallery.querySelector('.gallery-prev');
-                const nextBtn = gallery.querySelector('.gallery-next');
-                const indicators = gallery.querySelectorAll('.gallery-indicator');
-                let currentIndex = 0;
-                
-                function showSlide(index) {{
-                    // Cacher toutes les slides
-                    slides.forEach(slide => slide.style.display = 'none');
-                    
-                    // Afficher la slide actuelle
-                    if (slides[index]) {{
-                        slides[index].style.display = 'block';
-                    }}
-                    
-                    // Mettre à jour les indicateurs
-                    indicators.forEach((ind, i) => {{
-                        ind.style.background = i === index ? '#4a9eff' : 'rgba(255,255,255,0.5)';
-                    }});
-                    
-                    currentIndex = index;
-                }}
-                
-                prevBtn.addEventListener('click', () => {{
-                    const newIndex = currentIndex > 0 ? currentIndex - 1 : slides.length - 1;
-                    showSlide(newIndex);
-                }});
-                
-                nextBtn.addEventListener('click', () => {{
-                    const newIndex = currentIndex < slides.length - 1 ? currentIndex + 1 : 0;
-                    showSlide(newIndex);
-                }});
-                
-                indicators.forEach((indicator, index) => {{
-                    indicator.addEventListener('click', () => {{
-                        showSlide(index);
-                    }});
-                }});
-                
-                // Auto-play si configuré
-                const autoplayDelay = {comp.get('autoplay_delay', 0)};
-                if (autoplayDelay > 0) {{
-                    setInterval(() => {{
-                        const newIndex = currentIndex < slides.length - 1 ? currentIndex + 1 : 0;
-                        showSlide(newIndex);
-                    }}, autoplayDelay);
-                }}
-            }})();
-            </script>
-'''
-    
-    elif comp_type == 'video':
-        html += f'<video controls><source src="{comp.get("video_path", "")}" type="video/mp4"></video>\n'
-    
-    elif comp_type == 'youtube':
-        html += f'<iframe src="https://www.youtube.com/embed/{comp.get("youtube_id", "")}" allowfullscreen></iframe>\n'
-    
-    elif comp_type == 'shape':
-        html += f'<div style="width:100%;height:100%;background:{comp.get("bg_color", "#333")};border-radius:5px;"></div>\n'
-    
-    elif comp_type == 'table':
-        # ✅ FIX: Utiliser 'content' au lieu de 'rows'
-        content = comp.get('content', '')
-        
-        if not content:
-            # Tableau par défaut si vide
-            content = '''
-                <table style="width: 100%; border-collapse: collapse; background: #252525;">
-                    <thead>
-                        <tr>
-                            <th style="padding: 12px; text-align: left; border: 1px solid #333; background: #333; color: #4a9eff;">Colonne 1</th>
-                            <th style="padding: 12px; text-align: left; border: 1px solid #333; background: #333; color: #4a9eff;">Colonne 2</th>
-                            <th style="padding: 12px; text-align: left; border: 1px solid #333; background: #333; color: #4a9eff;">Colonne 3</th>
-                        </tr>
-                    </thead>
-                    <tbody>
-                        <tr>
-                            <td style="padding: 12px; border: 1px solid #333;">Données</td>
-                            <td style="padding: 12px; border: 1px solid #333;">Données</td>
-                            <td style="padding: 12px; border: 1px solid #333;">Données</td>
-                        </tr>
-                        <tr>
-                            <td style="padding: 12px; border: 1px solid #333;">Données</td>
-                            <td style="padding: 12px; border: 1px solid #333;">Données</td>
-                            <td style="padding: 12px; border: 1px solid #333;">Données</td>
-                        </tr>
-                    </tbody>
-                </table>
-            '''
-        
-        html += content + '\n'
 
-    
-    elif comp_type == 'separator':
-        html += '<hr />\n'
-    
-    html += '</div>\n'
-    return html
 
 # --- Routes Statiques ---
 
@@ -1286,6 +842,13 @@ def serve_image(slug, filename):
     page_dir = get_page_dir(slug) / 'images'
     return send_from_directory(page_dir, filename)
 
+@app.route('/pages/<slug>/<filename>')
+def serve_custom_asset(slug, filename):
+    """CSS/JS personnalisés d'une page : nom = empreinte du contenu, cache illimité"""
+    if not CUSTOM_ASSET_PATTERN.match(filename):
+        return page_not_found(None)
+    return send_from_directory(get_page_dir(slug), filename, max_age=31536000)
+
 @app.route('/api/pages/<slug>/tags', methods=['PUT'])
 def update_tags(slug):
     """Met à jour les tags d'une page"""
@@ -1293,15 +856,16 @@ def update_tags(slug):
     tags = data.get('tags', [])
     
     # Nettoyer les tags (lowercase, trim, dédupliquer)
-    tags = list(set([t.strip().lower() for t in tags if t.strip()]))
+    tags = clean_tags(tags)
     
-    inventory = load_inventory()
-    for page in inventory:
-        if page['slug'] == slug:
-            page['tags'] = tags
-            break
-    
-    save_inventory(inventory)
+    with inventory_lock():
+        inventory = load_inventory()
+        for page in inventory:
+            if page['slug'] == slug:
+                page['tags'] = tags
+                break
+        
+        save_inventory(inventory)
     generate_pages_metadata()
     regenerate_wiki_pages()
     
@@ -1309,23 +873,32 @@ def update_tags(slug):
 
 @app.route('/api/tags', methods=['GET'])
 def get_all_tags():
-    """Retourne tous les tags uniques avec leur comptage"""
-    inventory = load_inventory()
-    tags_count = {}
-    
-    for page in inventory:
-        for tag in page.get('tags', []):
-            tags_count[tag] = tags_count.get(tag, 0) + 1
-    
-    # Trier par popularité puis alphabétiquement
-    sorted_tags = sorted(
-        tags_count.items(), 
-        key=lambda x: (-x[1], x[0])
-    )
-    
+    """Retourne tous les tags uniques avec leur comptage (popularité puis ordre alphabétique)"""
+    facets = tags_index.get().facets()
+    return jsonify({
+        "tags": [{"name": tag, "count": count} for tag, count in facets]
+    })
+
+def tag_list_arg(name):
+    """Paramètre de requête "a,b,c" -> ['a', 'b', 'c'] (mêmes règles que clean_tags)"""
+    return clean_tags(request.args.get(name, '').split(','))
+
+@app.route('/api/tags/query', methods=['GET'])
+def query_tags():
+    """
+    Pages sélectionnées par tags et facettes de la sélection
+    ?all=a,b (ET) &any=c,d (OU) &not=e (SAUF)
+    """
+    index = tags_index.get()
+    bits = index.select(tag_list_arg('all'), tag_list_arg('any'), tag_list_arg('not'))
+    slugs = index.slugs(bits)
     return jsonify({
-        "tags": [{"name": tag, "count": count} for tag, count in sorted_tags]
+        "count": len(slugs),
+        "slugs": slugs,
+        "facets": [{"name": tag, "count": count} for tag, count in index.facets(bits)]
     })
 
 if __name__ == '__main__':
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    init_storage()
+    # threaded : les flux SSE ne bloquent pas les autres requêtes
+    app.run(debug=True, port=5000, threaded=True)
\ No newline at end of file
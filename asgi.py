@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+asgi.py - Point d'entrée ASGI (uvicorn)
+
+Les lectures des pages générées (/wiki/, /wiki/<slug>, /pages/<slug>/) sont
+servies directement par la boucle asyncio depuis le cache mémoire de app.py :
+un seul worker tient des milliers de lecteurs simultanés sans occuper de
+thread. Les pages absentes du cache sont lues dans un thread puis mises en
+cache.
+
+La collaboration temps réel est aussi servie par la boucle : les flux SSE
+(/api/pages/<slug>/events, collab.async_event_stream) et la diffusion des
+opérations (/api/pages/<slug>/ops) n'occupent aucun thread, quel que soit
+le nombre d'éditeurs connectés.
+
+Toutes les autres requêtes (éditeur, API, images, 404...) passent par
+l'application Flask via l'adaptateur WSGI -> ASGI d'asgiref.
+
+Usage:
+    pip install uvicorn asgiref
+    uvicorn asgi:application --host 0.0.0.0 --port 5000
+
+Un seul worker tant que la collaboration est active : le canal des éditeurs
+est propre à un processus (gunicorn.conf.py : WIKI_COLLAB=1 gunicorn -c gunicorn.conf.py).
+"""
+
+import asyncio
+import re
+from urllib.parse import parse_qs
+
+try:
+    from asgiref.wsgi import WsgiToAsgi
+except ImportError as e:
+    raise ImportError("asgi.py nécessite asgiref : pip install uvicorn asgiref") from e
+
+import collab
+import json_codec
+import app as wiki_app
+
+HOME_PATHS = ('/wiki/', '/wiki/index.html')
+
+# Mêmes règles que les routes Flask de viewer()
+PAGE_PATH_PATTERN = re.compile(r'^/(?:wiki/([^/]+)|pages/([^/]+)/)$')
+
+# Mêmes chemins que page_events() et publish_page_ops()
+COLLAB_PATH_PATTERN = re.compile(r'^/api/pages/([^/]+)/(events|ops)$')
+
+SSE_HEADERS = [
+    (b'content-type', b'text/event-stream; charset=utf-8'),
+    (b'cache-control', b'no-cache'),
+    (b'x-accel-buffering', b'no'),
+]
+
+
+def resolve_read_path(path):
+    """Fichier HTML généré servi pour un chemin d'URL (None si non géré ici)"""
+    if path in HOME_PATHS:
+        return wiki_app.BASE_DIR / 'wiki' / 'index.html'
+    match = PAGE_PATH_PATTERN.match(path)
+    if match is None:
+        return None
+    slug = match.group(1) or match.group(2)
+    if slug.startswith('.'):
+        return None
+    return wiki_app.get_page_dir(slug) / 'index.html'
+
+def _header(scope, name):
+    for key, value in scope.get('headers', ()):
+        if key == name:
+            return value.decode('latin-1')
+    return None
+
+async def send_json(send, status, data):
+    body = json_codec.dumpb(data)
+    await send({'type': 'http.response.start', 'status': status, 'headers': [
+        (b'content-type', b'application/json'),
+        (b'content-length', str(len(body)).encode('latin-1')),
+    ]})
+    await send({'type': 'http.response.body', 'body': body})
+
+async def read_body(receive):
+    """Corps complet de la requête (None si le client s'est déconnecté)"""
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+async def wait_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+class CachedReadApp:
+    """Sert les pages générées depuis le cache et la collaboration, délègue le reste à Flask"""
+
+    def __init__(self, flask_app, cache, channel):
+        self.fallback = WsgiToAsgi(flask_app)
+        self.cache = cache
+        self.channel = channel
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and collab.is_enabled():
+            match = COLLAB_PATH_PATTERN.match(scope['path'])
+            if match is not None:
+                slug, action = match.groups()
+                if action == 'events' and scope['method'] == 'GET':
+                    await self.stream_events(scope, receive, send, slug)
+                    return
+                if action == 'ops' and scope['method'] == 'POST':
+                    await self.publish_ops(receive, send, slug)
+                    return
+
+        if scope['type'] == 'http' and scope['method'] in ('GET', 'HEAD'):
+            path = resolve_read_path(scope['path'])
+            if path is not None:
+                entry = self.cache.peek(path)
+                if entry is not None:
+                    wiki_app.PAGE_CACHE_TOTAL.labels('hit').inc()
+                else:
+                    entry = await asyncio.to_thread(self.cache.get, path)
+                    if entry is not None:
+                        wiki_app.PAGE_CACHE_TOTAL.labels('miss').inc()
+                if entry is not None:
+                    await self.send_entry(scope, send, entry)
+                    return
+
+        await self.fallback(scope, receive, send)
+
+    async def stream_events(self, scope, receive, send, slug):
+        """Flux SSE d'un éditeur (équivalent asyncio de page_events)"""
+        query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+        client_id = query.get('client', [None])[0]
+        if not client_id:
+            await send_json(send, 400, {"error": "client requis"})
+            return
+
+        await send({'type': 'http.response.start', 'status': 200, 'headers': SSE_HEADERS})
+        stream = collab.async_event_stream(self.channel, slug, client_id)
+        disconnected = asyncio.ensure_future(wait_disconnect(receive))
+        try:
+            while True:
+                next_chunk = asyncio.ensure_future(stream.__anext__())
+                await asyncio.wait({next_chunk, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+                if not next_chunk.done():
+                    # Client parti : l'annulation désabonne (finally du générateur)
+                    next_chunk.cancel()
+                    await asyncio.gather(next_chunk, return_exceptions=True)
+                    return
+                try:
+                    chunk = next_chunk.result()
+                except StopAsyncIteration:
+                    break
+                await send({'type': 'http.response.body', 'body': chunk.encode('utf-8'), 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            disconnected.cancel()
+            await stream.aclose()
+
+    async def publish_ops(self, receive, send, slug):
+        """Diffusion d'un lot d'opérations (équivalent asyncio de publish_page_ops)"""
+        body = await read_body(receive)
+        if body is None:
+            return
+        try:
+            data = json_codec.loads(body) if body.strip() else {}
+        except ValueError:
+            data = None
+        message, error = wiki_app.ops_message(data)
+        if error:
+            await send_json(send, 400, {"error": error})
+            return
+        delivered = self.channel.publish(slug, message, sender=message['client'])
+        await send_json(send, 200, {"success": True, "delivered": delivered})
+
+    async def send_entry(self, scope, send, entry):
+        headers = [
+            (b'etag', entry.etag.encode('latin-1')),
+            (b'last-modified', entry.last_modified.encode('latin-1')),
+            (b'cache-control', b'no-cache'),
+        ]
+        if_none_match = _header(scope, b'if-none-match')
+        if if_none_match is not None and (if_none_match.strip() == '*' or entry.etag in if_none_match):
+            await send({'type': 'http.response.start', 'status': 304, 'headers': headers})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+
+        headers += [
+            (b'content-type', b'text/html; charset=utf-8'),
+            (b'content-length', str(len(entry.body)).encode('latin-1')),
+        ]
+        await send({'type': 'http.response.start', 'status': 200, 'headers': headers})
+        body = b'' if scope['method'] == 'HEAD' else entry.body
+        await send({'type': 'http.response.body', 'body': body})
+
+
+application = CachedReadApp(wiki_app.create_app(), wiki_app.html_cache, wiki_app.live_channel)
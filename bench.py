@@ -0,0 +1,473 @@
+#!/usr/bin/env python3
+"""
+bench.py - Benchmarks du wiki sur des jeux de données synthétiques
+
+Pour chaque taille (N pages × M composants), génère un wiki factice dans
+un dossier temporaire (copie du code + pages générées) puis mesure dans
+un processus dédié :
+- latence de update_page (PUT /api/pages/<slug> via le client de test Flask)
+- débit de regenerate_all (pages/s)
+- durée de generate_wiki_home
+- taille des fichiers produits
+- pic de mémoire (RSS)
+
+--imports mesure en plus le temps d'import des modules (python -X importtime)
+et vérifie que les modules sans Flask (core, scripts CLI) ne l'importent pas.
+
+--layouts compare les formats de stockage des layouts (core/layouts.py) :
+durée d'écriture et de lecture, taille sur le disque.
+
+Les résultats sont écrits en JSON et peuvent être comparés à une référence.
+
+Usage:
+    python bench.py [--sizes 10x5,100x10] [--output bench-results.json]
+                    [--baseline FICHIER] [--threshold 0.1] [--updates N] [--seed S]
+                    [--imports] [--layouts 200,2000,10000] [--sizes none]
+"""
+
+import argparse
+import contextlib
+import io
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import json_codec
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+if sys.platform.startswith('win'):
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
+
+BASE_DIR = Path(__file__).parent
+
+RESULTS_FORMAT_VERSION = 1
+DEFAULT_SIZES = '10x5,100x10,300x20'
+DEFAULT_OUTPUT = 'bench-results.json'
+
+# Répartition des types de composants (proche des pages réelles)
+COMPONENT_MIX = {
+    'text': 0.55,
+    'gallery': 0.12,
+    'table': 0.12,
+    'image': 0.08,
+    'separator': 0.08,
+    'shape': 0.05,
+}
+
+TAGS = ['pays', 'personnage', 'lieu', 'faction', 'histoire', 'religion',
+        'économie', 'armée', 'culture', 'technologie', 'événement', 'ville']
+
+# Proportion de paragraphes contenant un lien interne
+LINK_DENSITY = 0.3
+
+WORDS = ('empire fédération frontière traité conseil guerre alliance port '
+         'province dynastie marché flotte capitale révolte archive colonie '
+         'ordre temple route fleuve montagne assemblée couronne légion').split()
+
+# Métriques comparées avec la référence (True = plus grand est meilleur)
+METRICS = {
+    'update_page_mean_ms': False,
+    'update_page_p95_ms': False,
+    'regenerate_all_s': False,
+    'regenerate_pages_per_s': True,
+    'wiki_home_ms': False,
+    'output_bytes': False,
+    'peak_rss_kb': False,
+    'import_ms': False,
+    'layout_save_ms': False,
+    'layout_load_ms': False,
+    'layout_bytes': False,
+}
+
+# Modules dont le temps d'import est mesuré (True = doit rester sans Flask)
+IMPORT_TARGETS = {
+    'core.storage': True,
+    'core.render': True,
+    'regenerate_all': True,
+    'generate_wiki_pages': True,
+    'export': True,
+    'app': False,
+}
+
+
+# --- Wiki synthétique ---
+
+def _sentence(rng, words=12):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+def _text_content(rng, slugs, titles):
+    paragraphs = [f'<h2>{_sentence(rng, 3)[:-1]}</h2>']
+    for _ in range(rng.randint(1, 4)):
+        paragraph = _sentence(rng, rng.randint(15, 60))
+        if slugs and rng.random() < LINK_DENSITY:
+            target = rng.randrange(len(slugs))
+            paragraph += f' Voir <a href="/wiki/{slugs[target]}">{titles[target]}</a>.'
+        paragraphs.append(f'<p>{paragraph}</p>')
+    return '\n'.join(paragraphs)
+
+def _table_content(rng):
+    rows = ''.join(
+        '<tr>' + ''.join(f'<td>{rng.choice(WORDS)}</td>' for _ in range(4)) + '</tr>'
+        for _ in range(rng.randint(2, 8))
+    )
+    return f'<table><tbody>{rows}</tbody></table>'
+
+def make_component(rng, index, slug, slugs, titles):
+    """Crée un composant aléatoire selon COMPONENT_MIX"""
+    comp_type = rng.choices(list(COMPONENT_MIX), weights=list(COMPONENT_MIX.values()))[0]
+    comp = {
+        'id': f'comp-{index}',
+        'type': comp_type,
+        'x': rng.randrange(0, 1200, 10),
+        'y': index * 220,
+        'w': rng.randrange(200, 900, 10),
+        'h': rng.randrange(80, 400, 10),
+        'z': index + 1,
+    }
+    if comp_type == 'text':
+        comp['content'] = _text_content(rng, slugs, titles)
+    elif comp_type == 'table':
+        comp['content'] = _table_content(rng)
+    elif comp_type == 'gallery':
+        comp['images'] = [f'/pages/{slug}/images/img-{index}-{i}.jpg' for i in range(rng.randint(1, 6))]
+    elif comp_type == 'image':
+        comp['image_path'] = f'/pages/{slug}/images/img-{index}.jpg'
+    elif comp_type == 'shape':
+        comp['bg_color'] = rng.choice(['#333', '#4a9eff', '#8b0000'])
+    if rng.random() < 0.1:
+        comp['custom_css'] = 'border: 1px solid #444;'
+    return comp
+
+def generate_synthetic_wiki(root, pages, components, seed=0):
+    """
+    Écrit data/inventory.json et pages/<slug>/layout.json dans root
+    Le contenu est déterministe pour un seed donné
+    """
+    rng = random.Random(seed)
+    root = Path(root)
+    titles = [f'{_sentence(rng, 2)[:-1]} {i}' for i in range(pages)]
+    slugs = [f'page-{i:05d}' for i in range(pages)]
+
+    inventory = []
+    for i, (slug, title) in enumerate(zip(slugs, titles)):
+        page_dir = root / 'pages' / slug
+        (page_dir / 'images').mkdir(parents=True, exist_ok=True)
+        layout = [make_component(rng, c, slug, slugs, titles) for c in range(components)]
+        (page_dir / 'layout.json').write_bytes(json_codec.dumpb(layout, pretty=True))
+
+        # Distribution de tags à longue traîne (quelques tags très utilisés)
+        tag_count = min(len(TAGS), int(rng.paretovariate(1.5)))
+        inventory.append({
+            'title': title,
+            'slug': slug,
+            'hidden_from_nav': rng.random() < 0.05,
+            'created_at': datetime(2025, 1, 1).isoformat(),
+            'tags': sorted({TAGS[min(int(rng.expovariate(0.4)), len(TAGS) - 1)] for _ in range(tag_count)})
+        })
+
+    (root / 'data').mkdir(parents=True, exist_ok=True)
+    (root / 'data' / 'inventory.json').write_bytes(json_codec.dumpb(inventory, pretty=True))
+    return inventory
+
+def prepare_workspace(root):
+    """Copie le code de l'application (sans les données) dans root"""
+    root = Path(root)
+    for path in BASE_DIR.glob('*.py'):
+        shutil.copy2(path, root / path.name)
+    for name in ('core', 'templates', 'static'):
+        if (BASE_DIR / name).exists():
+            shutil.copytree(BASE_DIR / name, root / name, ignore=shutil.ignore_patterns('__pycache__'))
+
+
+# --- Mesures (processus dédié, dossier de travail = wiki synthétique) ---
+
+def peak_rss_kb():
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss est en octets sous macOS, en Ko sous Linux
+    return usage // 1024 if sys.platform == 'darwin' else usage
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def output_bytes(root):
+    files = [*root.glob('pages/*/index.html'), root / 'wiki' / 'index.html', root / 'wiki' / '404.html']
+    return sum(path.stat().st_size for path in files if path.exists())
+
+def run_worker(spec):
+    """Exécute les mesures dans le wiki synthétique du dossier courant"""
+    root = Path.cwd()
+    sink = io.StringIO()
+
+    with contextlib.redirect_stdout(sink):
+        started = time.perf_counter()
+        import app
+        import generate_wiki_pages
+        import regenerate_all
+        import_s = time.perf_counter() - started
+
+        # Construction complète
+        started = time.perf_counter()
+        regenerate_all.main()
+        regenerate_s = time.perf_counter() - started
+
+        home_times = []
+        for _ in range(spec['repeat']):
+            started = time.perf_counter()
+            generate_wiki_pages.generate_wiki_home()
+            home_times.append(time.perf_counter() - started)
+        generate_wiki_pages.generate_404_page()
+
+        # Sauvegardes via le client de test (chaîne complète de update_page)
+        rng = random.Random(spec['seed'])
+        inventory = app.load_inventory()
+        client = app.app.test_client()
+        latencies = []
+        for i in range(spec['updates']):
+            slug = rng.choice(inventory)['slug']
+            layout = app.load_layout(slug)
+            if layout:
+                layout[rng.randrange(len(layout))]['x'] += 10
+            started = time.perf_counter()
+            response = client.put(f'/api/pages/{slug}', json={'layout': layout})
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                raise RuntimeError(f"update_page {slug}: HTTP {response.status_code}")
+
+    pages = len(inventory)
+    return {
+        'pages': pages,
+        'components': spec['components'],
+        'import_s': round(import_s, 4),
+        'regenerate_all_s': round(regenerate_s, 4),
+        'regenerate_pages_per_s': round(pages / regenerate_s, 2) if regenerate_s else None,
+        'wiki_home_ms': round(statistics.median(home_times) * 1000, 2),
+        'update_page_mean_ms': round(statistics.mean(latencies) * 1000, 2) if latencies else None,
+        'update_page_p50_ms': round(percentile(latencies, 0.5) * 1000, 2) if latencies else None,
+        'update_page_p95_ms': round(percentile(latencies, 0.95) * 1000, 2) if latencies else None,
+        'output_bytes': output_bytes(root),
+        'peak_rss_kb': peak_rss_kb(),
+    }
+
+
+# --- Temps d'import ---
+
+def measure_import(module, runs=5):
+    """
+    Importe module dans un interpréteur neuf avec -X importtime
+    Retourne (meilleur temps cumulé en ms, ensemble des modules importés)
+    """
+    best = None
+    imported = set()
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+            cwd=BASE_DIR,
+            capture_output=True,
+            text=True,
+            encoding='utf-8'
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"Import de {module} impossible:\n{result.stderr}")
+        for line in result.stderr.splitlines():
+            # import time:   self [us] | cumulative | imported package
+            if not line.startswith('import time:') or '|' not in line:
+                continue
+            _self_us, cumulative_us, name = line[len('import time:'):].split('|')
+            name = name.strip()
+            imported.add(name)
+            if name == module and cumulative_us.strip().isdigit():
+                cumulative_ms = int(cumulative_us) / 1000
+                best = cumulative_ms if best is None else min(best, cumulative_ms)
+    return best, imported
+
+def run_import_benchmark(results):
+    """Ajoute les temps d'import aux résultats, retourne le nombre d'échecs"""
+    failures = 0
+    print("\n⏱️ Temps d'import (-X importtime, meilleur de 5)")
+    for module, flask_free in IMPORT_TARGETS.items():
+        import_ms, imported = measure_import(module)
+        flask_loaded = 'flask' in imported
+        results['cases'][f'import:{module}'] = {'import_ms': import_ms, 'flask_loaded': flask_loaded}
+        marker = '  '
+        if flask_free and flask_loaded:
+            marker = '❌'
+            failures += 1
+        print(f"   {marker} {module:<22} {import_ms:>8.1f} ms{'  (Flask importé)' if flask_loaded else ''}")
+    return failures
+
+
+# --- Formats de stockage des layouts ---
+
+def run_layout_benchmark(results, counts, seed=0, runs=5):
+    """
+    Sauvegarde/chargement d'un gros layout dans chaque format disponible
+    (core/layouts.py), comparés au JSON indenté historique
+    """
+    from core import layouts
+
+    print("\n⏱️ Formats de layout (meilleur de 5)")
+    for count in counts:
+        rng = random.Random(seed)
+        slugs = [f'page-{i:05d}' for i in range(100)]
+        titles = [f'{_sentence(rng, 2)[:-1]} {i}' for i in range(100)]
+        layout = [make_component(rng, c, 'page-00000', slugs, titles) for c in range(count)]
+
+        print(f"   {count} composants:")
+        for name, codec in layouts.FORMATS.items():
+            if not codec.available:
+                print(f"     {name:<14} indisponible (pip install {codec.requirement})")
+                continue
+            with tempfile.TemporaryDirectory(prefix='wiki-layout-') as tmp:
+                repository = layouts.LayoutRepository(lambda slug: Path(tmp), name)
+                save_times, load_times = [], []
+                for _ in range(runs):
+                    started = time.perf_counter()
+                    path = repository.save('page-00000', layout)
+                    save_times.append(time.perf_counter() - started)
+                    started = time.perf_counter()
+                    loaded = repository.load('page-00000')
+                    load_times.append(time.perf_counter() - started)
+                if loaded != layout:
+                    raise RuntimeError(f"Format {name} : le layout relu diffère")
+                metrics = {
+                    'layout_save_ms': round(min(save_times) * 1000, 3),
+                    'layout_load_ms': round(min(load_times) * 1000, 3),
+                    'layout_bytes': path.stat().st_size,
+                }
+            results['cases'][f'layout:{count}:{name}'] = metrics
+            print(f"     {name:<14} écriture {metrics['layout_save_ms']:>8.2f} ms   "
+                  f"lecture {metrics['layout_load_ms']:>8.2f} ms   {metrics['layout_bytes'] / 1024:>8.0f} Ko")
+
+
+# --- Orchestration ---
+
+def parse_sizes(text):
+    """'10x5,100x10' -> [(10, 5), (100, 10)] ('none' -> [])"""
+    sizes = []
+    if text.strip().lower() == 'none':
+        return sizes
+    for item in text.split(','):
+        pages, _, components = item.strip().partition('x')
+        sizes.append((int(pages), int(components or 10)))
+    return sizes
+
+def run_case(pages, components, updates=20, repeat=3, seed=0):
+    """Génère un wiki N×M dans un dossier temporaire et retourne ses mesures"""
+    with tempfile.TemporaryDirectory(prefix='wiki-bench-') as tmp:
+        root = Path(tmp)
+        prepare_workspace(root)
+        generate_synthetic_wiki(root, pages, components, seed=seed)
+
+        spec = {'components': components, 'updates': updates, 'repeat': repeat, 'seed': seed}
+        result = subprocess.run(
+            [sys.executable, str(root / 'bench.py'), '--worker', json_codec.dumps(spec)],
+            cwd=root,
+            capture_output=True,
+            text=True,
+            encoding='utf-8'
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"Échec du benchmark {pages}x{components}:\n{result.stderr}")
+        return json_codec.loads(result.stdout.strip().splitlines()[-1])
+
+def compare(results, baseline, threshold):
+    """
+    Affiche l'écart avec la référence pour chaque métrique
+    Retourne le nombre de régressions au-delà du seuil
+    """
+    regressions = 0
+    print(f"\n📏 Comparaison avec la référence (seuil {threshold:.0%})")
+    for case, metrics in results['cases'].items():
+        reference = baseline.get('cases', {}).get(case)
+        if reference is None:
+            print(f"   {case}: absent de la référence")
+            continue
+        print(f"   {case}:")
+        for name, higher_is_better in METRICS.items():
+            current, previous = metrics.get(name), reference.get(name)
+            if not current or not previous:
+                continue
+            change = (current - previous) / previous
+            worse = -change if higher_is_better else change
+            marker = '❌' if worse > threshold else ('✅' if worse < -threshold else '  ')
+            regressions += worse > threshold
+            print(f"     {marker} {name:<24} {previous:>12} → {current:>12} ({change:+.1%})")
+    return regressions
+
+def main(argv=None):
+    """Point d'entrée principal"""
+    parser = argparse.ArgumentParser(description="Benchmarks du wiki sur des données synthétiques")
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help="Tailles PAGESxCOMPOSANTS séparées par des virgules")
+    parser.add_argument('--updates', type=int, default=20, help="Nombre de sauvegardes mesurées par taille")
+    parser.add_argument('--repeat', type=int, default=3, help="Répétitions de generate_wiki_home")
+    parser.add_argument('--seed', type=int, default=0, help="Graine du générateur de contenu")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="Fichier de résultats JSON")
+    parser.add_argument('--baseline', default=None, help="Résultats de référence à comparer")
+    parser.add_argument('--threshold', type=float, default=0.1, help="Écart toléré avant régression (0.1 = 10%%)")
+    parser.add_argument('--imports', action='store_true', help="Mesurer aussi les temps d'import des modules")
+    parser.add_argument('--layouts', default=None,
+                        help="Composants par layout pour comparer les formats de stockage (ex : 200,2000,10000)")
+    parser.add_argument('--worker', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        print(json_codec.dumps(run_worker(json_codec.loads(args.worker))))
+        return 0
+
+    results = {
+        'format': RESULTS_FORMAT_VERSION,
+        'created_at': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': args.seed,
+        'cases': {}
+    }
+
+    print("\n" + "="*70)
+    print("BENCHMARKS")
+    print("="*70)
+
+    for pages, components in parse_sizes(args.sizes):
+        case = f'{pages}x{components}'
+        print(f"\n⏱️ {case} ({pages} pages, {components} composants/page)...")
+        metrics = run_case(pages, components, updates=args.updates, repeat=args.repeat, seed=args.seed)
+        results['cases'][case] = metrics
+        print(f"   • update_page: {metrics['update_page_mean_ms']} ms (p95 {metrics['update_page_p95_ms']} ms)")
+        print(f"   • regenerate_all: {metrics['regenerate_all_s']} s ({metrics['regenerate_pages_per_s']} pages/s)")
+        print(f"   • generate_wiki_home: {metrics['wiki_home_ms']} ms")
+        print(f"   • Sortie: {metrics['output_bytes'] / 1024:.0f} Ko, pic RSS: {metrics['peak_rss_kb']} Ko")
+
+    if args.layouts:
+        run_layout_benchmark(results, [int(n) for n in args.layouts.split(',')], seed=args.seed)
+
+    failures = run_import_benchmark(results) if args.imports else 0
+    if failures:
+        print(f"\n❌ {failures} module(s) sans Flask importent Flask")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        f.write(json_codec.dumps(results, pretty=True))
+    print(f"\n💾 Résultats écrits dans {args.output}")
+
+    if args.baseline:
+        baseline = json_codec.load_file(args.baseline)
+        failures += compare(results, baseline, args.threshold)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
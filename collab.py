@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+collab.py - Canal de diffusion temps réel entre éditeurs d'une même page
+N'a AUCUNE dépendance avec Flask/app.py
+
+Les éditeurs s'abonnent à une page (Server-Sent Events) et publient des
+opérations par composant (voir layout_ops.py). Chaque message est
+rediffusé aux autres abonnés de la même page, jamais à son émetteur.
+
+Deux sortes d'abonnés partagent le même canal :
+- event_stream() : générateur bloquant, un thread par client (Flask/WSGI)
+- async_event_stream() : générateur asyncio, servi par asgi.py sans
+  occuper de thread ; publish() peut être appelé depuis n'importe quel
+  thread (routes Flask exécutées par l'adaptateur WSGI)
+
+Le canal est propre à un processus. Active par défaut (serveur de
+développement, uvicorn) ; gunicorn.conf.py la désactive pour servir
+plusieurs workers, sauf en mode collaboration (WIKI_COLLAB=1, un seul worker).
+
+Un abonné trop lent (MAX_PENDING messages en attente) est désabonné : sa
+file est vidée et ne contient plus que RESYNC, envoyé au client avant la
+fermeture du flux pour qu'il recharge le layout.
+"""
+
+import asyncio
+import os
+import queue
+import threading
+
+import json_codec
+
+ENV_VAR = 'WIKI_COLLAB'
+
+# Nombre max de messages en attente par abonné (au-delà : resynchronisation)
+MAX_PENDING = 1000
+
+# Intervalle des commentaires "keep-alive" SSE (secondes)
+HEARTBEAT_INTERVAL = 15
+
+# Dernier message d'un abonné désabonné pour cause de retard
+RESYNC = {'type': 'resync'}
+
+
+def is_enabled():
+    """Collaboration active (défaut), sauf WIKI_COLLAB=0"""
+    return os.environ.get(ENV_VAR, '1').lower() not in ('0', 'false', 'no')
+
+
+class _Subscriber:
+    """File d'un client : queue.Queue (thread) ou asyncio.Queue (boucle asyncio)"""
+
+    def __init__(self, client_id, loop=None):
+        self.client_id = client_id
+        self.loop = loop
+        self.closed = False    # RESYNC en file : plus aucun message accepté
+        self.queue = asyncio.Queue(MAX_PENDING) if loop else queue.Queue(MAX_PENDING)
+
+    def offer(self, message):
+        """Ajoute un message, False si la file est pleine (remplacée par RESYNC)"""
+        if self.closed:
+            return False
+        if self.loop is not None:
+            # Les files asyncio ne sont pas thread-safe : ajout par la boucle
+            self.loop.call_soon_threadsafe(self._offer_in_loop, message)
+            return True
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except queue.Full:
+            self._replace_with_resync()
+            return False
+
+    def _offer_in_loop(self, message):
+        if self.closed:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self._replace_with_resync()
+
+    def _replace_with_resync(self):
+        self.closed = True
+        while True:
+            try:
+                self.queue.get_nowait()
+                continue
+            except (queue.Empty, asyncio.QueueEmpty):
+                pass
+            try:
+                self.queue.put_nowait(RESYNC)
+                return
+            except (queue.Full, asyncio.QueueFull):
+                continue    # message ajouté entre-temps par un autre thread
+
+
+class Channel:
+    """Abonnés par page : {slug: {abonné: client_id}}"""
+
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, slug, client_id, loop=None):
+        """
+        Abonne un client à une page, retourne son abonné (file dans .queue)
+        loop : boucle asyncio du client (file asyncio.Queue), None pour un thread
+        """
+        subscriber = _Subscriber(client_id, loop)
+        with self._lock:
+            self._subscribers.setdefault(slug, {})[subscriber] = client_id
+        return subscriber
+
+    def unsubscribe(self, slug, subscriber):
+        with self._lock:
+            page_subscribers = self._subscribers.get(slug, {})
+            page_subscribers.pop(subscriber, None)
+            if not page_subscribers:
+                self._subscribers.pop(slug, None)
+
+    def clients(self, slug):
+        """Ids des clients connectés à une page"""
+        with self._lock:
+            return sorted(set(self._subscribers.get(slug, {}).values()))
+
+    def publish(self, slug, message, sender=None):
+        """
+        Diffuse un message aux abonnés d'une page (sauf l'émetteur)
+        Retourne le nombre de destinataires
+        """
+        with self._lock:
+            targets = [
+                subscriber for subscriber, client_id in self._subscribers.get(slug, {}).items()
+                if client_id != sender
+            ]
+
+        delivered = 0
+        for subscriber in targets:
+            if subscriber.offer(message):
+                delivered += 1
+            else:
+                # Client trop lent : son flux lui envoie RESYNC puis se ferme
+                self.unsubscribe(slug, subscriber)
+        return delivered
+
+
+def format_sse(message, event='message'):
+    """Encode un message au format Server-Sent Events"""
+    data = json_codec.dumps(message)
+    return f'event: {event}\ndata: {data}\n\n'
+
+def event_stream(channel, slug, client_id, heartbeat=HEARTBEAT_INTERVAL):
+    """Générateur SSE pour un client (se désabonne à la déconnexion)"""
+    subscriber = channel.subscribe(slug, client_id)
+    channel.publish(slug, {'type': 'join', 'client': client_id}, sender=client_id)
+    try:
+        yield format_sse({'type': 'hello', 'clients': channel.clients(slug)}, event='hello')
+        while True:
+            try:
+                message = subscriber.queue.get(timeout=heartbeat)
+            except queue.Empty:
+                yield ': ping\n\n'
+                continue
+            yield format_sse(message, event=message.get('type', 'message'))
+            if message is RESYNC:
+                return
+    finally:
+        channel.unsubscribe(slug, subscriber)
+        channel.publish(slug, {'type': 'leave', 'client': client_id}, sender=client_id)
+
+async def async_event_stream(channel, slug, client_id, heartbeat=HEARTBEAT_INTERVAL):
+    """Équivalent asyncio d'event_stream (asgi.py) : aucun thread occupé par client"""
+    subscriber = channel.subscribe(slug, client_id, loop=asyncio.get_running_loop())
+    channel.publish(slug, {'type': 'join', 'client': client_id}, sender=client_id)
+    try:
+        yield format_sse({'type': 'hello', 'clients': channel.clients(slug)}, event='hello')
+        while True:
+            try:
+                message = await asyncio.wait_for(subscriber.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield ': ping\n\n'
+                continue
+            yield format_sse(message, event=message.get('type', 'message'))
+            if message is RESYNC:
+                return
+    finally:
+        channel.unsubscribe(slug, subscriber)
+        channel.publish(slug, {'type': 'leave', 'client': client_id}, sender=client_id)
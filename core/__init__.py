@@ -0,0 +1,10 @@
+"""
+core - Stockage et rendu du wiki, sans dépendance à Flask
+
+- core.storage : inventaire, layouts, révisions, métadonnées, verrous
+- core.layouts : formats de stockage des layouts (JSON, MessagePack/CBOR + zstd)
+- core.render : génération de pages/<slug>/index.html
+
+Les scripts (regenerate_all.py, watch.py, export.py) l'importent
+directement au lieu de charger l'application Flask.
+"""
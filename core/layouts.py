@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+core/layouts.py - Formats de stockage des layouts de pages
+N'a AUCUNE dépendance avec Flask/app.py
+
+Le format des nouvelles écritures est choisi par WIKI_LAYOUT_FORMAT :
+    json           layout.json          indenté, éditable à la main (défaut)
+    msgpack        layout.msgpack       pip install msgpack
+    cbor           layout.cbor          pip install cbor2
+    msgpack+zstd   layout.msgpack.zst   + pip install zstandard
+    cbor+zstd      layout.cbor.zst
+
+La lecture reconnaît tous les formats d'après le nom du fichier : un ancien
+layout.json reste lisible et prend le format courant à sa prochaine
+sauvegarde. layout_tool.py exporte un layout en JSON pour l'éditer à la main
+et le réimporte.
+
+    repository = LayoutRepository(get_page_dir)
+    repository.load(slug)            # [] si la page n'a pas de layout
+    repository.save(slug, layout)
+"""
+
+import os
+
+import instrumentation
+import json_codec
+import locks
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+DEFAULT_FORMAT = 'json'
+
+# Niveau zstd : les layouts sont petits, la compression reste sous la milliseconde
+ZSTD_LEVEL = 3
+
+
+class JsonCodec:
+    filename = 'layout.json'
+    available = True
+
+    def encode(self, layout):
+        return json_codec.dumpb(layout, pretty=True)
+
+    def decode(self, data):
+        return json_codec.loads(data)
+
+
+class MsgpackCodec:
+    filename = 'layout.msgpack'
+    available = msgpack is not None
+    requirement = 'msgpack'
+
+    def encode(self, layout):
+        return msgpack.packb(layout, use_bin_type=True)
+
+    def decode(self, data):
+        return msgpack.unpackb(data, raw=False)
+
+
+class CborCodec:
+    filename = 'layout.cbor'
+    available = cbor2 is not None
+    requirement = 'cbor2'
+
+    def encode(self, layout):
+        return cbor2.dumps(layout)
+
+    def decode(self, data):
+        return cbor2.loads(data)
+
+
+class ZstdCodec:
+    """Compression zstd d'un autre format (layout.<format>.zst)"""
+
+    def __init__(self, inner):
+        self.inner = inner
+        self.filename = inner.filename + '.zst'
+        self.available = inner.available and zstandard is not None
+        self.requirement = f'{inner.requirement} zstandard'
+
+    def encode(self, layout):
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(self.inner.encode(layout))
+
+    def decode(self, data):
+        return self.inner.decode(zstandard.ZstdDecompressor().decompress(data))
+
+
+FORMATS = {
+    'json': JsonCodec(),
+    'msgpack': MsgpackCodec(),
+    'cbor': CborCodec(),
+    'msgpack+zstd': ZstdCodec(MsgpackCodec()),
+    'cbor+zstd': ZstdCodec(CborCodec()),
+}
+
+# Noms de fichiers reconnus (surveillance, migrations, diagnostics)
+FILENAMES = tuple(codec.filename for codec in FORMATS.values())
+
+
+def get_codec(name):
+    """Codec d'un format ; ValueError s'il est inconnu ou si sa dépendance manque"""
+    codec = FORMATS.get(name)
+    if codec is None:
+        raise ValueError(f"Format de layout inconnu: {name} (formats : {', '.join(FORMATS)})")
+    if not codec.available:
+        raise ValueError(f"Format de layout {name} indisponible : pip install {codec.requirement}")
+    return codec
+
+
+class LayoutRepository:
+    """Lecture/écriture des layouts, quel que soit leur format sur le disque"""
+
+    def __init__(self, page_dir_for, format_name=None):
+        self.page_dir_for = page_dir_for
+        self.format_name = format_name or os.environ.get('WIKI_LAYOUT_FORMAT', DEFAULT_FORMAT)
+        self.codec = get_codec(self.format_name)
+        # Format courant d'abord : après une sauvegarde, c'est le seul fichier présent
+        self._read_order = [self.codec] + [c for c in FORMATS.values() if c is not self.codec]
+
+    def find(self, slug):
+        """(chemin, codec) du layout enregistré, (None, None) si absent"""
+        page_dir = self.page_dir_for(slug)
+        for codec in self._read_order:
+            path = page_dir / codec.filename
+            if path.exists():
+                return path, codec
+        return None, None
+
+    def path(self, slug):
+        """Fichier du layout : existant, sinon celui qu'écrirait save()"""
+        path, _ = self.find(slug)
+        return path or self.page_dir_for(slug) / self.codec.filename
+
+    def exists(self, slug):
+        return self.find(slug)[0] is not None
+
+    def load(self, slug):
+        """Layout d'une page ([] si absent)"""
+        path, codec = self.find(slug)
+        if path is None:
+            return []
+        if not codec.available:
+            raise ValueError(f"{path.name} illisible : pip install {codec.requirement}")
+        # Lecture et décodage mesurés séparément (comparaison des formats)
+        with instrumentation.span('load.read', slug=slug):
+            data = path.read_bytes()
+        with instrumentation.span('load.parse', slug=slug, file=path.name):
+            return codec.decode(data)
+
+    def save(self, slug, layout):
+        """Écrit le layout au format courant puis supprime les autres formats"""
+        page_dir = self.page_dir_for(slug)
+        path = page_dir / self.codec.filename
+        locks.atomic_write(path, self.codec.encode(layout))
+        for codec in self._read_order[1:]:
+            try:
+                (page_dir / codec.filename).unlink()
+            except FileNotFoundError:
+                pass
+        return path
+
+    def to_json(self, slug):
+        """Layout au format JSON indenté (édition à la main)"""
+        return json_codec.dumps(self.load(slug), pretty=True)
@@ -0,0 +1,906 @@
+#!/usr/bin/env python3
+"""
+core/render.py - Génération du HTML des pages (pages/<slug>/index.html)
+N'a AUCUNE dépendance avec Flask/app.py (utilisable par les scripts CLI)
+"""
+
+import hashlib
+import re
+
+import critical_css
+import instrumentation
+import json_codec
+import metrics
+import locks
+import minify
+import page_cache
+from core.storage import (
+    DATA_DIR, SAVE_STAGE_DURATION, generate_pages_metadata, get_page_dir, load_inventory, render_lock
+)
+
+COMPONENT_CACHE_TOTAL = metrics.counter(
+    'wiki_component_cache_total', "Composants servis depuis le cache HTML ou re-rendus", ('result',))
+
+# Pages générées servies depuis la mémoire (validées par os.stat à chaque requête)
+html_cache = page_cache.PageCache()
+
+# CSS/JS personnalisés des composants : un fichier de chaque par page, nommé
+# d'après son contenu (pages/<slug>/custom.<empreinte>.css|js)
+CUSTOM_ASSET_PATTERN = re.compile(r'^custom\.[0-9a-f]{10}\.(?:css|js)$')
+
+# Empreinte du layout du dernier rendu (pages/<slug>/.render-source) :
+# index.html n'est réécrit que si son contenu change, sa date ne dit donc
+# pas s'il est à jour (diagnostic.py compare les empreintes)
+RENDER_SOURCE_FILE = '.render-source'
+
+
+def layout_digest(layout):
+    """Empreinte d'un layout, indépendante de son format de stockage"""
+    return hashlib.sha256(json_codec.dumpb(layout, sort_keys=True)).hexdigest()
+
+def _fallback_slugify(text):
+    text = text.lower()
+    text = re.sub(r'[^\w\s-]', '', text)
+    text = re.sub(r'[-\s]+', '-', text)
+    return text.strip('-')
+
+_slugify = None
+
+def slugify(text):
+    """python-slugify si installé (importé au premier titre rencontré)"""
+    global _slugify
+    if _slugify is None:
+        try:
+            from slugify import slugify as _slugify
+        except ImportError:
+            _slugify = _fallback_slugify
+    return _slugify(text)
+
+
+# Cache du HTML rendu par composant : {slug: {comp_id: (composant, html)}}
+# Le composant est conservé pour vérifier l'entrée : un autre worker a pu
+# modifier la page depuis le dernier rendu de ce processus
+_component_html_cache = {}
+
+def generate_html(slug, layout, touched=None):
+    """
+    Génère le fichier index.html avec prévisualisations statiques
+    touched : ids modifiés depuis le dernier rendu (None = tout re-rendre)
+    
+    Les rendus d'une même page sont sérialisés (render_lock) ; la page est
+    publiée atomiquement : un lecteur ne voit jamais de fichier tronqué
+    """
+    index_file = get_page_dir(slug) / 'index.html'
+    
+    with render_lock(slug):
+        with SAVE_STAGE_DURATION.labels('render').time(), instrumentation.span('render.page', slug=slug):
+            html = render_page_html(slug, layout, touched)
+            custom_assets = render_custom_assets(layout)
+        html, before, after = minify.process(html)
+        
+        # Publier le fichier (CSS/JS personnalisés avant la page qui les référence)
+        try:
+            with SAVE_STAGE_DURATION.labels('write').time(), instrumentation.span('write.page', slug=slug):
+                for name, content in custom_assets.items():
+                    locks.write_if_changed(index_file.parent / name, content)
+                written = locks.write_if_changed(index_file, html, durable=True)
+                locks.write_if_changed(index_file.parent / RENDER_SOURCE_FILE, layout_digest(layout) + '\n')
+                prune_custom_assets(index_file.parent, custom_assets)
+            if written:
+                html_cache.invalidate(index_file)
+                instrumentation.count('pages_written')
+                instrumentation.count('bytes_written', len(html.encode('utf-8')))
+                print(f"✅ HTML généré pour {slug}" + (f" (minifié : {minify.describe(before, after)})" if minify.is_enabled() else ""))
+            else:
+                instrumentation.count('pages_unchanged')
+                print(f"✅ HTML inchangé pour {slug}")
+        except Exception as e:
+            print(f"❌ Erreur écriture HTML pour {slug}: {e}")
+            raise
+
+# JSON des métadonnées inséré dans chaque page : (clé os.stat du fichier, JSON)
+# regenerate_all.py le sérialise une fois au lieu d'une fois par page
+_metadata_json_cache = (None, None)
+
+def load_pages_metadata_json():
+    """JSON compact de data/pages-metadata.json (généré s'il est absent ou vide)"""
+    global _metadata_json_cache
+    metadata_file = DATA_DIR / 'pages-metadata.json'
+    try:
+        stat = metadata_file.stat()
+        key = (stat.st_mtime_ns, stat.st_size)
+    except FileNotFoundError:
+        key = None
+    
+    cached_key, cached_json = _metadata_json_cache
+    if key is not None and key == cached_key:
+        return cached_json
+    
+    pages_metadata = {}
+    if key is not None:
+        try:
+            with instrumentation.span('load.metadata'):
+                pages_metadata = json_codec.load_file(metadata_file)
+        except Exception as e:
+            print(f"⚠️ Erreur lecture métadonnées: {e}")
+            pages_metadata = {}
+    
+    # Si pas de métadonnées, les générer
+    if not pages_metadata:
+        print("⚠️ Métadonnées vides, génération...")
+        return json_codec.dumps(generate_pages_metadata())
+    
+    metadata_json = json_codec.dumps(pages_metadata)
+    _metadata_json_cache = (key, metadata_json)
+    return metadata_json
+
+def _split_declarations(css):
+    """Déclarations d'un style inline ("a: b; c: d"), sans couper url(...;...) ni les chaînes"""
+    declarations = []
+    current = ''
+    depth = 0
+    quote = None
+    for char in css:
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in '"\'':
+            quote = char
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth = max(0, depth - 1)
+        elif char == ';' and depth == 0:
+            declarations.append(current.strip())
+            current = ''
+            continue
+        current += char
+    declarations.append(current.strip())
+    # Accolades ignorées : une déclaration ne doit pas sortir de sa règle
+    return [d for d in declarations if ':' in d and '{' not in d and '}' not in d]
+
+def custom_css_class(css):
+    """Classe partagée par les composants qui ont le même CSS personnalisé"""
+    return 'cc-' + hashlib.sha256(css.strip().encode('utf-8')).hexdigest()[:8]
+
+def _asset_name(content, extension):
+    return f"custom.{hashlib.sha256(content.encode('utf-8')).hexdigest()[:10]}.{extension}"
+
+def render_custom_assets(layout):
+    """
+    CSS et JS personnalisés d'une page : {nom de fichier: contenu}
+    
+    - CSS : une règle par style distinct (classe cc-<empreinte>), en
+      !important pour garder la priorité qu'avait l'attribut style
+    - JS : un script par code distinct, exécuté pour chaque composant qui
+      l'utilise (element = le composant) après le chargement, quand le
+      navigateur est inactif
+    """
+    rules = {}
+    scripts = {}
+    for comp in sorted(layout, key=lambda x: x.get('z', 0)):
+        css = (comp.get('custom_css') or '').strip()
+        if css:
+            declarations = [
+                d if d.lower().replace(' ', '').endswith('!important') else f'{d} !important'
+                for d in _split_declarations(css)
+            ]
+            if declarations:
+                rules[custom_css_class(css)] = '; '.join(declarations)
+        code = (comp.get('custom_js') or '').strip()
+        if code and comp.get('id'):
+            scripts.setdefault(code, []).append(comp['id'])
+    
+    assets = {}
+    if rules:
+        css = '/* CSS personnalisé des composants (généré) */\n' + ''.join(
+            f'.component.{name} {{ {body} }}\n' for name, body in sorted(rules.items())
+        )
+        assets[_asset_name(css, 'css')] = css
+    if scripts:
+        js = CUSTOM_JS_TEMPLATE.replace('__SCRIPTS__', json_codec.dumps([[code, ids] for code, ids in scripts.items()]))
+        assets[_asset_name(js, 'js')] = js
+    return assets
+
+def prune_custom_assets(page_dir, keep):
+    """Supprime les anciens custom.<empreinte>.css|js d'une page"""
+    for path in page_dir.glob('custom.*'):
+        if CUSTOM_ASSET_PATTERN.match(path.name) and path.name not in keep:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+# Exécution différée du JS personnalisé : une erreur (même de syntaxe) dans un
+# composant n'empêche pas les autres de s'exécuter
+CUSTOM_JS_TEMPLATE = '''/* JS personnalisé des composants (généré) */
+(function () {
+    const scripts = __SCRIPTS__;
+
+    function run() {
+        for (const [code, ids] of scripts) {
+            let fn;
+            try {
+                fn = new Function('element', code);
+            } catch (e) {
+                console.error('❌ JS personnalisé invalide (' + ids.join(', ') + ')', e);
+                continue;
+            }
+            for (const id of ids) {
+                const element = document.getElementById(id);
+                if (!element) continue;
+                try {
+                    fn.call(element, element);
+                } catch (e) {
+                    console.error('❌ JS personnalisé (' + id + ')', e);
+                }
+            }
+        }
+    }
+
+    function schedule() {
+        if ('requestIdleCallback' in window) {
+            requestIdleCallback(run, { timeout: 2000 });
+        } else {
+            setTimeout(run, 200);
+        }
+    }
+
+    if (document.readyState === 'complete') {
+        schedule();
+    } else {
+        window.addEventListener('load', schedule);
+    }
+})();
+'''
+
+def custom_asset_tags(slug, assets):
+    """<link>/<script defer> des fichiers de render_custom_assets (chemins valables depuis /pages/<slug>/ et /wiki/<slug>)"""
+    tags = []
+    for name in sorted(assets, key=lambda n: (n.endswith('.js'), n)):
+        href = f'../../pages/{slug}/{name}'
+        if name.endswith('.css'):
+            tags.append(f'<link rel="stylesheet" href="{href}">')
+        else:
+            tags.append(f'<script src="{href}" defer></script>')
+    return '\n    '.join(tags)
+
+# Indications de préchargement des médias du premier écran (au plus)
+PRELOAD_IMAGE_LIMIT = 4
+
+def in_first_viewport(comp):
+    return comp.get('y', 0) < critical_css.FIRST_VIEWPORT_HEIGHT
+
+def deferred_stylesheet_tags():
+    """Feuilles des pages (critical_css.SOURCES) chargées sans bloquer l'affichage, <noscript> sinon"""
+    preloads = []
+    links = []
+    for source in critical_css.SOURCES:
+        href = f'../../{source}'
+        preloads.append(f'<link rel="preload" href="{href}" as="style" onload="this.onload=null;this.rel=\'stylesheet\'">')
+        links.append(f'<link rel="stylesheet" href="{href}">')
+    return '\n    '.join(preloads) + f'\n    <noscript>{"".join(links)}</noscript>'
+
+def preload_tags(layout):
+    """<link rel="preload|preconnect"> des images et vidéos YouTube du premier écran, du haut vers le bas"""
+    images = []
+    youtube = False
+    for comp in sorted(layout, key=lambda c: (c.get('y', 0), c.get('x', 0))):
+        if not in_first_viewport(comp):
+            break
+        if comp.get('type') == 'image' and comp.get('image_path'):
+            images.append(comp['image_path'])
+        elif comp.get('type') == 'gallery' and comp.get('images'):
+            images.append(comp['images'][0])
+        elif comp.get('type') == 'youtube':
+            youtube = True
+    
+    tags = [
+        f'<link rel="preload" href="{src}" as="image" fetchpriority="high">'
+        for src in dict.fromkeys(images)
+    ][:PRELOAD_IMAGE_LIMIT]
+    if youtube:
+        tags.append('<link rel="preconnect" href="https://www.youtube.com">')
+    return '\n    '.join(tags)
+
+def render_page_html(slug, layout, touched=None):
+    """Retourne le HTML complet d'une page (sans l'écrire)"""
+    inventory = load_inventory()
+    page_info = next((p for p in inventory if p['slug'] == slug), {})
+    title = page_info.get('title', slug)
+    is_hidden = page_info.get('hidden_from_nav', False)
+    
+    # Calculer hauteur et extraire les titres
+    max_bottom = 0
+    page_headings = []
+    internal_links = set()
+    
+    for comp in layout:
+        bottom = comp['y'] + comp['h']
+        if bottom > max_bottom:
+            max_bottom = bottom
+        
+        if comp.get('type') == 'text' and comp.get('content'):
+            content = comp.get('content', '')
+            
+            # Trouver tous les h1, h2, h3
+            h1_matches = re.findall(r'<h1[^>]*>(.*?)</h1>', content, re.IGNORECASE | re.DOTALL)
+            h2_matches = re.findall(r'<h2[^>]*>(.*?)</h2>', content, re.IGNORECASE | re.DOTALL)
+            h3_matches = re.findall(r'<h3[^>]*>(.*?)</h3>', content, re.IGNORECASE | re.DOTALL)
+            
+            for h1 in h1_matches:
+                clean_text = re.sub(r'<[^>]+>', '', h1).strip()
+                if clean_text:
+                    page_headings.append({'level': 1, 'text': clean_text, 'id': slugify(clean_text)})
+            
+            for h2 in h2_matches:
+                clean_text = re.sub(r'<[^>]+>', '', h2).strip()
+                if clean_text:
+                    page_headings.append({'level': 2, 'text': clean_text, 'id': slugify(clean_text)})
+            
+            for h3 in h3_matches:
+                clean_text = re.sub(r'<[^>]+>', '', h3).strip()
+                if clean_text:
+                    page_headings.append({'level': 3, 'text': clean_text, 'id': slugify(clean_text)})
+            
+            # Extraire les liens internes
+            internal_link_matches = re.findall(r'href="\.\.\/([^\/]+)\/"', content)
+            internal_links.update(internal_link_matches)
+    
+    # Métadonnées de toutes les pages (JSON sérialisé une fois par version du fichier)
+    pages_metadata_json = load_pages_metadata_json()
+    
+    # Convertir en JSON pour JavaScript
+    headings_json = json_codec.dumps(page_headings)
+    internal_links_list = sorted(internal_links)
+    internal_links_json = json_codec.dumps(internal_links_list)
+    
+    # CSS/JS personnalisés des composants (fichiers écrits par generate_html)
+    custom_tags = custom_asset_tags(slug, render_custom_assets(layout))
+    
+    # Corps de la page (le <head> est ajouté à la fin : son CSS critique dépend du premier écran)
+    html = f'''<body>
+    <nav class="sidebar">
+        <div class="sidebar-header">
+            <h2>📚 {title}</h2>
+            <a href="../../wiki/" class="home-btn">
+                🏠 Retour à l'accueil
+            </a>
+        </div>
+        <div class="nav-toggle">
+            <button class="nav-btn active" data-tab="links">🔗 Liens</button>
+            <button class="nav-btn" data-tab="toc">📋 Sommaire</button>
+        </div>
+        
+        <div class="nav-content" id="nav-links">
+            <div class="nav-section" id="internal-links-section" style="display:none;">
+                <div class="nav-section-title">Liens référencés</div>
+                <ul class="sidebar-nav" id="internal-links-list"></ul>
+            </div>
+            
+            <div class="nav-section">
+                <div class="nav-section-title">Autres pages</div>
+                <ul class="sidebar-nav" id="other-pages-list"></ul>
+            </div>
+        </div>
+        
+        <div class="nav-content" id="nav-toc" style="display:none;">
+            <ul class="toc-list" id="toc-list">
+                <li style="color: #666; font-size: 12px; padding: 10px;">Aucun titre trouvé</li>
+            </ul>
+        </div>
+    </nav>
+    
+    <main class="content">
+        <!-- 🎨 BANNIÈRE SIMPLIFIÉE -->
+        <div class="page-header">
+            <div class="page-header-content">
+                <div class="page-icon">🗺️</div>
+                <h1 class="page-main-title">{title}</h1>
+            </div>
+        </div>
+        
+        <div class="canvas-container">
+'''
+    
+    # Composants triés avec IDs sur les titres
+    sorted_components = sorted(layout, key=lambda x: x.get('z', 0))
+    
+    cached = _component_html_cache.get(slug, {}) if touched is not None else {}
+    rendered = {}
+    cache_hits = 0
+    shell_html = html    # cadre + composants du premier écran (CSS critique)
+    
+    for comp in sorted_components:
+        comp_id = comp.get('id')
+        entry = cached.get(comp_id)
+        if entry is not None and comp_id not in touched and entry[0] == comp:
+            comp_html = entry[1]
+            cache_hits += 1
+            instrumentation.count('components_cached')
+        else:
+            with instrumentation.span('render.component', type=comp.get('type')):
+                comp_html = render_component_html_with_anchors(comp, slug)
+            instrumentation.count('components_rendered')
+        rendered[comp_id] = (dict(comp), comp_html)
+        html += comp_html
+        if in_first_viewport(comp):
+            shell_html += comp_html
+    
+    if touched is not None:
+        COMPONENT_CACHE_TOTAL.labels('hit').inc(cache_hits)
+        COMPONENT_CACHE_TOTAL.labels('miss').inc(len(sorted_components) - cache_hits)
+    
+    # Pas de cache si les ids ne sont pas uniques
+    if len(rendered) == len(sorted_components):
+        _component_html_cache[slug] = rendered
+    else:
+        _component_html_cache.pop(slug, None)
+    
+    # Fermeture du HTML avec script
+    html += f'''
+        </div>
+    </main>
+    
+    <div class="link-preview" id="link-preview">
+        <div class="preview-header" id="preview-title"></div>
+        <div class="preview-content" id="preview-content"></div>
+        <div class="preview-footer">Cliquez pour ouvrir →</div>
+    </div>
+    
+    <script>
+        const PAGE_HEADINGS = {headings_json};
+        const INTERNAL_LINKS = {internal_links_json};
+        const CURRENT_SLUG = "{slug}";
+        const PAGES_METADATA = {pages_metadata_json};
+
+        const homeBtn = document.querySelector('.home-btn');
+        if (homeBtn) {{
+            homeBtn.addEventListener('mouseenter', () => {{
+                homeBtn.style.transform = 'translateY(-2px)';
+                homeBtn.style.boxShadow = '0 4px 15px rgba(74, 158, 255, 0.5)';
+            }});
+            homeBtn.addEventListener('mouseleave', () => {{
+                homeBtn.style.transform = 'translateY(0)';
+                homeBtn.style.boxShadow = '0 2px 8px rgba(74, 158, 255, 0.3)';
+            }});
+        }}
+        
+        fetch('../../data/inventory.json')
+            .then(res => res.json())
+            .then(pages => {{
+                const visiblePages = pages.filter(p => !p.hidden_from_nav);
+                const referencedPages = visiblePages.filter(p => INTERNAL_LINKS.includes(p.slug) && p.slug !== CURRENT_SLUG);
+                const otherPages = visiblePages.filter(p => !INTERNAL_LINKS.includes(p.slug) && p.slug !== CURRENT_SLUG);
+                
+                if (referencedPages.length > 0) {{
+                    document.getElementById('internal-links-section').style.display = 'block';
+                    const internalList = document.getElementById('internal-links-list');
+                    referencedPages.forEach(page => {{
+                        const li = document.createElement('li');
+                        const a = document.createElement('a');
+                        a.href = `../${{page.slug}}/`;
+                        a.textContent = page.title;
+                        li.appendChild(a);
+                        internalList.appendChild(li);
+                    }});
+                }}
+                
+                const otherList = document.getElementById('other-pages-list');
+                otherPages.forEach(page => {{
+                    const li = document.createElement('li');
+                    const a = document.createElement('a');
+                    a.href = `../${{page.slug}}/`;
+                    a.textContent = page.title;
+                    li.appendChild(a);
+                    otherList.appendChild(li);
+                }});
+            }})
+            .catch(err => console.error('Erreur chargement navigation:', err));
+        
+        if (PAGE_HEADINGS.length > 0) {{
+            const tocList = document.getElementById('toc-list');
+            tocList.innerHTML = '';
+            PAGE_HEADINGS.forEach(heading => {{
+                const li = document.createElement('li');
+                const a = document.createElement('a');
+                a.href = `#${{heading.id}}`;
+                a.textContent = heading.text;
+                a.classList.add(`level-${{heading.level}}`);
+                a.addEventListener('click', (e) => {{
+                    e.preventDefault();
+                    const target = document.getElementById(heading.id);
+                    if (target) target.scrollIntoView({{ behavior: 'smooth', block: 'start' }});
+                }});
+                li.appendChild(a);
+                tocList.appendChild(li);
+            }});
+        }}
+        
+        document.querySelectorAll('.nav-btn').forEach(btn => {{
+            btn.addEventListener('click', () => {{
+                document.querySelectorAll('.nav-btn').forEach(b => b.classList.remove('active'));
+                btn.classList.add('active');
+                const tab = btn.dataset.tab;
+                document.getElementById('nav-links').style.display = tab === 'links' ? 'block' : 'none';
+                document.getElementById('nav-toc').style.display = tab === 'toc' ? 'block' : 'none';
+            }});
+        }});
+        
+        const preview = document.getElementById('link-preview');
+        let previewTimeout;
+        let isOverPreview = false;
+        
+        function showLinkPreview(linkElement) {{
+            const href = linkElement.getAttribute('href');
+            const match = href.match(/\.\.\/([^\/]+)\//);
+            if (!match) return;
+            
+            const targetSlug = match[1];
+            const metadata = PAGES_METADATA[targetSlug];
+            
+            if (!metadata) {{
+                console.warn('Pas de métadonnées pour', targetSlug);
+                return;
+            }}
+            
+            document.getElementById('preview-title').textContent = metadata.title;
+            document.getElementById('preview-content').textContent = metadata.preview;
+            
+            const rect = linkElement.getBoundingClientRect();
+            preview.style.display = 'block';
+            
+            let left = rect.right + 15;
+            let top = rect.top;
+            
+            if (left + 400 > window.innerWidth) {{
+                left = rect.left - 415;
+            }}
+            
+            if (top + 250 > window.innerHeight) {{
+                top = window.innerHeight - 260;
+            }}
+            
+            preview.style.left = left + 'px';
+            preview.style.top = top + 'px';
+        }}
+        
+        document.querySelectorAll('.text-content a[href*="../"]').forEach(link => {{
+            link.addEventListener('mouseenter', (e) => {{
+                clearTimeout(previewTimeout);
+                previewTimeout = setTimeout(() => {{
+                    showLinkPreview(e.target);
+                }}, 300);
+            }});
+            
+            link.addEventListener('mouseleave', () => {{
+                clearTimeout(previewTimeout);
+                setTimeout(() => {{
+                    if (!isOverPreview) {{
+                        preview.style.display = 'none';
+                    }}
+                }}, 200);
+            }});
+        }});
+        
+        preview.addEventListener('mouseenter', () => {{
+            isOverPreview = true;
+        }});
+        
+        preview.addEventListener('mouseleave', () => {{
+            isOverPreview = false;
+            preview.style.display = 'none';
+        }});
+        
+        document.querySelectorAll('.component-gallery img').forEach(img => {{
+            img.addEventListener('click', () => {{
+                const lightbox = document.createElement('div');
+                lightbox.style.cssText = 'position:fixed;top:0;left:0;width:100%;height:100%;background:rgba(0,0,0,0.9);display:flex;align-items:center;justify-content:center;z-index:10000;cursor:pointer';
+                const enlargedImg = document.createElement('img');
+                enlargedImg.src = img.src;
+                enlargedImg.style.cssText = 'max-width:90%;max-height:90%;object-fit:contain';
+                lightbox.appendChild(enlargedImg);
+                lightbox.onclick = () => lightbox.remove();
+                document.body.appendChild(lightbox);
+            }});
+        }});
+        
+        const observer = new IntersectionObserver((entries) => {{
+            entries.forEach(entry => {{
+                if (entry.isIntersecting) {{
+                    entry.target.style.opacity = '1';
+                    entry.target.style.transform = 'translateY(0)';
+                }}
+            }});
+        }}, {{ threshold: 0.1, rootMargin: '0px 0px -50px 0px' }});
+        
+        document.querySelectorAll('.component').forEach(component => {{
+            component.style.opacity = '0';
+            component.style.transform = 'translateY(20px)';
+            component.style.transition = 'opacity 0.5s ease-out, transform 0.5s ease-out';
+            observer.observe(component);
+        }});
+        
+        console.log('✅ Viewer initialisé');
+        console.log('📊 Métadonnées:', Object.keys(PAGES_METADATA).length, 'pages');
+    </script>
+    '''
+
+    # --- CORRECTION ICI --- 
+    # Gestion correcte de l'affichage conditionnel de la pop-in
+    warning_html = ""
+    if is_hidden:
+        warning_html = '''
+    <div id="hidden-page-warning" class="hidden-warning-overlay">
+        <div class="hidden-warning-modal">
+            <div class="warning-icon">⚠️</div>
+            <h2>Page à accès restreint</h2>
+            <p class="warning-text">
+                Les informations contenues dans cette page <strong>ne sont pas publiques en RP</strong>.
+            </p>
+            <p class="warning-subtext">
+                Elles ne peuvent être exploitées sans l'accord explicite d'un <strong>Maître de Jeu</strong> 
+                ou du <strong>joueur du pays concerné</strong>.
+            </p>
+            <div class="warning-actions">
+                <button id="accept-warning" class="btn-accept">
+                    J'ai compris
+                </button>
+            </div>
+        </div>
+    </div>
+    '''
+    else:
+        warning_html = "\n    \n"
+        
+    html += warning_html
+
+    # Ajout du JS restant (styles de la pop-in dans static/css/page.css)
+    html += f'''
+    <script>
+        // Gestion de la pop-in d'avertissement
+        const warningOverlay = document.getElementById('hidden-page-warning');
+        const acceptBtn = document.getElementById('accept-warning');
+        
+        if (warningOverlay && acceptBtn) {{
+            // Empêcher le scroll en arrière-plan
+            document.body.style.overflow = 'hidden';
+            
+            acceptBtn.addEventListener('click', () => {{
+                warningOverlay.style.animation = 'fadeOut 0.3s ease-out';
+                
+                setTimeout(() => {{
+                    warningOverlay.remove();
+                    document.body.style.overflow = '';
+                }}, 300);
+            }});
+            
+            // Empêcher la fermeture en cliquant à côté
+            warningOverlay.addEventListener('click', (e) => {{
+                if (e.target === warningOverlay) {{
+                    // Animation de secousse pour indiquer qu'on doit cliquer sur le bouton
+                    const modal = warningOverlay.querySelector('.hidden-warning-modal');
+                    modal.style.animation = 'shake 0.5s ease-in-out';
+                    setTimeout(() => {{
+                        modal.style.animation = '';
+                    }}, 500);
+                }}
+            }});
+        }}
+    </script>
+    
+</body>
+</html>'''
+    
+    # En-tête : CSS critique en ligne, feuilles complètes chargées en différé
+    with instrumentation.span('render.critical_css'):
+        critical = critical_css.extract(shell_html + warning_html)
+    head = f'''<!DOCTYPE html>
+<html lang="fr">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{title}</title>
+    
+    <style>{critical}</style>
+    {deferred_stylesheet_tags()}
+    {preload_tags(layout)}
+    {custom_tags}
+    
+    <style>
+        /* Hauteur minimale du canvas (après les feuilles chargées en différé) */
+        .canvas-container {{
+            min-height: {max_bottom + 100}px;
+        }}
+    </style>
+</head>
+'''
+    
+    return head + html
+
+def render_component_html_with_anchors(comp, slug):
+    """Génère le HTML avec ancres sur les titres"""
+    import re
+    
+    style = f'left:{comp["x"]}px;top:{comp["y"]}px;width:{comp["w"]}px;height:{comp["h"]}px;z-index:{comp.get("z", 0)};'
+    
+    # CSS personnalisé : classe de la feuille de la page (render_custom_assets)
+    classes = f'component component-{comp["type"]}'
+    if (comp.get('custom_css') or '').strip():
+        classes += ' ' + custom_css_class(comp['custom_css'])
+    
+    html = f'<div class="{classes}" id="{comp["id"]}" style="{style}">\n'
+    
+    comp_type = comp['type']
+    
+    # Médias sous le premier écran : chargés à l'approche du défilement
+    lazy = '' if in_first_viewport(comp) else ' loading="lazy" decoding="async"'
+    
+    if comp_type == 'text':
+        content = comp.get("content", "")
+        
+        # Ajouter des IDs aux titres pour le scroll
+        def add_id_to_heading(match):
+            tag = match.group(1)
+            attrs = match.group(2)
+            text = match.group(3)
+            clean_text = re.sub(r'<[^>]+>', '', text).strip()
+            heading_id = slugify(clean_text)
+            return f'<{tag} id="{heading_id}"{attrs}>{text}</{tag}>'
+        
+        content = re.sub(r'<(h[123])([^>]*)>(.*?)</\1>', add_id_to_heading, content, flags=re.IGNORECASE | re.DOTALL)
+        
+        html += f'<div class="text-content">{content}</div>\n'
+    
+    elif comp_type == 'image':
+        html += f'<img src="{comp.get("image_path", "")}" alt="Image"{lazy} />\n'
+    
+    elif comp_type == 'gallery':
+        # 🔧 FIX: Générer un carousel fonctionnel avec toutes les images
+        images = comp.get('images', [])
+        
+        if len(images) == 0:
+            html += '<div style="display: flex; align-items: center; justify-content: center; height: 100%; color: #666;">Aucune image dans la galerie</div>\n'
+        elif len(images) == 1:
+            # Une seule image, affichage simple
+            html += f'<img src="{images[0]}" style="width: 100%; height: 100%; object-fit: cover;" alt="Image galerie"{lazy} />\n'
+        else:
+            # Plusieurs images, créer un carousel
+            gallery_id = f'gallery-{comp["id"]}'
+            html += f'''
+            <div class="gallery-carousel" id="{gallery_id}" style="position: relative; width: 100%; height: 100%; overflow: hidden;">
+                <div class="gallery-slides" style="position: relative; width: 100%; height: 100%;">
+'''
+            
+            for idx, img_path in enumerate(images):
+                display = 'block' if idx == 0 else 'none'
+                slide_lazy = lazy if idx == 0 else ' loading="lazy" decoding="async"'
+                html += f'''
+                    <img class="gallery-slide" src="{img_path}" 
+                         style="position: absolute; top: 0; left: 0; width: 100%; height: 100%; object-fit: cover; display: {display};" 
+                         alt="Image {idx + 1}"{slide_lazy} />
+'''
+            
+            html += '''
+                </div>
+                
+                <!-- Boutons de navigation -->
+                <button class="gallery-prev" style="position: absolute; left: 10px; top: 50%; transform: translateY(-50%); background: rgba(0,0,0,0.7); color: white; border: none; padding: 15px 20px; cursor: pointer; border-radius: 5px; font-size: 24px; z-index: 10;">‹</button>
+                <button class="gallery-next" style="position: absolute; right: 10px; top: 50%; transform: translateY(-50%); background: rgba(0,0,0,0.7); color: white; border: none; padding: 15px 20px; cursor: pointer; border-radius: 5px; font-size: 24px; z-index: 10;">›</button>
+                
+                <!-- Indicateurs -->
+                <div class="gallery-indicators" style="position: absolute; bottom: 15px; left: 50%; transform: translateX(-50%); display: flex; gap: 8px; z-index: 10;">
+'''
+            
+            for idx in range(len(images)):
+                active_style = 'background: #4a9eff;' if idx == 0 else 'background: rgba(255,255,255,0.5);'
+                html += f'''
+                    <div class="gallery-indicator" data-index="{idx}" style="width: 12px; height: 12px; border-radius: 50%; {active_style} cursor: pointer; transition: background 0.3s;"></div>
+'''
+            
+            html += f'''
+                </div>
+            </div>
+            
+            <script>
+            (function() {{
+                const gallery = document.getElementById('{gallery_id}');
+                const slides = gallery.querySelectorAll('.gallery-slide');
+                const prevBtn = gallery.querySelector('.gallery-prev');
+                const nextBtn = gallery.querySelector('.gallery-next');
+                const indicators = gallery.querySelectorAll('.gallery-indicator');
+                let currentIndex = 0;
+                
+                function showSlide(index) {{
+                    // Cacher toutes les slides
+                    slides.forEach(slide => slide.style.display = 'none');
+                    
+                    // Afficher la slide actuelle
+                    if (slides[index]) {{
+                        slides[index].style.display = 'block';
+                    }}
+                    
+                    // Mettre à jour les indicateurs
+                    indicators.forEach((ind, i) => {{
+                        ind.style.background = i === index ? '#4a9eff' : 'rgba(255,255,255,0.5)';
+                    }});
+                    
+                    currentIndex = index;
+                }}
+                
+                prevBtn.addEventListener('click', () => {{
+                    const newIndex = currentIndex > 0 ? currentIndex - 1 : slides.length - 1;
+                    showSlide(newIndex);
+                }});
+                
+                nextBtn.addEventListener('click', () => {{
+                    const newIndex = currentIndex < slides.length - 1 ? currentIndex + 1 : 0;
+                    showSlide(newIndex);
+                }});
+                
+                indicators.forEach((indicator, index) => {{
+                    indicator.addEventListener('click', () => {{
+                        showSlide(index);
+                    }});
+                }});
+                
+                // Auto-play si configuré
+                const autoplayDelay = {comp.get('autoplay_delay', 0)};
+                if (autoplayDelay > 0) {{
+                    setInterval(() => {{
+                        const newIndex = currentIndex < slides.length - 1 ? currentIndex + 1 : 0;
+                        showSlide(newIndex);
+                    }}, autoplayDelay);
+                }}
+            }})();
+            </script>
+'''
+    
+    elif comp_type == 'video':
+        html += f'<video controls><source src="{comp.get("video_path", "")}" type="video/mp4"></video>\n'
+    
+    elif comp_type == 'youtube':
+        iframe_lazy = ' loading="lazy"' if lazy else ''
+        html += f'<iframe src="https://www.youtube.com/embed/{comp.get("youtube_id", "")}" allowfullscreen{iframe_lazy}></iframe>\n'
+    
+    elif comp_type == 'shape':
+        html += f'<div style="width:100%;height:100%;background:{comp.get("bg_color", "#333")};border-radius:5px;"></div>\n'
+    
+    elif comp_type == 'table':
+        # ✅ FIX: Utiliser 'content' au lieu de 'rows'
+        content = comp.get('content', '')
+        
+        if not content:
+            # Tableau par défaut si vide
+            content = '''
+                <table style="width: 100%; border-collapse: collapse; background: #252525;">
+                    <thead>
+                        <tr>
+                            <th style="padding: 12px; text-align: left; border: 1px solid #333; background: #333; color: #4a9eff;">Colonne 1</th>
+                            <th style="padding: 12px; text-align: left; border: 1px solid #333; background: #333; color: #4a9eff;">Colonne 2</th>
+                            <th style="padding: 12px; text-align: left; border: 1px solid #333; background: #333; color: #4a9eff;">Colonne 3</th>
+                        </tr>
+                    </thead>
+                    <tbody>
+                        <tr>
+                            <td style="padding: 12px; border: 1px solid #333;">Données</td>
+                            <td style="padding: 12px; border: 1px solid #333;">Données</td>
+                            <td style="padding: 12px; border: 1px solid #333;">Données</td>
+                        </tr>
+                        <tr>
+                            <td style="padding: 12px; border: 1px solid #333;">Données</td>
+                            <td style="padding: 12px; border: 1px solid #333;">Données</td>
+                            <td style="padding: 12px; border: 1px solid #333;">Données</td>
+                        </tr>
+                    </tbody>
+                </table>
+            '''
+        
+        html += content + '\n'
+
+    
+    elif comp_type == 'separator':
+        html += '<hr />\n'
+    
+    html += '</div>\n'
+    return html
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+core/storage.py - Stockage des pages : inventaire, layouts, révisions, métadonnées
+N'a AUCUNE dépendance avec Flask/app.py (utilisable par les scripts CLI)
+"""
+
+import hashlib
+import re
+from pathlib import Path
+
+import instrumentation
+import json_codec
+import locks
+import metrics
+import revisions
+from core import layouts
+
+# Configuration des chemins
+BASE_DIR = Path(__file__).parent.parent
+PAGES_DIR = BASE_DIR / 'pages'
+DATA_DIR = BASE_DIR / 'data'
+STATIC_DIR = BASE_DIR / 'static'
+INVENTORY_FILE = DATA_DIR / 'inventory.json'
+
+LOCKS_DIR = DATA_DIR / 'locks'
+
+# Répartition des dossiers de pages (écrite par migrate_pages.py)
+# Absent : pages/<slug>/ ; {"levels": 2, "width": 2} : pages/3f/a0/<slug>/
+SHARDING_FILE = PAGES_DIR / '.sharding.json'
+MAX_SHARD_LEVELS = 4
+MAX_SHARD_WIDTH = 4
+
+# Verrous partagés entre threads ET workers (fichiers dans data/locks/)
+_locks = locks.LockRegistry(LOCKS_DIR)
+
+def init_storage():
+    """
+    Crée les dossiers et l'inventaire vide si nécessaire
+    Idempotent et sans effet à l'import : appelé par create_app()
+    """
+    PAGES_DIR.mkdir(exist_ok=True)
+    DATA_DIR.mkdir(exist_ok=True)
+    STATIC_DIR.mkdir(exist_ok=True)
+    LOCKS_DIR.mkdir(exist_ok=True)
+    # Répartition lue au démarrage : un fichier invalide empêche le lancement
+    load_sharding(refresh=True)
+    
+    with inventory_lock():
+        if not INVENTORY_FILE.exists() or INVENTORY_FILE.stat().st_size == 0:
+            save_inventory([])
+
+# Durées des étapes de sauvegarde (exposées par /metrics dans app.py)
+SAVE_STAGE_DURATION = metrics.histogram(
+    'wiki_save_stage_duration_seconds', "Durée des étapes de sauvegarde", ('stage',))
+
+def load_inventory():
+    try:
+        with open(INVENTORY_FILE, 'r', encoding='utf-8') as f:
+            content = f.read().strip()
+            return json_codec.loads(content) if content else []
+    except:
+        return []
+
+def save_inventory(inventory):
+    """
+    Écriture atomique : un autre worker ne lit jamais un fichier partiel
+    Inventaire inchangé : fichier intact (sa date sert de clé à l'index des
+    tags et à la date de mise à jour du wiki)
+    """
+    return locks.write_if_changed(INVENTORY_FILE, json_codec.dumpb(inventory, pretty=True))
+
+def inventory_lock():
+    """Verrou des lectures-modifications-écritures de inventory.json"""
+    return _locks.get('inventory')
+
+# (levels, width) lu une fois par processus : redémarrer après une migration
+_sharding = None
+
+def load_sharding(refresh=False):
+    """Répartition courante (levels, width) ; (0, 0) = pages/<slug>/"""
+    global _sharding
+    if _sharding is None or refresh:
+        try:
+            config = json_codec.load_file(SHARDING_FILE)
+            levels, width = int(config.get('levels', 0)), int(config.get('width', 0))
+        except FileNotFoundError:
+            levels, width = 0, 0
+        except (ValueError, TypeError, AttributeError) as e:
+            # Fichier illisible : erreur explicite plutôt qu'une répartition devinée
+            raise ValueError(f"{SHARDING_FILE} invalide ({e}) : le corriger ou le supprimer") from e
+        if not 0 <= levels <= MAX_SHARD_LEVELS or (levels and not 1 <= width <= MAX_SHARD_WIDTH):
+            raise ValueError(
+                f"{SHARDING_FILE} invalide : levels entre 0 et {MAX_SHARD_LEVELS}, "
+                f"width entre 1 et {MAX_SHARD_WIDTH} (lu : {levels}, {width})"
+            )
+        _sharding = (levels, width if levels else 0)
+    return _sharding
+
+def shard_page_dir(slug, levels, width):
+    """Dossier d'une page pour une répartition donnée (préfixes du sha256 du slug)"""
+    if not levels:
+        return PAGES_DIR / slug
+    digest = hashlib.sha256(slug.encode('utf-8')).hexdigest()
+    prefixes = [digest[i * width:(i + 1) * width] for i in range(levels)]
+    return PAGES_DIR.joinpath(*prefixes, slug)
+
+def get_page_dir(slug):
+    """
+    Retourne le dossier d'une page (seul point qui connaît la répartition)
+    Les URL ne changent pas : /pages/<slug>/ quel que soit le dossier
+    """
+    return shard_page_dir(slug, *load_sharding())
+
+def iter_page_dirs(sharding=None):
+    """Dossiers de pages présents sur le disque pour une répartition (courante par défaut)"""
+    levels, _ = sharding or load_sharding()
+    if not PAGES_DIR.exists():
+        return
+    pattern = '/'.join(['*'] * (levels + 1))
+    for page_dir in sorted(PAGES_DIR.glob(pattern)):
+        if page_dir.is_dir() and not page_dir.name.startswith('.'):
+            yield page_dir
+
+# Layouts : JSON historique ou format binaire compact (WIKI_LAYOUT_FORMAT)
+layout_repository = layouts.LayoutRepository(get_page_dir)
+
+def get_layout_file(slug):
+    """Retourne le fichier du layout d'une page (layout.json ou format binaire)"""
+    return layout_repository.path(slug)
+
+def load_layout(slug):
+    """Charge le layout actuel d'une page ([] si absent)"""
+    return layout_repository.load(slug)
+
+def save_layout(slug, layout):
+    """Écrit le layout au format courant (sans révision, voir write_layout)"""
+    return layout_repository.save(slug, layout)
+
+# Layouts déjà comparés à leur révision par ce processus :
+# {slug: (clé os.stat du layout, révision)}
+_verified_layouts = {}
+
+def _layout_stat_key(slug):
+    path, _ = layout_repository.find(slug)
+    if path is None:
+        return None
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return (path.name, stat.st_mtime_ns, stat.st_size)
+
+def get_layout_version(slug):
+    """
+    Numéro de la dernière révision enregistrée (0 si aucune)
+
+    Un layout modifié hors API (à la main, layout_tool.py) est d'abord
+    enregistré comme nouvelle révision : l'ETag change et If-Match le
+    détecte. Le layout n'est relu que si son fichier ou la révision ont
+    changé depuis la dernière vérification de ce processus.
+    """
+    page_dir = get_page_dir(slug)
+    head = revisions.head_revision(page_dir)
+    version = head['rev'] if head else 0
+    key = _layout_stat_key(slug)
+    if key is None or _verified_layouts.get(slug) == (key, version):
+        return version
+
+    with revision_lock(slug):
+        head = revisions.head_revision(page_dir)
+        key = _layout_stat_key(slug)
+        try:
+            layout = layout_repository.load(slug)
+        except Exception as e:
+            print(f"⚠️ Layout illisible pour {slug}: {e}")
+            return head['rev'] if head else 0
+        if head is None or head['sha'] != revisions.layout_hash(layout):
+            head = revisions.record_revision(page_dir, layout)
+            print(f"📝 {slug} modifié hors éditeur : révision {head['rev']} enregistrée")
+        _verified_layouts[slug] = (key, head['rev'])
+        return head['rev']
+
+# Verrous par page : les écritures d'une même page sont sérialisées ; les
+# slugs sont répartis sur locks.LOCK_STRIPES verrous (nombre de fichiers fixe),
+# deux pages ne se bloquent que si elles partagent le même
+def page_lock(slug):
+    """Retourne le verrou d'écriture d'une page"""
+    return _locks.striped('page', slug)
+
+def render_lock(slug):
+    """Verrou de génération de pages/<slug>/index.html (distinct de page_lock, pris après lui)"""
+    return _locks.striped('render', slug)
+
+def revision_lock(slug):
+    """Verrou du layout et de son historique (pris seul ou après page_lock)"""
+    return _locks.striped('revision', slug)
+
+def create_backup(slug):
+    """
+    Archive le layout actuel dans l'historique des révisions
+    No-op si le fichier est identique à la dernière révision enregistrée
+    """
+    if not layout_repository.exists(slug):
+        return None
+    
+    try:
+        layout = layout_repository.load(slug)
+    except Exception as e:
+        print(f"⚠️ Backup impossible pour {slug}: {e}")
+        return None
+    
+    return revisions.record_revision(get_page_dir(slug), layout)
+
+def write_layout(slug, layout):
+    """
+    Écrit le layout et l'enregistre dans l'historique
+    Retourne l'entrée de la révision créée
+    """
+    with revision_lock(slug):
+        # Archiver l'état précédent (modifications manuelles comprises)
+        with SAVE_STAGE_DURATION.labels('backup').time():
+            create_backup(slug)
+        
+        with SAVE_STAGE_DURATION.labels('write').time():
+            layout_repository.save(slug, layout)
+            entry = revisions.record_revision(get_page_dir(slug), layout)
+            _verified_layouts[slug] = (_layout_stat_key(slug), entry['rev'])
+            return entry
+
+def extract_page_preview(slug):
+    """Extrait un aperçu textuel d'une page"""
+    if not layout_repository.exists(slug):
+        return "Page sans contenu"  # ✅ Valeur par défaut
+    
+    try:
+        with instrumentation.span('metadata.load', slug=slug):
+            layout = layout_repository.load(slug)
+        
+        if not layout:
+            return "Page vide"  # ✅ Gérer layouts vides
+        
+        texts = []
+        for comp in layout:
+            if comp.get('type') == 'text' and comp.get('content'):
+                content = comp.get('content', '')
+                clean_text = re.sub(r'<[^>]+>', ' ', content)
+                clean_text = re.sub(r'\s+', ' ', clean_text).strip()
+                if clean_text:
+                    texts.append(clean_text)
+        
+        full_text = ' '.join(texts)
+        
+        if not full_text:
+            return "Page sans texte"  # ✅ Gérer absence de texte
+        
+        if len(full_text) > 200:
+            return full_text[:200] + '...'
+        return full_text
+        
+    except Exception as e:
+        print(f"⚠️ Erreur extraction {slug}: {e}")
+        return "Aperçu non disponible"
+
+
+def generate_pages_metadata():
+    """Génère data/pages-metadata.json avec tous les aperçus"""
+    with SAVE_STAGE_DURATION.labels('metadata').time():
+        inventory = load_inventory()
+        metadata = {}
+        
+        for page in inventory:
+            slug = page['slug']
+            metadata[slug] = {
+                'title': page['title'],
+                'slug': slug,
+                'preview': extract_page_preview(slug),
+                'hidden_from_nav': page.get('hidden_from_nav', False),
+                'tags': page.get('tags', [])
+            }
+        
+        metadata_file = DATA_DIR / 'pages-metadata.json'
+        with instrumentation.span('metadata.write'):
+            # Fichier lu uniquement par le code (pages, accueil) : JSON compact
+            locks.write_if_changed(metadata_file, json_codec.dumpb(metadata))
+    
+    print(f"✅ Métadonnées générées: {len(metadata)} pages")
+    return metadata
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+critical_css.py - CSS critique des pages générées (pages/<slug>/index.html)
+N'a AUCUNE dépendance avec Flask/app.py
+
+Les feuilles des pages (SOURCES) sont chargées en différé ; seules les
+règles utiles au premier affichage sont mises en ligne dans le <head> :
+celles dont un sélecteur ne fait référence qu'à des balises, classes et ids
+présents dans le HTML du cadre de la page (sidebar, bannière, canvas et
+composants du premier écran).
+
+La sélection est volontairement large (les combinateurs, pseudo-classes
+structurelles et attributs sont ignorés) ; seuls les états d'interaction
+(:hover, :focus, :active) sont laissés à la feuille complète.
+
+    css = critical_css.extract(shell_html)
+"""
+
+import functools
+import re
+import threading
+from pathlib import Path
+
+import minify
+
+BASE_DIR = Path(__file__).parent
+STATIC_DIR = BASE_DIR / 'static'
+
+# Feuilles des pages générées, dans l'ordre des <link> (chemins relatifs à la racine du site)
+SOURCES = ('static/css/viewer.css', 'static/css/page.css')
+
+# Hauteur du premier écran (px) : composants dont le haut est au-dessus
+FIRST_VIEWPORT_HEIGHT = 900
+
+# Balises toujours présentes
+ROOT_TAGS = frozenset({'html', 'body'})
+
+_COMMENT = re.compile(r'/\*.*?\*/', re.DOTALL)
+_TAG = re.compile(r'<([a-zA-Z][a-zA-Z0-9-]*)')
+_CLASS_ATTR = re.compile(r'\bclass\s*=\s*"([^"]*)"')
+_ID_ATTR = re.compile(r'\bid\s*=\s*"([^"]*)"')
+
+_INTERACTIVE = re.compile(r':(?:hover|focus|focus-visible|focus-within|active)\b')
+_PSEUDO = re.compile(r'::?[\w-]+(?:\([^)]*\))?')
+_ATTRIBUTE = re.compile(r'\[[^\]]*\]')
+_SELECTOR_TOKEN = re.compile(r'[.#]?-?[_a-zA-Z][\w-]*')
+_ANIMATION = re.compile(r'animation(?:-name)?\s*:([^;]*)')
+
+
+# --- Feuilles sources ---
+
+def _parse(css, position=0):
+    """
+    Règles d'un bloc CSS : [(prélude, corps)] ; le corps est une liste de
+    règles pour @media/@supports, le texte des déclarations sinon
+    Retourne (règles, position après l'accolade fermante du bloc)
+    """
+    rules = []
+    end = len(css)
+    while position < end:
+        open_at = css.find('{', position)
+        close_at = css.find('}', position)
+        if close_at != -1 and (open_at == -1 or close_at < open_at):
+            return rules, close_at + 1
+        if open_at == -1:
+            break
+        prelude = css[position:open_at].rsplit(';', 1)[-1].strip()
+        if prelude.startswith(('@media', '@supports')):
+            children, position = _parse(css, open_at + 1)
+            rules.append((prelude, children))
+            continue
+        depth = 1
+        i = open_at + 1
+        while i < end and depth:
+            if css[i] == '{':
+                depth += 1
+            elif css[i] == '}':
+                depth -= 1
+            i += 1
+        rules.append((prelude, css[open_at + 1:i - 1].strip()))
+        position = i
+    return rules, end
+
+def _vocabulary(rules):
+    """Balises, classes et ids cités par les sélecteurs des règles"""
+    tokens = set()
+    for prelude, body in rules:
+        if isinstance(body, list):
+            tokens |= _vocabulary(body)
+        elif not prelude.startswith('@'):
+            selector = _PSEUDO.sub(' ', _ATTRIBUTE.sub(' ', prelude))
+            tokens.update(t if t[0] in '.#' else t.lower() for t in _SELECTOR_TOKEN.findall(selector))
+    return tokens
+
+# Règles des SOURCES : (clé os.stat des fichiers, règles, vocabulaire des sélecteurs)
+_rules_cache = (None, [], frozenset())
+_rules_lock = threading.Lock()
+
+def load_rules():
+    """Règles de toutes les SOURCES, relues seulement si un fichier a changé : (clé, règles, vocabulaire)"""
+    global _rules_cache
+    paths = [BASE_DIR / source for source in SOURCES]
+    key = []
+    for path in paths:
+        try:
+            stat = path.stat()
+            key.append((stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            key.append(None)
+    key = tuple(key)
+
+    with _rules_lock:
+        cached_key, rules, vocabulary = _rules_cache
+        if key != cached_key:
+            rules = []
+            for path in paths:
+                try:
+                    css = path.read_text(encoding='utf-8')
+                except OSError as e:
+                    print(f"⚠️ CSS critique : {path.name} illisible: {e}")
+                    continue
+                rules.extend(_parse(_COMMENT.sub(' ', css))[0])
+            vocabulary = frozenset(_vocabulary(rules))
+            _rules_cache = (key, rules, vocabulary)
+            _select.cache_clear()
+        return key, rules, vocabulary
+
+
+# --- Sélection ---
+
+def used_tokens(html):
+    """Balises, .classes et #ids présents dans un fragment HTML"""
+    tokens = set(ROOT_TAGS)
+    tokens.update(tag.lower() for tag in _TAG.findall(html))
+    for value in _CLASS_ATTR.findall(html):
+        tokens.update('.' + name for name in value.split())
+    for value in _ID_ATTR.findall(html):
+        tokens.update('#' + name for name in value.split())
+    return frozenset(tokens)
+
+def _selector_matches(selector, tokens):
+    if _INTERACTIVE.search(selector):
+        return False
+    selector = _PSEUDO.sub(' ', _ATTRIBUTE.sub(' ', selector))
+    return all(
+        (token if token[0] in '.#' else token.lower()) in tokens
+        for token in _SELECTOR_TOKEN.findall(selector)
+    )
+
+def _filter(rules, tokens, animations):
+    """Règles retenues (sélecteurs utiles uniquement), noms d'animation ajoutés à animations"""
+    kept = []
+    for prelude, body in rules:
+        if isinstance(body, list):
+            children = _filter(body, tokens, animations)
+            if children:
+                kept.append((prelude, children))
+        elif prelude.startswith('@'):
+            if not prelude.startswith('@keyframes'):
+                kept.append((prelude, body))
+        else:
+            selectors = [s.strip() for s in prelude.split(',') if _selector_matches(s, tokens)]
+            if selectors:
+                kept.append((','.join(selectors), body))
+                for value in _ANIMATION.findall(body):
+                    animations.update(re.findall(r'[\w-]+', value))
+    return kept
+
+def _keyframes(rules, animations):
+    kept = []
+    for prelude, body in rules:
+        if isinstance(body, list):
+            kept.extend(_keyframes(body, animations))
+        elif prelude.startswith('@keyframes') and prelude.split(None, 1)[-1] in animations:
+            kept.append((prelude, body))
+    return kept
+
+def _serialize(rules):
+    return ''.join(
+        f'{prelude}{{{_serialize(body) if isinstance(body, list) else body}}}'
+        for prelude, body in rules
+    )
+
+@functools.lru_cache(maxsize=256)
+def _select(key, tokens):
+    _, rules, _ = _rules_cache
+    animations = set()
+    kept = _filter(rules, tokens, animations)
+    kept += _keyframes(rules, animations)
+    return minify.minify_css(_serialize(kept))
+
+def extract(html):
+    """CSS critique (minifié) pour un fragment HTML : le cadre de la page et son premier écran"""
+    key, _, vocabulary = load_rules()
+    # Seuls les jetons cités par les feuilles comptent : les pages au même
+    # cadre partagent le même résultat
+    return _select(key, used_tokens(html) & vocabulary)
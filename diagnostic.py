@@ -1,313 +1,239 @@
-# diagnostic.py - Script pour identifier l'erreur 500
-
+#!/usr/bin/env python3
 """
-Exécutez ce script pour diagnostiquer l'erreur 500:
-python diagnostic.py
+diagnostic.py - Vérification de l'intégrité du wiki (lecture seule)
+
+La commande check parcourt toutes les pages en parallèle (pool de threads)
+et signale :
+- invalid_inventory / invalid_layout / invalid_metadata : JSON illisible
+- missing_directory : page de l'inventaire sans dossier
+- orphan_directory : dossier de page absent de l'inventaire
+- missing_layout : dossier de page sans layout
+- missing_media : image/vidéo référencée par un composant mais absente
+- orphan_upload : fichier de images/ ou assets/videos/ référencé nulle part
+- broken_link : lien interne vers une page qui n'existe pas
+- stale_html : index.html absent ou généré depuis un autre layout
+  (empreinte enregistrée au rendu, voir core/render.py)
+
+Rien n'est écrit (ni métadonnées, ni HTML) : le rapport JSON part sur la
+sortie standard, le résumé sur la sortie d'erreur. Code de sortie 1 si au
+moins un problème est de gravité "error".
+
+Usage:
+    python diagnostic.py check [--workers N] [--pretty] [--output FICHIER]
 """
 
-from pathlib import Path
-import json
+import argparse
+import os
 import re
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-# Configuration (adaptez selon votre structure)
-BASE_DIR = Path(__file__).parent
-PAGES_DIR = BASE_DIR / 'pages'
-DATA_DIR = BASE_DIR / 'data'
-INVENTORY_FILE = DATA_DIR / 'inventory.json'
+import json_codec
+from core import render, storage
 
-def slugify(text):
-    text = text.lower()
-    text = re.sub(r'[^\w\s-]', '', text)
-    text = re.sub(r'[-\s]+', '-', text)
-    return text.strip('-')
+if sys.platform.startswith('win'):
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
 
-def load_inventory():
-    try:
-        with open(INVENTORY_FILE, 'r', encoding='utf-8') as f:
-            content = f.read().strip()
-            return json.loads(content) if content else []
-    except Exception as e:
-        print(f"❌ Erreur chargement inventory: {e}")
-        return []
+REPORT_FORMAT_VERSION = 1
 
-def get_page_dir(slug):
-    return PAGES_DIR / slug
+# Gravité de chaque type de problème
+SEVERITIES = {
+    'invalid_inventory': 'error',
+    'invalid_layout': 'error',
+    'missing_directory': 'error',
+    'missing_media': 'error',
+    'broken_link': 'error',
+    'invalid_metadata': 'warning',
+    'orphan_directory': 'warning',
+    'missing_layout': 'warning',
+    'orphan_upload': 'warning',
+    'stale_html': 'warning',
+}
 
-def get_layout_file(slug):
-    return get_page_dir(slug) / 'layout.json'
+# Dossiers d'upload d'une page (voir upload_image / upload_video dans app.py)
+UPLOAD_DIRS = ('images', 'assets/videos')
 
-def extract_page_preview(slug):
-    """Extrait un aperçu textuel d'une page"""
-    layout_file = get_layout_file(slug)
-    
-    if not layout_file.exists():
-        return ""
-    
-    try:
-        with open(layout_file, 'r', encoding='utf-8') as f:
-            layout = json.load(f)
-        
-        texts = []
-        for comp in layout:
-            if comp.get('type') == 'text' and comp.get('content'):
-                content = comp.get('content', '')
-                clean_text = re.sub(r'<[^>]+>', ' ', content)
-                clean_text = re.sub(r'\s+', ' ', clean_text).strip()
-                if clean_text:
-                    texts.append(clean_text)
-        
-        full_text = ' '.join(texts)
-        if len(full_text) > 200:
-            return full_text[:200] + '...'
-        return full_text if full_text else "Aucun aperçu disponible"
-    
-    except Exception as e:
-        print(f"   ⚠️ Erreur extraction preview {slug}: {e}")
-        return "Aperçu non disponible"
-
-def test_metadata_generation():
-    """Teste la génération des métadonnées"""
-    print("\n" + "="*60)
-    print("🔍 DIAGNOSTIC GÉNÉRATION MÉTADONNÉES")
-    print("="*60 + "\n")
-    
-    inventory = load_inventory()
-    print(f"📄 Pages trouvées dans inventory.json: {len(inventory)}\n")
-    
-    if not inventory:
-        print("❌ PROBLÈME: Aucune page dans l'inventaire!")
-        return
-    
-    metadata = {}
-    errors = []
-    
-    for i, page in enumerate(inventory, 1):
-        slug = page['slug']
-        title = page.get('title', slug)
-        
-        print(f"[{i}/{len(inventory)}] Test de: {title} ({slug})")
-        
+# Liens internes : ../<slug>/ (pages générées), /pages/<slug>/, /wiki/<slug>
+INTERNAL_LINK_PATTERN = re.compile(r'href="(?:\.\./|/pages/|/wiki/)([^/"#?]+)/?(?:[#?][^"]*)?"')
+
+# Médias insérés dans le contenu HTML des textes
+MEDIA_SRC_PATTERN = re.compile(r'<(?:img|video|source)\b[^>]*\bsrc="([^"]+)"', re.IGNORECASE)
+
+EXTERNAL_PREFIXES = ('http://', 'https://', '//', 'data:', 'blob:')
+
+
+def issue(issue_type, slug=None, detail=None, path=None):
+    entry = {'type': issue_type, 'severity': SEVERITIES[issue_type]}
+    if slug is not None:
+        entry['slug'] = slug
+    if detail is not None:
+        entry['detail'] = detail
+    if path is not None:
+        entry['path'] = os.path.relpath(path, storage.BASE_DIR)
+    return entry
+
+def component_media(comp):
+    """Médias d'un composant : champs image/galerie/vidéo et <img>/<video> du texte"""
+    references = [comp.get('image_path'), comp.get('video_path')]
+    references.extend(comp.get('images') or [])
+    if isinstance(comp.get('content'), str):
+        references.extend(MEDIA_SRC_PATTERN.findall(comp['content']))
+    return [r for r in references if isinstance(r, str) and r]
+
+def resolve_media(page_dir, reference):
+    """Fichier local d'une référence de média (None si externe)"""
+    if reference.startswith(EXTERNAL_PREFIXES):
+        return None
+    reference = reference.split('?', 1)[0].split('#', 1)[0]
+    if reference.startswith('/pages/'):
+        target_slug, _, rest = reference[len('/pages/'):].partition('/')
+        return storage.get_page_dir(target_slug) / rest
+    if reference.startswith('/'):
+        return storage.BASE_DIR / reference.lstrip('/')
+    if reference.startswith('../'):
+        return None
+    return page_dir / reference.removeprefix('./')
+
+def check_page(slug, inventory_slugs):
+    """Problèmes d'une page (exécuté dans le pool de threads, lecture seule)"""
+    page_dir = storage.get_page_dir(slug)
+    if not page_dir.is_dir():
+        return [issue('missing_directory', slug, path=page_dir)]
+
+    issues = []
+    if slug not in inventory_slugs:
+        issues.append(issue('orphan_directory', slug, path=page_dir))
+
+    layout_file, _ = storage.layout_repository.find(slug)
+    if layout_file is None:
+        issues.append(issue('missing_layout', slug, path=page_dir))
+        layout = []
+    else:
         try:
-            layout_file = get_layout_file(slug)
-            
-            # Vérifier l'existence du fichier
-            if not layout_file.exists():
-                print(f"   ⚠️ Pas de layout.json")
-                metadata[slug] = {
-                    'title': title,
-                    'slug': slug,
-                    'preview': 'Page sans contenu',
-                    'hidden_from_nav': page.get('hidden_from_nav', False)
-                }
-                continue
-            
-            # Vérifier la taille du fichier
-            file_size = layout_file.stat().st_size
-            print(f"   📊 Taille layout.json: {file_size} bytes")
-            
-            # Lire le layout
-            with open(layout_file, 'r', encoding='utf-8') as f:
-                layout = json.load(f)
-            
-            print(f"   📦 Composants: {len(layout)}")
-            
-            # Compter les types
-            types = {}
-            for comp in layout:
-                comp_type = comp.get('type', 'unknown')
-                types[comp_type] = types.get(comp_type, 0) + 1
-            
-            if types:
-                print(f"   🏷️  Types: {types}")
-            
-            # Extraire le preview
-            preview = extract_page_preview(slug)
-            preview_length = len(preview)
-            
-            print(f"   📝 Preview: {preview_length} caractères")
-            if preview_length > 0:
-                print(f"      → {preview[:80]}...")
-            
-            # Créer les métadonnées
-            metadata[slug] = {
-                'title': title,
-                'slug': slug,
-                'preview': preview,
-                'hidden_from_nav': page.get('hidden_from_nav', False)
-            }
-            
-            print(f"   ✅ OK\n")
-            
-        except json.JSONDecodeError as e:
-            error_msg = f"JSON invalide dans {slug}/layout.json: {e}"
-            print(f"   ❌ {error_msg}\n")
-            errors.append(error_msg)
-            
+            layout = storage.layout_repository.load(slug)
+            if not isinstance(layout, list):
+                raise ValueError("le layout n'est pas une liste de composants")
         except Exception as e:
-            error_msg = f"Erreur sur {slug}: {str(e)}"
-            print(f"   ❌ {error_msg}\n")
-            errors.append(error_msg)
-    
-    print("\n" + "="*60)
-    print("📊 RÉSULTATS")
-    print("="*60 + "\n")
-    
-    print(f"✅ Pages traitées avec succès: {len(metadata)}/{len(inventory)}")
-    
-    if errors:
-        print(f"\n❌ Erreurs détectées: {len(errors)}")
-        for error in errors:
-            print(f"   - {error}")
-    else:
-        print("\n✅ Aucune erreur détectée!")
-    
-    # Vérifier les métadonnées vides
-    empty_previews = [slug for slug, meta in metadata.items() 
-                     if not meta['preview'] or meta['preview'] in ['', 'Aucun aperçu disponible', 'Aperçu non disponible']]
-    
-    if empty_previews:
-        print(f"\n⚠️ Pages sans aperçu: {len(empty_previews)}")
-        for slug in empty_previews:
-            print(f"   - {slug}")
-    
-    # Sauvegarder les métadonnées
-    print("\n" + "="*60)
-    print("💾 SAUVEGARDE")
-    print("="*60 + "\n")
-    
-    metadata_file = DATA_DIR / 'pages-metadata.json'
-    
+            issues.append(issue('invalid_layout', slug, str(e), layout_file))
+            return issues
+
+    referenced = set()
+    broken_links = set()
+    for comp in layout:
+        if not isinstance(comp, dict):
+            continue
+        for reference in component_media(comp):
+            media_file = resolve_media(page_dir, reference)
+            if media_file is None:
+                continue
+            referenced.add(os.path.normpath(media_file))
+            if not media_file.is_file():
+                issues.append(issue('missing_media', slug, f"{comp.get('id')}: {reference}", media_file))
+        if isinstance(comp.get('content'), str):
+            for target in INTERNAL_LINK_PATTERN.findall(comp['content']):
+                if target not in inventory_slugs and not target.endswith('.html'):
+                    broken_links.add(target)
+    for target in sorted(broken_links):
+        issues.append(issue('broken_link', slug, target))
+
+    for dirname in UPLOAD_DIRS:
+        upload_dir = page_dir / dirname
+        if not upload_dir.is_dir():
+            continue
+        with os.scandir(upload_dir) as entries:
+            for entry in sorted(entries, key=lambda e: e.name):
+                if entry.is_file() and os.path.normpath(entry.path) not in referenced:
+                    issues.append(issue('orphan_upload', slug, path=entry.path))
+
+    if layout_file is not None:
+        issues.extend(check_rendered(slug, page_dir, layout_file, layout))
+    return issues
+
+def check_rendered(slug, page_dir, layout_file, layout):
+    """index.html rendu depuis le layout actuel (empreinte écrite par generate_html)"""
+    index_file = page_dir / 'index.html'
+    if not index_file.is_file():
+        return [issue('stale_html', slug, "index.html absent", index_file)]
     try:
-        with open(metadata_file, 'w', encoding='utf-8') as f:
-            json.dump(metadata, f, indent=2, ensure_ascii=False)
-        
-        saved_size = metadata_file.stat().st_size
-        print(f"✅ Métadonnées sauvegardées: {metadata_file}")
-        print(f"   Taille: {saved_size} bytes")
-        print(f"   Pages: {len(metadata)}")
-        
-        # Afficher un échantillon
-        if metadata:
-            sample_slug = list(metadata.keys())[0]
-            print(f"\n📋 Exemple de métadonnées ({sample_slug}):")
-            print(json.dumps(metadata[sample_slug], indent=2, ensure_ascii=False))
-        
-    except Exception as e:
-        print(f"❌ Erreur sauvegarde: {e}")
-        import traceback
-        traceback.print_exc()
-        return False
-    
-    return True
-
-def test_html_generation(test_slug=None):
-    """Teste la génération HTML sur une page spécifique"""
-    inventory = load_inventory()
-    
-    if not inventory:
-        print("❌ Aucune page dans l'inventaire")
-        return
-    
-    # Choisir une page à tester
-    if test_slug:
-        page = next((p for p in inventory if p['slug'] == test_slug), None)
-        if not page:
-            print(f"❌ Page '{test_slug}' introuvable")
-            return
-    else:
-        page = inventory[0]
-    
-    slug = page['slug']
-    title = page['title']
-    
-    print("\n" + "="*60)
-    print(f"🔨 TEST GÉNÉRATION HTML: {title} ({slug})")
-    print("="*60 + "\n")
-    
+        rendered = (page_dir / render.RENDER_SOURCE_FILE).read_text(encoding='utf-8').strip()
+    except FileNotFoundError:
+        # Page générée avant l'enregistrement des empreintes : dates seules
+        if index_file.stat().st_mtime_ns < layout_file.stat().st_mtime_ns:
+            return [issue('stale_html', slug, "index.html plus ancien que le layout", index_file)]
+        return []
+    if rendered != render.layout_digest(layout):
+        return [issue('stale_html', slug, "index.html généré depuis une autre version du layout", index_file)]
+    return []
+
+def check_json_file(path, issue_type):
+    """Fichier JSON facultatif : problème s'il existe mais ne se lit pas"""
     try:
-        # Charger le layout
-        layout_file = get_layout_file(slug)
-        
-        if not layout_file.exists():
-            print("❌ Pas de layout.json")
-            return
-        
-        with open(layout_file, 'r', encoding='utf-8') as f:
-            layout = json.load(f)
-        
-        print(f"📦 Layout chargé: {len(layout)} composants")
-        
-        # Charger les métadonnées
-        metadata_file = DATA_DIR / 'pages-metadata.json'
-        
-        if not metadata_file.exists():
-            print("⚠️ pages-metadata.json n'existe pas, génération...")
-            test_metadata_generation()
-        
-        with open(metadata_file, 'r', encoding='utf-8') as f:
-            pages_metadata = json.load(f)
-        
-        print(f"📊 Métadonnées chargées: {len(pages_metadata)} pages")
-        
-        # Tester la sérialisation JSON
-        print("\n🧪 Test sérialisation JSON...")
-        
-        try:
-            headings_json = json.dumps([], ensure_ascii=False)
-            print(f"   ✅ headings_json: OK")
-        except Exception as e:
-            print(f"   ❌ headings_json: {e}")
-        
-        try:
-            links_json = json.dumps([], ensure_ascii=False)
-            print(f"   ✅ links_json: OK")
-        except Exception as e:
-            print(f"   ❌ links_json: {e}")
-        
-        try:
-            metadata_json = json.dumps(pages_metadata, ensure_ascii=False)
-            print(f"   ✅ metadata_json: OK ({len(metadata_json)} chars)")
-        except Exception as e:
-            print(f"   ❌ metadata_json: {e}")
-            # Identifier la page problématique
-            for page_slug, meta in pages_metadata.items():
-                try:
-                    json.dumps(meta, ensure_ascii=False)
-                except Exception as e2:
-                    print(f"      ❌ Problème avec page '{page_slug}': {e2}")
-        
-        print("\n✅ Tous les tests JSON passés!")
-        
-    except Exception as e:
-        print(f"\n❌ ERREUR: {e}")
-        import traceback
-        traceback.print_exc()
-
-def main():
+        content = path.read_bytes().strip()
+        return json_codec.loads(content) if content else None, []
+    except FileNotFoundError:
+        return None, []
+    except (OSError, ValueError) as e:
+        return None, [issue(issue_type, detail=str(e), path=path)]
+
+def run_check(workers=None):
+    """Vérifie tout le wiki et retourne le rapport"""
+    started = time.perf_counter()
+
+    inventory, issues = check_json_file(storage.INVENTORY_FILE, 'invalid_inventory')
+    _, metadata_issues = check_json_file(storage.DATA_DIR / 'pages-metadata.json', 'invalid_metadata')
+    issues.extend(metadata_issues)
+
+    inventory_slugs = {p['slug'] for p in inventory or [] if isinstance(p, dict) and 'slug' in p}
+    disk_slugs = {page_dir.name for page_dir in storage.iter_page_dirs()}
+    slugs = sorted(inventory_slugs | disk_slugs)
+
+    workers = workers or min(32, (os.cpu_count() or 1) * 4)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for page_issues in pool.map(lambda slug: check_page(slug, inventory_slugs), slugs):
+            issues.extend(page_issues)
+
+    counts = {}
+    for entry in issues:
+        counts[entry['type']] = counts.get(entry['type'], 0) + 1
+    return {
+        'format': REPORT_FORMAT_VERSION,
+        'ok': not any(entry['severity'] == 'error' for entry in issues),
+        'pages': len(slugs),
+        'duration_s': round(time.perf_counter() - started, 3),
+        'counts': dict(sorted(counts.items())),
+        'issues': issues
+    }
+
+
+def main(argv=None):
     """Point d'entrée principal"""
-    print("\n🚀 DÉBUT DU DIAGNOSTIC\n")
-    
-    # Test 1: Génération des métadonnées
-    success = test_metadata_generation()
-    
-    if not success:
-        print("\n❌ Échec du test de métadonnées, arrêt.")
-        sys.exit(1)
-    
-    # Test 2: Génération HTML
-    print("\n" + "="*60)
-    input("Appuyez sur Entrée pour tester la génération HTML...")
-    test_html_generation()
-    
-    print("\n" + "="*60)
-    print("✅ DIAGNOSTIC TERMINÉ")
-    print("="*60 + "\n")
-    
-    print("📝 PROCHAINES ÉTAPES:")
-    print("   1. Si des erreurs persistent, vérifiez les layouts JSON")
-    print("   2. Testez la sauvegarde depuis l'éditeur")
-    print("   3. Vérifiez les logs du serveur Flask\n")
+    parser = argparse.ArgumentParser(description="Vérification de l'intégrité du wiki (lecture seule)")
+    commands = parser.add_subparsers(dest='command')
+    check_parser = commands.add_parser('check', help="Vérifie toutes les pages")
+    check_parser.add_argument('--workers', type=int, default=None, help="Threads du pool (défaut : 4 × CPU, 32 au plus)")
+    check_parser.add_argument('--pretty', action='store_true', help="JSON indenté")
+    check_parser.add_argument('-o', '--output', default=None, help="Fichier du rapport (défaut : sortie standard)")
+
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0].startswith('-') and argv[0] not in ('-h', '--help'):
+        argv = ['check', *argv]
+    args = parser.parse_args(argv)
+
+    report = run_check(args.workers)
+    data = json_codec.dumps(report, pretty=args.pretty) + '\n'
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(data)
+    else:
+        sys.stdout.write(data)
+
+    summary = ', '.join(f"{name}: {count}" for name, count in report['counts'].items()) or "aucun problème"
+    marker = '✅' if report['ok'] else '❌'
+    print(f"{marker} {report['pages']} page(s) vérifiée(s) en {report['duration_s']} s — {summary}", file=sys.stderr)
+    return 0 if report['ok'] else 1
+
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+"""
+export.py - Export du wiki en site statique autonome
+
+Construit en une seule passe dans un dossier de sortie :
+- pages/<slug>/index.html + médias (images/, assets/) + CSS/JS personnalisés
+- wiki/index.html, wiki/404.html, 404.html et index.html (redirection)
+- wiki/did-you-mean.json (index de trigrammes de la 404)
+- wiki/tags.json (index des tags de la page d'accueil)
+- assets statiques référencés, renommés avec une empreinte de contenu
+- variantes compressées (.gz, et .br si le module brotli est installé)
+- sitemap.xml (si --base-url est donnée : le protocole exige des URL absolues)
+- manifest.json
+
+Usage:
+    python export.py [dossier] [--incremental] [--workers N] [--base-url URL]
+                     [--minify] [--profile [fichier.json|fichier.prof]]
+"""
+
+import argparse
+import gzip
+import hashlib
+import os
+import re
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+import generate_wiki_pages as wiki
+import instrumentation
+import json_codec
+import locks
+import minify
+import tag_index
+import trigram_index
+from core import storage
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+if sys.platform.startswith('win'):
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
+
+BASE_DIR = Path(__file__).parent
+DATA_DIR = BASE_DIR / 'data'
+STATIC_DIR = BASE_DIR / 'static'
+
+DEFAULT_OUTPUT_DIR = BASE_DIR / 'dist'
+MANIFEST_FILENAME = 'manifest.json'
+
+# Pages listées dans le rapport de minification (plus fortes réductions)
+MINIFY_REPORT_LIMIT = 10
+
+# À incrémenter quand le rendu change, pour invalider les exports incrémentaux
+EXPORT_FORMAT_VERSION = 3
+
+# Dossiers d'une page copiés tels quels (les backups/révisions restent privés)
+PAGE_MEDIA_DIRS = ('images', 'assets')
+
+COMPRESSIBLE_SUFFIXES = {'.html', '.css', '.js', '.json', '.xml', '.svg', '.txt'}
+
+STATIC_REF_PATTERN = re.compile(r'static/[\w./-]+\.(?:css|js|png|jpe?g|gif|svg|webp|woff2?)')
+
+
+# --- Helpers ---
+
+def sha256_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+def copy_if_changed(source, target):
+    """Copie un fichier si la cible est absente ou différente (taille / date)"""
+    target = Path(target)
+    source_stat = source.stat()
+    if target.exists():
+        target_stat = target.stat()
+        if target_stat.st_size == source_stat.st_size and target_stat.st_mtime >= source_stat.st_mtime:
+            return False
+    target.parent.mkdir(parents=True, exist_ok=True)
+    shutil.copy2(source, target)
+    return True
+
+def load_manifest(output_dir):
+    manifest_file = Path(output_dir) / MANIFEST_FILENAME
+    try:
+        return json_codec.load_file(manifest_file)
+    except Exception:
+        return {}
+
+
+# --- Rendu des pages (exécuté dans les workers) ---
+
+def _render_page(slug):
+    """Rend une page (exécuté dans les workers, sans charger Flask)"""
+    from core.render import render_page_html
+    from core.storage import load_layout
+    return slug, minify.process(render_page_html(slug, load_layout(slug)))
+
+def render_pages(slugs, workers):
+    """
+    Rend une liste de pages, en parallèle si workers > 1
+    Retourne {slug: (html, octets avant minification, octets après)}
+    """
+    if not slugs:
+        return {}
+    if workers <= 1 or len(slugs) == 1:
+        return dict(_render_page(slug) for slug in slugs)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return dict(executor.map(_render_page, slugs, chunksize=max(1, len(slugs) // (workers * 4))))
+
+
+# --- Étapes de l'export ---
+
+def fingerprint_assets(html_list, output_dir, produced):
+    """
+    Copie les assets statiques référencés avec une empreinte dans le nom
+    Retourne {chemin_original: chemin_empreinte}
+    """
+    asset_map = {}
+    referenced = set()
+    for html in html_list:
+        referenced.update(STATIC_REF_PATTERN.findall(html))
+
+    for ref in sorted(referenced):
+        source = BASE_DIR / ref
+        if not source.is_file():
+            print(f"   ⚠️ Asset introuvable: {ref}")
+            continue
+        data = source.read_bytes()
+        digest = sha256_bytes(data)[:10]
+        target_ref = f'{Path(ref).with_suffix("").as_posix()}.{digest}{Path(ref).suffix}'
+        target = Path(output_dir) / target_ref
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if locks.write_if_changed(target, data):
+            instrumentation.count('bytes_written', len(data))
+        produced[target_ref] = sha256_bytes(data)
+        asset_map[ref] = target_ref
+
+    return asset_map
+
+def apply_asset_map(html, asset_map):
+    for ref, target_ref in asset_map.items():
+        html = html.replace(ref, target_ref)
+    return html
+
+def page_input_key(slug, page_info, metadata_bytes, asset_map):
+    """Empreinte des entrées d'une page : si elle ne change pas, la sortie non plus"""
+    layout_file = storage.get_layout_file(slug)
+    hasher = hashlib.sha256()
+    hasher.update(str(EXPORT_FORMAT_VERSION).encode())
+    hasher.update(layout_file.read_bytes() if layout_file.exists() else b'[]')
+    hasher.update(json_codec.dumpb(page_info, sort_keys=True))
+    hasher.update(metadata_bytes)
+    hasher.update(json_codec.dumpb(asset_map, sort_keys=True))
+    hasher.update(b'minify' if minify.is_enabled() else b'')
+    return hasher.hexdigest()
+
+def copy_page_media(slug, output_dir, produced):
+    copied = 0
+    page_dir = storage.get_page_dir(slug)
+    for dirname in PAGE_MEDIA_DIRS:
+        media_dir = page_dir / dirname
+        if not media_dir.exists():
+            continue
+        for source in media_dir.rglob('*'):
+            if not source.is_file():
+                continue
+            # Même chemin que l'URL, quelle que soit la répartition des dossiers
+            rel = f'pages/{slug}/{source.relative_to(page_dir).as_posix()}'
+            if copy_if_changed(source, Path(output_dir) / rel):
+                copied += 1
+            produced[rel] = None
+    return copied
+
+def write_custom_assets(slug, output_dir, produced, written):
+    """custom.<empreinte>.css|js d'une page, recalculés depuis son layout"""
+    from core.render import render_custom_assets
+    for name, content in render_custom_assets(storage.load_layout(slug)).items():
+        rel = f'pages/{slug}/{name}'
+        data = content.encode('utf-8')
+        target = Path(output_dir) / rel
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if locks.write_if_changed(target, data):
+            instrumentation.count('bytes_written', len(data))
+            written.add(target)
+        produced[rel] = sha256_bytes(data)
+
+def compress_file(path):
+    """Écrit les variantes .gz (et .br) d'un fichier texte"""
+    data = path.read_bytes()
+    variants = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['.br'] = brotli.compress(data)
+    for suffix, compressed in variants.items():
+        if locks.write_if_changed(path.with_name(path.name + suffix), compressed):
+            instrumentation.count('bytes_written', len(compressed))
+
+def build_sitemap(pages, base_url):
+    base_url = base_url.rstrip('/')
+    urls = [(f'{base_url}/wiki/', None)]
+    for page in pages:
+        layout_file = storage.get_layout_file(page['slug'])
+        lastmod = None
+        if layout_file.exists():
+            lastmod = datetime.fromtimestamp(layout_file.stat().st_mtime, timezone.utc).strftime('%Y-%m-%d')
+        urls.append((f"{base_url}/pages/{page['slug']}/", lastmod))
+
+    lines = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+    ]
+    for loc, lastmod in urls:
+        entry = f'  <url><loc>{loc}</loc>'
+        if lastmod:
+            entry += f'<lastmod>{lastmod}</lastmod>'
+        lines.append(entry + '</url>')
+    lines.append('</urlset>')
+    return '\n'.join(lines) + '\n'
+
+
+def export_site(output_dir=DEFAULT_OUTPUT_DIR, incremental=False, workers=None, base_url='', compress=True):
+    """
+    Exporte le wiki complet dans output_dir
+    Retourne un dict de statistiques
+    """
+    started = time.perf_counter()
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+
+    previous = load_manifest(output_dir) if incremental else {}
+    previous_inputs = previous.get('inputs', {})
+
+    inventory = wiki.load_inventory()
+    metadata_file = DATA_DIR / 'pages-metadata.json'
+    metadata_bytes = metadata_file.read_bytes() if metadata_file.exists() else b'{}'
+
+    produced = {}       # chemin relatif -> sha256 (None pour les médias copiés)
+    inputs = {}         # chemin relatif -> empreinte des entrées
+    written = set()     # fichiers texte (ré)écrits, à compresser
+
+    # 1. Accueil et 404 (générateur autonome) + assets qu'ils référencent
+    home_html, *_ = minify.process(wiki.render_wiki_home())
+    not_found_html, *_ = minify.process(wiki.render_404_page(), keep_comments=(trigram_index.DID_YOU_MEAN_MARKER,))
+
+    # 2. Pages : seules celles dont les entrées ont changé sont rendues
+    slugs = [p['slug'] for p in inventory if storage.get_layout_file(p['slug']).exists()]
+    page_infos = {p['slug']: p for p in inventory}
+
+    # Les assets sont déterminés à partir d'une page de référence : toutes
+    # les pages partagent le même gabarit
+    sample_html = render_pages(slugs[:1], 1) if slugs else {}
+    asset_map = fingerprint_assets(
+        [home_html, not_found_html, *(html for html, _, _ in sample_html.values())], output_dir, produced
+    )
+
+    to_render = []
+    for slug in slugs:
+        rel = f'pages/{slug}/index.html'
+        key = page_input_key(slug, page_infos[slug], metadata_bytes, asset_map)
+        inputs[rel] = key
+        if incremental and previous_inputs.get(rel) == key and (output_dir / rel).exists():
+            produced[rel] = previous['files'].get(rel)
+            instrumentation.count('pages_skipped')
+            continue
+        to_render.append(slug)
+
+    rendered = {slug: result for slug, result in sample_html.items() if slug in to_render}
+    rendered.update(render_pages([s for s in to_render if s not in rendered], workers))
+
+    minified = {}       # slug -> (octets avant, après) si --minify
+    for slug, (html, before, after) in rendered.items():
+        if minify.is_enabled():
+            minified[slug] = (before, after)
+        rel = f'pages/{slug}/index.html'
+        with instrumentation.span('write.page', slug=slug):
+            data = apply_asset_map(html, asset_map).encode('utf-8')
+            (output_dir / rel).parent.mkdir(parents=True, exist_ok=True)
+            if locks.write_if_changed(output_dir / rel, data):
+                instrumentation.count('bytes_written', len(data))
+                written.add(output_dir / rel)
+        produced[rel] = sha256_bytes(data)
+
+    with instrumentation.span('write.media'):
+        media_copied = sum(copy_page_media(slug, output_dir, produced) for slug in slugs)
+        for slug in slugs:
+            write_custom_assets(slug, output_dir, produced, written)
+
+    # 3. Fichiers globaux
+    site_files = {
+        'wiki/index.html': apply_asset_map(home_html, asset_map),
+        'wiki/404.html': apply_asset_map(not_found_html, asset_map),
+        '404.html': apply_asset_map(not_found_html, asset_map),
+        f'wiki/{trigram_index.INDEX_FILENAME}': wiki.render_did_you_mean_index(),
+        f'wiki/{tag_index.INDEX_FILENAME}': wiki.render_tag_index(),
+        'index.html': '<!DOCTYPE html><html><head><meta charset="UTF-8">'
+                      '<meta http-equiv="refresh" content="0; url=wiki/">'
+                      '<link rel="canonical" href="wiki/"></head><body></body></html>\n',
+        'data/inventory.json': (DATA_DIR / 'inventory.json').read_text(encoding='utf-8'),
+        'data/pages-metadata.json': metadata_bytes.decode('utf-8'),
+    }
+    if base_url:
+        site_files['sitemap.xml'] = build_sitemap(
+            [p for p in inventory if not p.get('hidden_from_nav', False) and p['slug'] in slugs],
+            base_url
+        )
+    else:
+        print("   ⚠️ sitemap.xml non généré : --base-url requis (le protocole sitemap exige des URL absolues)")
+    for rel, content in site_files.items():
+        data = content.encode('utf-8')
+        (output_dir / rel).parent.mkdir(parents=True, exist_ok=True)
+        if locks.write_if_changed(output_dir / rel, data):
+            instrumentation.count('bytes_written', len(data))
+            written.add(output_dir / rel)
+        produced[rel] = sha256_bytes(data)
+
+    # 4. Variantes compressées (fichiers modifiés ou variantes manquantes)
+    if compress:
+        for rel in produced:
+            path = output_dir / rel
+            if path.suffix not in COMPRESSIBLE_SUFFIXES:
+                continue
+            if path in written or not path.with_name(path.name + '.gz').exists():
+                with instrumentation.span('write.compress'):
+                    compress_file(path)
+
+    # 5. Nettoyage des fichiers d'un export précédent qui n'existent plus
+    removed = 0
+    for rel in previous.get('files', {}):
+        if rel not in produced:
+            for stale in (output_dir / rel, output_dir / (rel + '.gz'), output_dir / (rel + '.br')):
+                if stale.exists():
+                    stale.unlink()
+                    removed += 1
+
+    # 6. Manifeste
+    manifest = {
+        'format': EXPORT_FORMAT_VERSION,
+        'assets': asset_map,
+        'files': dict(sorted(produced.items())),
+        'inputs': dict(sorted(inputs.items()))
+    }
+    manifest_data = json_codec.dumpb(manifest, pretty=True)
+    if locks.write_if_changed(output_dir / MANIFEST_FILENAME, manifest_data):
+        instrumentation.count('bytes_written', len(manifest_data))
+
+    return {
+        'pages': len(slugs),
+        'rendered': len(rendered),
+        'skipped': len(slugs) - len(rendered),
+        'written': len(written),
+        'media_copied': media_copied,
+        'removed': removed,
+        'minified': minified,
+        'duration': time.perf_counter() - started
+    }
+
+
+def main(argv=None):
+    """Point d'entrée principal"""
+    parser = argparse.ArgumentParser(description="Export du wiki en site statique")
+    parser.add_argument('output', nargs='?', default=str(DEFAULT_OUTPUT_DIR), help="Dossier de sortie")
+    parser.add_argument('--incremental', action='store_true', help="Ne reconstruire que ce qui a changé")
+    parser.add_argument('--workers', type=int, default=None, help="Nombre de processus de rendu")
+    parser.add_argument('--base-url', default='', help="URL publique du site (pour sitemap.xml)")
+    parser.add_argument('--no-compress', action='store_true', help="Ne pas générer les variantes .gz/.br")
+    parser.add_argument('--minify', action='store_true', help="Minifier le HTML, le CSS et le JS en ligne (comme WIKI_MINIFY=1)")
+    parser.add_argument('--profile', nargs='?', const='', default=None, metavar='FICHIER',
+                        help="Mesurer la génération (.json : trace Chrome, sinon dump cProfile)")
+    args = parser.parse_args(argv)
+
+    print("\n" + "="*70)
+    print("EXPORT DU SITE STATIQUE")
+    print("="*70)
+
+    if not (DATA_DIR / 'inventory.json').exists():
+        print("\n❌ Erreur: Le fichier 'data/inventory.json' n'existe pas")
+        return 1
+
+    if args.minify:
+        minify.enable()
+
+    # Les mesures ne sont collectées que dans ce processus : rendu séquentiel
+    workers = 1 if args.profile is not None else args.workers
+
+    with instrumentation.maybe_profiling(args.profile):
+        stats = export_site(
+            args.output,
+            incremental=args.incremental,
+            workers=workers,
+            base_url=args.base_url,
+            compress=not args.no_compress
+        )
+
+    print(f"\n✅ Export terminé dans {args.output} ({stats['duration']:.2f}s)")
+    print(f"   • Pages: {stats['pages']} ({stats['rendered']} rendue(s), {stats['skipped']} inchangée(s))")
+    print(f"   • Fichiers écrits: {stats['written']}, médias copiés: {stats['media_copied']}")
+    if stats['removed']:
+        print(f"   • Fichiers obsolètes supprimés: {stats['removed']}")
+    if stats['minified']:
+        before = sum(b for b, _ in stats['minified'].values())
+        after = sum(a for _, a in stats['minified'].values())
+        print(f"   • Minification des pages rendues: {minify.describe(before, after)}")
+        for slug, (b, a) in sorted(stats['minified'].items(), key=lambda item: item[1][1] - item[1][0])[:MINIFY_REPORT_LIMIT]:
+            print(f"     - {slug}: {minify.describe(b, a)}")
+    if brotli is None and not args.no_compress:
+        print("   💡 Installez 'brotli' pour générer aussi les variantes .br")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -5,12 +5,19 @@ N'a AUCUNE dépendance avec Flask/app.py
 Peut être appelé directement ou par app.py
 """
 
-import json
+import hashlib
 import sys
 import random
 from pathlib import Path
 from datetime import datetime
 
+import instrumentation
+import json_codec
+import locks
+import minify
+import tag_index
+import trigram_index
+
 if sys.platform.startswith('win'):
     sys.stdout.reconfigure(encoding='utf-8')
     sys.stderr.reconfigure(encoding='utf-8')
@@ -21,13 +28,44 @@ PAGES_DIR = BASE_DIR / 'pages'
 DATA_DIR = BASE_DIR / 'data'
 WIKI_DIR = BASE_DIR / 'wiki'
 
+# Verrous partagés avec app.py (plusieurs générations simultanées possibles)
+_locks = locks.LockRegistry(DATA_DIR / 'locks')
+
+def publish(path, html):
+    """
+    Écrit une page générée atomiquement (fichier temporaire, fsync, rename)
+    Rien n'est écrit si le contenu est identique (génération reproductible)
+    """
+    if locks.write_if_changed(path, html, durable=True):
+        instrumentation.count('bytes_written', len(html.encode('utf-8')))
+    else:
+        instrumentation.count('files_unchanged')
+
+def last_input_update():
+    """
+    Date de la dernière modification des entrées (inventaire, métadonnées)
+    Utilisée à la place de datetime.now() : même entrée => même sortie
+    """
+    mtimes = [
+        path.stat().st_mtime
+        for path in (DATA_DIR / 'inventory.json', DATA_DIR / 'pages-metadata.json')
+        if path.exists()
+    ]
+    return datetime.fromtimestamp(max(mtimes)) if mtimes else datetime.now()
+
+def pick_suggestions(pages, count=3):
+    """Suggestions de la 404 : tirage déterminé par la liste des pages"""
+    seed = hashlib.sha256('\n'.join(sorted(p['slug'] for p in pages)).encode('utf-8')).hexdigest()
+    return random.Random(seed).sample(pages, min(count, len(pages)))
+
 def load_inventory():
     """Charge l'inventaire des pages"""
     inventory_file = DATA_DIR / 'inventory.json'
     try:
-        with open(inventory_file, 'r', encoding='utf-8') as f:
-            content = f.read().strip()
-            return json.loads(content) if content else []
+        with instrumentation.span('load.inventory'):
+            with open(inventory_file, 'rb') as f:
+                content = f.read().strip()
+                return json_codec.loads(content) if content else []
     except Exception as e:
         print(f"⚠️ Erreur chargement inventory: {e}")
         return []
@@ -36,8 +74,8 @@ def load_metadata():
     """Charge les métadonnées des pages"""
     metadata_file = DATA_DIR / 'pages-metadata.json'
     try:
-        with open(metadata_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        with instrumentation.span('load.metadata'):
+            return json_codec.load_file(metadata_file)
     except Exception as e:
         print(f"⚠️ Erreur chargement metadata: {e}")
         return {}
@@ -46,19 +84,42 @@ def generate_wiki_home():
     """
     Génère la page d'accueil du wiki (/wiki/index.html)
     Cette page liste toutes les pages disponibles
+    - wiki/tags.json : index des tags des pages visibles (même données que filterPages)
     """
     print("\n📝 Génération de /wiki/index.html...")
     
+    # Créer le dossier /wiki/ si nécessaire
+    WIKI_DIR.mkdir(exist_ok=True)
+    output_file = WIKI_DIR / 'index.html'
+    
+    with _locks.get('render-wiki-home'):
+        with instrumentation.span('render.home'):
+            html = render_wiki_home()
+            tags_json = render_tag_index()
+        html, before, after = minify.process(html)
+        
+        # Sauvegarder
+        with instrumentation.span('write.home'):
+            publish(WIKI_DIR / tag_index.INDEX_FILENAME, tags_json)
+            publish(output_file, html)
+    
+    print(f"   ✅ {WIKI_DIR / tag_index.INDEX_FILENAME}")
+    print(f"   ✅ {output_file}" + (f" (minifié : {minify.describe(before, after)})" if minify.is_enabled() else ""))
+    return output_file
+
+def render_tag_index():
+    """Index des tags (JSON) des pages visibles, pour la navigation par tags"""
+    visible_pages = [p for p in load_inventory() if not p.get('hidden_from_nav', False)]
+    return tag_index.TagIndex.from_pages(visible_pages).to_json()
+
+def render_wiki_home():
+    """Retourne le HTML de la page d'accueil du wiki (sans l'écrire)"""
     inventory = load_inventory()
     visible_pages = [p for p in inventory if not p.get('hidden_from_nav', False)]
     pages_metadata = load_metadata()
 
-    all_tags = {}
-    for page in visible_pages:
-        for tag in page.get('tags', []):
-            all_tags[tag] = all_tags.get(tag, 0) + 1
-    
-    sorted_tags = sorted(all_tags.items(), key=lambda x: (-x[1], x[0]))
+    index = tag_index.TagIndex.from_pages(visible_pages)
+    sorted_tags = index.facets()
     
     page_count = len(visible_pages)
 
@@ -438,6 +499,28 @@ def generate_wiki_home():
             color: white;
         }}
         
+        .tag-filter.excluded {{
+            background: rgba(217, 83, 79, 0.25);
+            border-color: #d9534f;
+            color: #ffb3b1;
+            text-decoration: line-through;
+        }}
+        
+        .tag-filter.empty {{
+            opacity: 0.35;
+        }}
+        
+        .filter-mode {{
+            padding: 8px 16px;
+            background: rgba(74, 158, 255, 0.15);
+            border: 2px solid #4a9eff;
+            border-radius: 20px;
+            color: #4a9eff;
+            font-size: 13px;
+            cursor: pointer;
+            margin-right: 10px;
+        }}
+        
         .tag-count {{
             background: rgba(255, 255, 255, 0.2);
             padding: 2px 8px;
@@ -519,7 +602,7 @@ def generate_wiki_home():
     if sorted_tags:
         html += '''
         <div class="filter-bar">
-            <div class="filter-title">🏷️ Filtrer par tags</div>
+            <div class="filter-title">🏷️ Filtrer par tags <small>(clic : inclure, 2e clic : exclure)</small></div>
             <div class="tags-cloud" id="tags-cloud">
 '''
         for tag, count in sorted_tags:
@@ -531,6 +614,7 @@ def generate_wiki_home():
 '''
         html += '''
             </div>
+            <button class="filter-mode" id="filter-mode" data-mode="and">Toutes (ET)</button>
             <button class="clear-filters" id="clear-filters" style="display: none;">
                 ✕ Effacer les filtres
             </button>
@@ -555,13 +639,13 @@ def generate_wiki_home():
         
         for idx, page in enumerate(visible_pages):
             slug = page['slug']
+            page_id = index.ids[slug]
             title = page['title']
             icon = icons[idx % len(icons)]
             preview = pages_metadata.get(slug, {}).get('preview', 'Aucune description disponible')
             tags = page.get('tags', [])
-            tags_data = json.dumps(tags)
             
-            html += f'''        <a href="../pages/{slug}/" class="page-card" data-tags='{tags_data}'>
+            html += f'''        <a href="../pages/{slug}/" class="page-card" data-page="{page_id}">
             <div class="page-icon">{icon}</div>
             <h3 class="page-title">{title}</h3>
             <p class="page-preview">{preview}</p>
@@ -584,7 +668,7 @@ def generate_wiki_home():
         
         <footer class="footer">
             <p>✨ Wiki généré avec Architect • <span id="visible-count"></span> page(s) affichée(s)</p>
-            <p style="margin-top: 10px; font-size: 12px;">Dernière mise à jour : {datetime.now().strftime("%d/%m/%Y à %H:%M")}</p>
+            <p style="margin-top: 10px; font-size: 12px;">Dernière mise à jour : {last_input_update().strftime("%d/%m/%Y à %H:%M")}</p>
         </footer>
     </div>
     
@@ -635,84 +719,142 @@ def generate_wiki_home():
         
         console.log('✨ Wiki home chargé: {page_count} pages');
 
-        // Données des pages
-        const pagesData = ''' + json.dumps([{
-            'slug': p['slug'],
-            'title': p['title'],
-            'tags': p.get('tags', [])
-        } for p in visible_pages], ensure_ascii=False) + ''';
-        
-        // État du filtrage
-        let activeTags = new Set();
-        
+        // Index des tags (même format que wiki/tags.json) : un bitmap par tag
+        const tagIndex = ''' + index.to_json() + ''';
+        const pageCountTotal = tagIndex.pages.length;
+        const words = Math.ceil(pageCountTotal / 32);
+        const tagBits = {};
+        for (const [tag, deltas] of Object.entries(tagIndex.tags)) {
+            const bits = new Uint32Array(words);
+            let id = 0;
+            for (const delta of deltas) {
+                id += delta;
+                bits[id >>> 5] |= 1 << (id & 31);
+            }
+            tagBits[tag] = bits;
+        }
+        const emptyBits = new Uint32Array(words);
+
+        function popcount(x) {
+            x -= (x >>> 1) & 0x55555555;
+            x = (x & 0x33333333) + ((x >>> 2) & 0x33333333);
+            return (((x + (x >>> 4)) & 0x0F0F0F0F) * 0x01010101) >>> 24;
+        }
+
+        // État du filtrage : tags inclus (ET/OU selon le mode) et tags exclus
+        const includedTags = new Set();
+        const excludedTags = new Set();
+        let filterMode = 'and';
+
         // Initialisation
         const allCards = document.querySelectorAll('.page-card');
         const tagButtons = document.querySelectorAll('.tag-filter');
+        const modeBtn = document.getElementById('filter-mode');
         const clearBtn = document.getElementById('clear-filters');
         const resultsCount = document.getElementById('results-count');
         const visibleCountSpan = document.getElementById('visible-count');
-        
+
+        // Bitmap des pages sélectionnées
+        function selectPages() {
+            const selection = new Uint32Array(words).fill(0xFFFFFFFF);
+            if (pageCountTotal % 32) {
+                selection[words - 1] = (1 << (pageCountTotal % 32)) - 1;
+            }
+            if (includedTags.size > 0) {
+                const union = new Uint32Array(words);
+                for (const tag of includedTags) {
+                    const bits = tagBits[tag] || emptyBits;
+                    for (let i = 0; i < words; i++) {
+                        if (filterMode === 'and') selection[i] &= bits[i];
+                        else union[i] |= bits[i];
+                    }
+                }
+                if (filterMode === 'or') {
+                    for (let i = 0; i < words; i++) selection[i] &= union[i];
+                }
+            }
+            for (const tag of excludedTags) {
+                const bits = tagBits[tag] || emptyBits;
+                for (let i = 0; i < words; i++) selection[i] &= ~bits[i];
+            }
+            return selection;
+        }
+
         // Fonction de filtrage
         function filterPages() {
+            const selection = selectPages();
             let visibleCount = 0;
-            
+
             allCards.forEach(card => {
-                const cardTags = JSON.parse(card.dataset.tags || '[]');
-                
-                if (activeTags.size === 0) {
-                    // Aucun filtre actif = tout afficher
+                const id = Number(card.dataset.page);
+                if (selection[id >>> 5] & (1 << (id & 31))) {
                     card.classList.remove('hidden');
                     visibleCount++;
                 } else {
-                    // Vérifier si la carte a au moins un des tags actifs
-                    const hasTag = [...activeTags].some(tag => cardTags.includes(tag));
-                    
-                    if (hasTag) {
-                        card.classList.remove('hidden');
-                        visibleCount++;
-                    } else {
-                        card.classList.add('hidden');
-                    }
+                    card.classList.add('hidden');
                 }
             });
-            
+
+            // Facettes : nombre de pages de la sélection qui portent chaque tag
+            tagButtons.forEach(btn => {
+                const tag = btn.dataset.tag;
+                const bits = tagBits[tag] || emptyBits;
+                let count = 0;
+                for (let i = 0; i < words; i++) count += popcount(selection[i] & bits[i]);
+                btn.querySelector('.tag-count').textContent = count;
+                btn.classList.toggle('empty', count === 0 && !includedTags.has(tag) && !excludedTags.has(tag));
+            });
+
             // Mettre à jour les compteurs
-            if (activeTags.size > 0) {
+            if (includedTags.size > 0 || excludedTags.size > 0) {
                 resultsCount.textContent = `${visibleCount} page(s) trouvée(s)`;
                 clearBtn.style.display = 'inline-block';
             } else {
                 resultsCount.textContent = '';
                 clearBtn.style.display = 'none';
             }
-            
+
             visibleCountSpan.textContent = visibleCount;
         }
-        
-        // Gestionnaires d'événements
+
+        // Gestionnaires d'événements : neutre -> inclus -> exclu -> neutre
         tagButtons.forEach(btn => {
             btn.addEventListener('click', () => {
                 const tag = btn.dataset.tag;
-                
-                if (activeTags.has(tag)) {
-                    activeTags.delete(tag);
-                    btn.classList.remove('active');
+
+                if (includedTags.has(tag)) {
+                    includedTags.delete(tag);
+                    excludedTags.add(tag);
+                } else if (excludedTags.has(tag)) {
+                    excludedTags.delete(tag);
                 } else {
-                    activeTags.add(tag);
-                    btn.classList.add('active');
+                    includedTags.add(tag);
                 }
-                
+                btn.classList.toggle('active', includedTags.has(tag));
+                btn.classList.toggle('excluded', excludedTags.has(tag));
+
                 filterPages();
             });
         });
-        
+
+        if (modeBtn) {
+            modeBtn.addEventListener('click', () => {
+                filterMode = filterMode === 'and' ? 'or' : 'and';
+                modeBtn.dataset.mode = filterMode;
+                modeBtn.textContent = filterMode === 'and' ? 'Toutes (ET)' : 'Au moins une (OU)';
+                filterPages();
+            });
+        }
+
         if (clearBtn) {
             clearBtn.addEventListener('click', () => {
-                activeTags.clear();
-                tagButtons.forEach(btn => btn.classList.remove('active'));
+                includedTags.clear();
+                excludedTags.clear();
+                tagButtons.forEach(btn => btn.classList.remove('active', 'excluded'));
                 filterPages();
             });
         }
-        
+
         // Initialisation
         filterPages();
         
@@ -720,16 +862,7 @@ def generate_wiki_home():
 </body>
 </html>'''
     
-    # Créer le dossier /wiki/ si nécessaire
-    WIKI_DIR.mkdir(exist_ok=True)
-    
-    # Sauvegarder
-    output_file = WIKI_DIR / 'index.html'
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(html)
-    
-    print(f"   ✅ {output_file}")
-    return output_file
+    return html
 
 
 def generate_404_page():
@@ -737,12 +870,48 @@ def generate_404_page():
     Génère la page 404
     - À la racine /404.html pour GitHub Pages
     - Dans /wiki/404.html pour cohérence
+    - wiki/did-you-mean.json : index de trigrammes lu par son script
     """
     print("\n📝 Génération de la page 404...")
     
+    WIKI_DIR.mkdir(exist_ok=True)
+    wiki_404 = WIKI_DIR / '404.html'
+    root_404 = BASE_DIR / '404.html'
+    
+    with _locks.get('render-404'):
+        with instrumentation.span('render.404'):
+            html = render_404_page()
+            index_json = render_did_you_mean_index()
+        # Le marqueur des suggestions est remplacé plus tard (app.py, script de la page)
+        html, before, after = minify.process(html, keep_comments=(trigram_index.DID_YOU_MEAN_MARKER,))
+        
+        # Index avant la page : le script de la 404 le télécharge
+        with instrumentation.span('write.404'):
+            publish(WIKI_DIR / trigram_index.INDEX_FILENAME, index_json)
+        print(f"   ✅ {WIKI_DIR / trigram_index.INDEX_FILENAME}")
+        
+        # Sauvegarder dans /wiki/404.html
+        with instrumentation.span('write.404'):
+            publish(wiki_404, html)
+        print(f"   ✅ {wiki_404}" + (f" (minifié : {minify.describe(before, after)})" if minify.is_enabled() else ""))
+        
+        # Sauvegarder à la racine pour GitHub Pages
+        with instrumentation.span('write.404'):
+            publish(root_404, html)
+        print(f"   ✅ {root_404} (pour GitHub Pages)")
+    
+    return root_404
+
+def render_did_you_mean_index():
+    """Index de trigrammes (JSON) des pages visibles, pour "Vouliez-vous dire" """
+    visible_pages = [p for p in load_inventory() if not p.get('hidden_from_nav', False)]
+    return trigram_index.TrigramIndex.from_pages(visible_pages).to_json()
+
+def render_404_page():
+    """Retourne le HTML de la page 404 (sans l'écrire)"""
     inventory = load_inventory()
     visible_pages = [p for p in inventory if not p.get('hidden_from_nav', False)]
-    suggestions = random.sample(visible_pages, min(3, len(visible_pages))) if visible_pages else []
+    suggestions = pick_suggestions(visible_pages) if visible_pages else []
     
     # Détecter si on est en local ou sur GitHub Pages
     # En local : liens relatifs
@@ -946,6 +1115,8 @@ def generate_404_page():
                 ← Retour
             </a>
         </div>
+        
+        <div id="did-you-mean-slot">''' + trigram_index.DID_YOU_MEAN_MARKER + '''</div>
 '''
     
     if suggestions:
@@ -978,11 +1149,13 @@ def generate_404_page():
         
         // Détecter si on est sur GitHub Pages et ajuster les liens
         const isGitHubPages = window.location.hostname.includes('github.io');
+        let basePath = '';
         
         if (isGitHubPages) {
             // Sur GitHub Pages, déterminer le nom du repo
             const pathParts = window.location.pathname.split('/').filter(p => p);
             const repoName = pathParts[0] || '';
+            basePath = repoName ? `/${repoName}` : '';
             
             // Mettre à jour le lien d'accueil
             const homeLink = document.getElementById('home-link');
@@ -1005,26 +1178,104 @@ def generate_404_page():
             }
         }
         
+        // "Vouliez-vous dire" : pages proches de l'URL demandée (mêmes règles que trigram_index.py)
+        const MIN_SCORE = ''' + repr(trigram_index.MIN_SCORE) + ''';
+        
+        function trigrams(text) {
+            const words = text.normalize('NFD').replace(/[\\u0300-\\u036f]/g, '')
+                .toLowerCase().match(/[a-z0-9]+/g) || [];
+            const grams = new Set();
+            for (const word of words) {
+                const padded = ` ${word} `;
+                for (let i = 0; i < padded.length - 2; i++) {
+                    grams.add(padded.slice(i, i + 3));
+                }
+            }
+            return grams;
+        }
+        
+        function pathQuery(path) {
+            let segments;
+            try {
+                segments = decodeURIComponent(path).split('/');
+            } catch (e) {
+                segments = path.split('/');
+            }
+            segments = segments.filter(s => s && s !== 'index.html');
+            if (!segments.length) return '';
+            const last = segments[segments.length - 1].replace(/\\.html$/, '');
+            return (last === 'pages' || last === 'wiki') ? '' : last;
+        }
+        
+        async function showDidYouMean() {
+            const slot = document.getElementById('did-you-mean-slot');
+            // Déjà rendu par le serveur (app.py)
+            if (!slot || document.getElementById('did-you-mean')) return;
+            
+            const queryGrams = trigrams(pathQuery(window.location.pathname));
+            if (!queryGrams.size) return;
+            
+            let index;
+            try {
+                const response = await fetch(`${basePath}/wiki/''' + trigram_index.INDEX_FILENAME + '''`);
+                if (!response.ok) return;
+                index = await response.json();
+            } catch (e) {
+                return;
+            }
+            
+            // Seules les listes des trigrammes de la requête sont parcourues
+            const common = new Map();
+            for (const gram of queryGrams) {
+                const deltas = index.grams[gram];
+                if (!deltas) continue;
+                let id = 0;
+                for (const delta of deltas) {
+                    id += delta;
+                    common.set(id, (common.get(id) || 0) + 1);
+                }
+            }
+            
+            const matches = [];
+            common.forEach((count, id) => {
+                const [slug, title, gramCount] = index.pages[id];
+                const score = 2 * count / (queryGrams.size + gramCount);
+                if (score >= MIN_SCORE) matches.push({ slug, title, score });
+            });
+            if (!matches.length) return;
+            matches.sort((a, b) => b.score - a.score || (a.slug < b.slug ? -1 : a.slug > b.slug ? 1 : 0));
+            
+            const block = document.createElement('div');
+            block.className = 'suggestions did-you-mean';
+            block.id = 'did-you-mean';
+            const heading = document.createElement('h2');
+            heading.textContent = 'Vouliez-vous dire…';
+            const grid = document.createElement('div');
+            grid.className = 'suggestions-grid';
+            for (const match of matches.slice(0, ''' + str(trigram_index.DEFAULT_LIMIT) + ''')) {
+                const card = document.createElement('a');
+                card.className = 'suggestion-card';
+                card.href = `${basePath}/pages/${match.slug}/`;
+                const title = document.createElement('h3');
+                title.textContent = match.title;
+                const slug = document.createElement('p');
+                slug.textContent = match.slug;
+                card.append(title, slug);
+                grid.appendChild(card);
+            }
+            block.append(heading, grid);
+            slot.appendChild(block);
+        }
+        
+        showDidYouMean();
+        
         console.log('🔍 Page 404 chargée');
         console.log('📍 URL demandée:', window.location.href);
     </script>
 </body>
 </html>'''
     
-    # Sauvegarder dans /wiki/404.html
-    WIKI_DIR.mkdir(exist_ok=True)
-    wiki_404 = WIKI_DIR / '404.html'
-    with open(wiki_404, 'w', encoding='utf-8') as f:
-        f.write(html)
-    print(f"   ✅ {wiki_404}")
-    
-    # Sauvegarder à la racine pour GitHub Pages
-    root_404 = BASE_DIR / '404.html'
-    with open(root_404, 'w', encoding='utf-8') as f:
-        f.write(html)
-    print(f"   ✅ {root_404} (pour GitHub Pages)")
-    
-    return root_404
+    return html
 
 def main():
     """Point d'entrée principal"""
@@ -1043,10 +1294,15 @@ def main():
         print("   Créez des pages depuis l'éditeur d'abord")
         return 1
     
-    # Génération
+    # --minify : HTML/CSS/JS minifiés (comme WIKI_MINIFY=1)
+    if '--minify' in sys.argv[1:]:
+        minify.enable()
+    
+    # Génération (--profile[=fichier.json|fichier.prof] pour mesurer)
     try:
-        wiki_home = generate_wiki_home()
-        page_404 = generate_404_page()
+        with instrumentation.maybe_profiling(instrumentation.get_profile_option(sys.argv[1:])):
+            wiki_home = generate_wiki_home()
+            page_404 = generate_404_page()
         
         print("\n" + "="*70)
         print("✅ GÉNÉRATION TERMINÉE AVEC SUCCÈS")
@@ -0,0 +1,86 @@
+"""
+gunicorn.conf.py - Configuration Gunicorn (production)
+
+Usage:
+    pip install gunicorn
+    gunicorn -c gunicorn.conf.py
+
+L'application est choisie ici (ne pas la passer en argument) :
+- défaut : wsgi:application sur WIKI_WORKERS workers gthread (défaut
+  2 × CPU + 1), les lectures sont réparties sur tous les cœurs. La
+  collaboration temps réel est désactivée (WIKI_COLLAB=0 pour les workers) ;
+  /metrics agrège tous les workers via le mode multi-processus de
+  prometheus_client (pip install prometheus_client).
+- WIKI_COLLAB=1 : mode collaboration, asgi:application sur un seul worker
+  uvicorn (pip install uvicorn asgiref). Le canal des éditeurs
+  (collab.Channel) est propre à un processus ; les flux SSE sont servis par
+  la boucle asyncio et n'occupent aucun thread.
+
+Variables d'environnement : WIKI_BIND, WIKI_COLLAB, WIKI_WORKERS, WIKI_THREADS,
+PROMETHEUS_MULTIPROC_DIR (défaut data/metrics en multi-workers)
+
+Les workers partagent l'état via les fichiers (data/, pages/) :
+- inventory.json et chaque page sont protégés par des verrous fichiers (data/locks/,
+  nombre de fichiers fixe : les slugs sont répartis sur locks.LOCK_STRIPES verrous)
+- inventory.json et pages-metadata.json sont remplacés atomiquement
+- le cache HTML des composants est propre à chaque worker et vérifié à l'usage
+"""
+
+import importlib.util
+import multiprocessing
+import os
+import shutil
+from pathlib import Path
+
+import collab
+
+BASE_DIR = Path(__file__).parent
+
+bind = os.environ.get('WIKI_BIND', '0.0.0.0:5000')
+
+# Plusieurs workers par défaut : la collaboration (un seul processus) est un mode explicite
+os.environ.setdefault(collab.ENV_VAR, '0')
+
+if collab.is_enabled():
+    if importlib.util.find_spec('uvicorn') is None:
+        raise ImportError(
+            "Le mode collaboration nécessite uvicorn : pip install uvicorn asgiref "
+            f"(ou sans {collab.ENV_VAR}=1 pour plusieurs workers WSGI)"
+        )
+    if int(os.environ.get('WIKI_WORKERS', 1)) != 1:
+        print(f"⚠️ WIKI_WORKERS ignoré : un seul worker en mode collaboration ({collab.ENV_VAR}=1)")
+    wsgi_app = 'asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+    workers = 1
+else:
+    wsgi_app = 'wsgi:application'
+    worker_class = 'gthread'
+    workers = int(os.environ.get('WIKI_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+    threads = int(os.environ.get('WIKI_THREADS', 8))
+
+# Métriques de tous les workers (metrics.py) : dossier défini avant l'import de l'application
+if workers > 1:
+    os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', str(BASE_DIR / 'data' / 'metrics'))
+    os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+# create_app() est sans effet de bord persistant : import unique avant fork
+preload_app = True
+
+# La régénération du wiki (sous-processus) peut prendre jusqu'à 30 s
+timeout = 60
+graceful_timeout = 30
+
+accesslog = '-'
+errorlog = '-'
+
+
+def on_starting(server):
+    """Repart de métriques vides à chaque démarrage du serveur (fichiers des workers précédents)"""
+    multiproc_dir = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if multiproc_dir:
+        shutil.rmtree(multiproc_dir, ignore_errors=True)
+        os.makedirs(multiproc_dir, exist_ok=True)
+
+def child_exit(server, worker):
+    import metrics
+    metrics.mark_process_dead(worker.pid)
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+instrumentation.py - Mesures de temps et compteurs pour la génération
+N'a AUCUNE dépendance avec Flask/app.py
+
+Désactivé par défaut : span() retourne alors un contexte vide et count()
+ne fait rien, le coût sur le rendu est négligeable.
+
+    with instrumentation.span('render.component', type='text'):
+        ...
+    instrumentation.count('bytes_written', len(html))
+
+Les mesures peuvent être résumées (report()), exportées au format
+Chrome Trace (chrome://tracing, Perfetto) ou complétées par cProfile.
+"""
+
+import contextlib
+import os
+import threading
+import time
+
+import json_codec
+
+_enabled = False
+_spans = []         # (nom, début_ns, durée_ns, thread, args)
+_counters = {}
+_lock = threading.Lock()
+_origin_ns = time.perf_counter_ns()
+
+_NULL_SPAN = contextlib.nullcontext()
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+def disable():
+    global _enabled
+    _enabled = False
+
+def is_enabled():
+    return _enabled
+
+def reset():
+    global _origin_ns
+    with _lock:
+        _spans.clear()
+        _counters.clear()
+        _origin_ns = time.perf_counter_ns()
+
+
+class _Span:
+    __slots__ = ('name', 'args', 'start')
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        duration = time.perf_counter_ns() - self.start
+        _spans.append((self.name, self.start, duration, threading.get_ident(), self.args))
+        return False
+
+def span(name, **args):
+    """Mesure la durée d'un bloc (no-op si l'instrumentation est désactivée)"""
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, args)
+
+def count(name, value=1):
+    """Incrémente un compteur"""
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+# --- Résultats ---
+
+def summary():
+    """
+    Agrège les mesures par nom (et type de composant le cas échéant)
+    Retourne {'spans': {nom: {count, total_ms, mean_ms, max_ms}}, 'counters': {...}}
+    """
+    stats = {}
+    for name, _start, duration, _tid, args in list(_spans):
+        key = f"{name}[{args['type']}]" if 'type' in args else name
+        entry = stats.setdefault(key, {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+        duration_ms = duration / 1e6
+        entry['count'] += 1
+        entry['total_ms'] += duration_ms
+        entry['max_ms'] = max(entry['max_ms'], duration_ms)
+
+    for entry in stats.values():
+        entry['mean_ms'] = entry['total_ms'] / entry['count']
+
+    return {
+        'spans': dict(sorted(stats.items(), key=lambda item: -item[1]['total_ms'])),
+        'counters': dict(sorted(_counters.items()))
+    }
+
+def report():
+    """Affiche un tableau récapitulatif des mesures"""
+    data = summary()
+    print("\n📊 PROFIL DE GÉNÉRATION")
+    print(f"   {'étape':<36} {'appels':>7} {'total ms':>10} {'moy. ms':>9} {'max ms':>9}")
+    for name, entry in data['spans'].items():
+        print(f"   {name:<36} {entry['count']:>7} {entry['total_ms']:>10.1f} "
+              f"{entry['mean_ms']:>9.2f} {entry['max_ms']:>9.2f}")
+    if data['counters']:
+        print("   Compteurs:")
+        for name, value in data['counters'].items():
+            print(f"   • {name}: {value}")
+
+def write_chrome_trace(path):
+    """Écrit les mesures au format Chrome Trace Event (JSON)"""
+    pid = os.getpid()
+    events = [
+        {
+            'name': name,
+            'ph': 'X',
+            'ts': (start - _origin_ns) / 1000,
+            'dur': duration / 1000,
+            'pid': pid,
+            'tid': tid,
+            'args': args
+        }
+        for name, start, duration, tid, args in list(_spans)
+    ]
+    events += [
+        {'name': name, 'ph': 'C', 'ts': 0, 'pid': pid, 'args': {name: value}}
+        for name, value in _counters.items()
+    ]
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(json_codec.dumps({'traceEvents': events, 'displayTimeUnit': 'ms'}))
+
+
+@contextlib.contextmanager
+def profiling(output=None):
+    """
+    Active l'instrumentation pendant un bloc puis affiche le résumé
+    - output en .json : trace Chrome des spans
+    - autre extension : dump cProfile (lisible avec pstats / snakeviz)
+    """
+    reset()
+    enable()
+    profiler = None
+    if output and not str(output).endswith('.json'):
+        # Importés ici : coûteux et inutiles hors profilage
+        import cProfile
+        import pstats
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        disable()
+        report()
+        if output:
+            if profiler is not None:
+                profiler.dump_stats(output)
+                pstats.Stats(profiler).sort_stats('cumulative').print_stats(15)
+            else:
+                write_chrome_trace(output)
+            print(f"\n💾 Profil écrit dans {output}")
+
+def get_profile_option(argv):
+    """
+    Lit l'option --profile[=CHEMIN] d'une ligne de commande
+    Retourne None si absente, '' sans chemin, sinon le chemin
+    """
+    for arg in argv:
+        if arg == '--profile':
+            return ''
+        if arg.startswith('--profile='):
+            return arg.split('=', 1)[1]
+    return None
+
+def maybe_profiling(option):
+    """profiling() si l'option --profile est présente, sinon contexte vide"""
+    if option is None:
+        return contextlib.nullcontext()
+    return profiling(option or None)
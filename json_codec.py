@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+json_codec.py - Sérialisation JSON commune à tous les lecteurs/écrivains
+N'a AUCUNE dépendance avec Flask/app.py
+
+Utilise orjson ou msgspec s'ils sont installés (plusieurs fois plus rapides),
+sinon le module json standard. La sortie est la même dans les trois cas :
+UTF-8 sans échappement des accents, indentation de 2 espaces en mode pretty.
+
+    json_codec.dumps(obj)                # compact : fichiers lus par des machines
+    json_codec.dumps(obj, pretty=True)   # indenté : fichiers édités à la main
+    json_codec.loads(texte_ou_octets)    # ValueError si invalide
+    json_codec.load_file(path)
+
+Les erreurs de décodage sont toujours des ValueError (json.JSONDecodeError,
+orjson.JSONDecodeError et msgspec.DecodeError en héritent).
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+if orjson is not None:
+    BACKEND = 'orjson'
+elif msgspec is not None:
+    BACKEND = 'msgspec'
+else:
+    BACKEND = 'json'
+
+
+def _stdlib_dumps(obj, pretty, sort_keys):
+    if pretty:
+        return json.dumps(obj, indent=2, ensure_ascii=False, sort_keys=sort_keys)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'), sort_keys=sort_keys)
+
+def dumpb(obj, pretty=False, sort_keys=False):
+    """Sérialise en octets UTF-8"""
+    try:
+        if orjson is not None:
+            option = (orjson.OPT_INDENT_2 if pretty else 0) | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+            return orjson.dumps(obj, option=option)
+        if msgspec is not None:
+            data = msgspec.json.encode(obj, order='sorted' if sort_keys else None)
+            return msgspec.json.format(data, indent=2) if pretty else data
+    except TypeError:
+        # Clés non textuelles, entiers hors 64 bits... : le module standard les accepte
+        pass
+    return _stdlib_dumps(obj, pretty, sort_keys).encode('utf-8')
+
+def dumps(obj, pretty=False, sort_keys=False):
+    """Sérialise en texte"""
+    if orjson is None and msgspec is None:
+        return _stdlib_dumps(obj, pretty, sort_keys)
+    return dumpb(obj, pretty, sort_keys).decode('utf-8')
+
+def loads(data):
+    """Désérialise du texte ou des octets"""
+    if orjson is not None:
+        return orjson.loads(data)
+    if msgspec is not None:
+        return msgspec.json.decode(data)
+    return json.loads(data)
+
+def load_file(path):
+    """Contenu JSON d'un fichier (OSError / ValueError en cas d'échec)"""
+    with open(path, 'rb') as f:
+        return loads(f.read())
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+layout_ops.py - Opérations d'édition d'un layout, au niveau composant
+N'a AUCUNE dépendance avec Flask/app.py
+
+Une opération est un dict identifié par son champ "op" :
+- {"op": "upsert", "component": {...}}        ajoute ou remplace un composant
+- {"op": "update", "id": ..., "changes": {...}} met à jour des champs (déplacement, redimensionnement...)
+- {"op": "delete", "id": ...}                 supprime un composant
+- {"op": "reorder", "z": {id: z, ...}}        change l'ordre d'empilement
+"""
+
+import copy
+
+OP_TYPES = ('upsert', 'update', 'delete', 'reorder')
+
+
+class LayoutOpError(ValueError):
+    """Opération invalide ou inapplicable"""
+
+
+def op_component_ids(op):
+    """Retourne les ids des composants touchés par une opération"""
+    kind = op.get('op')
+    if kind == 'upsert':
+        return [op.get('component', {}).get('id')]
+    if kind in ('update', 'delete'):
+        return [op.get('id')]
+    if kind == 'reorder':
+        return list(op.get('z', {}).keys())
+    return []
+
+def apply_ops(layout, ops):
+    """
+    Applique une liste d'opérations à un layout
+    Retourne (nouveau_layout, ids_touchés) ; le layout d'origine n'est pas modifié
+    Lève LayoutOpError si une opération est invalide
+    """
+    if not isinstance(ops, list):
+        raise LayoutOpError("ops doit être une liste")
+
+    result = copy.deepcopy(layout)
+    index = {comp.get('id'): i for i, comp in enumerate(result)}
+    touched = []
+
+    def touch(comp_id):
+        if comp_id not in touched:
+            touched.append(comp_id)
+
+    for position, op in enumerate(ops):
+        if not isinstance(op, dict) or op.get('op') not in OP_TYPES:
+            raise LayoutOpError(f"Opération #{position} inconnue")
+
+        kind = op['op']
+
+        if kind == 'upsert':
+            component = op.get('component')
+            if not isinstance(component, dict) or not component.get('id'):
+                raise LayoutOpError(f"Opération #{position}: composant sans id")
+            comp_id = component['id']
+            if comp_id in index:
+                result[index[comp_id]] = copy.deepcopy(component)
+            else:
+                index[comp_id] = len(result)
+                result.append(copy.deepcopy(component))
+            touch(comp_id)
+
+        elif kind == 'update':
+            comp_id = op.get('id')
+            changes = op.get('changes')
+            if comp_id not in index:
+                raise LayoutOpError(f"Opération #{position}: composant {comp_id} introuvable")
+            if not isinstance(changes, dict) or 'id' in changes:
+                raise LayoutOpError(f"Opération #{position}: changes invalide")
+            result[index[comp_id]].update(copy.deepcopy(changes))
+            touch(comp_id)
+
+        elif kind == 'delete':
+            comp_id = op.get('id')
+            if comp_id not in index:
+                # Suppression idempotente : déjà absent
+                continue
+            del result[index[comp_id]]
+            index = {comp.get('id'): i for i, comp in enumerate(result)}
+            touch(comp_id)
+
+        elif kind == 'reorder':
+            z_values = op.get('z')
+            if not isinstance(z_values, dict):
+                raise LayoutOpError(f"Opération #{position}: z invalide")
+            for comp_id, z in z_values.items():
+                if comp_id not in index:
+                    raise LayoutOpError(f"Opération #{position}: composant {comp_id} introuvable")
+                if not isinstance(z, (int, float)):
+                    raise LayoutOpError(f"Opération #{position}: z non numérique pour {comp_id}")
+                result[index[comp_id]]['z'] = z
+                touch(comp_id)
+
+    return result, touched
+
+def merge_layouts(base, ours, theirs):
+    """
+    Fusion à trois voies au niveau composant
+    - base : layout commun de départ
+    - ours : layout proposé (dérivé de base)
+    - theirs : layout actuel (dérivé de base, modifié entre-temps)
+    Retourne (layout_fusionné, ids_en_conflit) ; un conflit survient
+    quand les deux côtés ont modifié différemment le même composant
+    """
+    base_by_id = {comp.get('id'): comp for comp in base}
+    ours_by_id = {comp.get('id'): comp for comp in ours}
+    theirs_by_id = {comp.get('id'): comp for comp in theirs}
+
+    merged = copy.deepcopy(theirs)
+    conflicts = []
+
+    candidate_ids = [comp.get('id') for comp in ours]
+    candidate_ids += [comp_id for comp_id in base_by_id if comp_id not in ours_by_id]
+
+    for comp_id in candidate_ids:
+        base_comp = base_by_id.get(comp_id)
+        our_comp = ours_by_id.get(comp_id)
+        their_comp = theirs_by_id.get(comp_id)
+
+        if our_comp == base_comp or our_comp == their_comp:
+            # Pas de modification de notre côté, ou modification identique
+            continue
+
+        if their_comp != base_comp:
+            conflicts.append(comp_id)
+            continue
+
+        position = next((i for i, comp in enumerate(merged) if comp.get('id') == comp_id), None)
+        if our_comp is None:
+            del merged[position]
+        elif position is None:
+            merged.append(copy.deepcopy(our_comp))
+        else:
+            merged[position] = copy.deepcopy(our_comp)
+
+    return merged, conflicts
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+layout_tool.py - Export/import des layouts et conversion de leur format de stockage
+
+    export SLUG --json [-o FICHIER]   layout en JSON indenté, pour l'éditer à la main
+    export SLUG -o FICHIER            fichier tel qu'il est stocké (format courant)
+    import SLUG FICHIER.json          réécrit le layout (nouvelle révision + HTML)
+    convert --format FORMAT           réécrit tous les layouts dans FORMAT
+
+Le format des sauvegardes de l'application reste celui de WIKI_LAYOUT_FORMAT
+(voir core/layouts.py) : après un convert, définir la même valeur.
+
+Usage:
+    python layout_tool.py export union-federale --json > union.json
+    python layout_tool.py import union-federale union.json
+    WIKI_LAYOUT_FORMAT=msgpack+zstd python layout_tool.py convert --format msgpack+zstd
+"""
+
+import argparse
+import sys
+
+import json_codec
+from core import layouts, storage
+
+if sys.platform.startswith('win'):
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
+
+
+def export_layout(slug, as_json, output=None):
+    path, _ = storage.layout_repository.find(slug)
+    if path is None:
+        print(f"❌ Pas de layout pour {slug}", file=sys.stderr)
+        return 1
+
+    if as_json:
+        data = (storage.layout_repository.to_json(slug) + '\n').encode('utf-8')
+    elif output is None:
+        print("❌ Format binaire : préciser -o FICHIER (ou --json)", file=sys.stderr)
+        return 1
+    else:
+        data = path.read_bytes()
+
+    if output is None:
+        sys.stdout.write(data.decode('utf-8'))
+    else:
+        with open(output, 'wb') as f:
+            f.write(data)
+        print(f"✅ {slug} → {output} ({len(data)} octets)")
+    return 0
+
+def import_layout(slug, source):
+    if not storage.get_page_dir(slug).exists():
+        print(f"❌ Page non trouvée: {slug}", file=sys.stderr)
+        return 1
+    try:
+        layout = json_codec.load_file(source)
+    except (OSError, ValueError) as e:
+        print(f"❌ {source} illisible: {e}", file=sys.stderr)
+        return 1
+    if not isinstance(layout, list):
+        print("❌ Le layout doit être une liste de composants", file=sys.stderr)
+        return 1
+
+    from core.render import generate_html
+    with storage.page_lock(slug):
+        entry = storage.write_layout(slug, layout)
+        generate_html(slug, layout)
+    storage.generate_pages_metadata()
+    print(f"✅ {slug} importé (révision {entry['rev']}, {len(layout)} composants)")
+    return 0
+
+def convert_layouts(format_name):
+    """Réécrit chaque layout au format donné, retourne (pages converties, octets avant, après)"""
+    target = layouts.LayoutRepository(storage.get_page_dir, format_name)
+    converted = before = after = 0
+    for page_dir in storage.iter_page_dirs():
+        slug = page_dir.name
+        with storage.page_lock(slug):
+            path, codec = storage.layout_repository.find(slug)
+            if path is None:
+                continue
+            before += path.stat().st_size
+            if codec is not target.codec:
+                target.save(slug, storage.layout_repository.load(slug))
+                converted += 1
+            after += target.path(slug).stat().st_size
+    return converted, before, after
+
+
+def main(argv=None):
+    """Point d'entrée principal"""
+    parser = argparse.ArgumentParser(description="Export/import et format des layouts")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = commands.add_parser('export', help="Exporte le layout d'une page")
+    export_parser.add_argument('slug')
+    export_parser.add_argument('--json', action='store_true', help="JSON indenté (édition à la main)")
+    export_parser.add_argument('-o', '--output', default=None, help="Fichier de sortie (défaut : sortie standard)")
+
+    import_parser = commands.add_parser('import', help="Importe un layout JSON dans une page")
+    import_parser.add_argument('slug')
+    import_parser.add_argument('source')
+
+    convert_parser = commands.add_parser('convert', help="Convertit tous les layouts")
+    convert_parser.add_argument('--format', required=True, choices=list(layouts.FORMATS))
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'export':
+        return export_layout(args.slug, args.json, args.output)
+    if args.command == 'import':
+        return import_layout(args.slug, args.source)
+
+    try:
+        layouts.get_codec(args.format)
+    except ValueError as e:
+        parser.error(str(e))
+    converted, before, after = convert_layouts(args.format)
+    print(f"✅ {converted} layout(s) convertis en {args.format}")
+    print(f"   • Taille totale: {before / 1024:.0f} Ko → {after / 1024:.0f} Ko")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
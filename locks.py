@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+locks.py - Verrous inter-processus et écritures atomiques
+N'a AUCUNE dépendance avec Flask/app.py
+
+Avec plusieurs workers (Gunicorn), les verrous threading ne suffisent plus :
+chaque processus a les siens. InterProcessLock combine un verrou threading
+(threads d'un même worker) et un verrou fcntl.flock sur un fichier
+(workers entre eux). Sous Windows, msvcrt.locking est utilisé.
+
+atomic_write() garantit qu'un lecteur voit l'ancien ou le nouveau contenu
+d'un fichier, jamais un fichier à moitié écrit. Avec durable=True (pages
+publiées), le contenu est aussi forcé sur disque (fsync) avant le rename.
+"""
+
+import hashlib
+import os
+import threading
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Verrous par sorte pour les clés non bornées (LockRegistry.striped)
+LOCK_STRIPES = 256
+
+
+class InterProcessLock:
+    """Verrou exclusif partagé par les threads et les processus (réentrant par thread non supporté)"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._thread_lock = threading.Lock()
+        self._file = None
+
+    def acquire(self):
+        self._thread_lock.acquire()
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, 'a+b')
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+            else:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+        except BaseException:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._thread_lock.release()
+            raise
+
+    def release(self):
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            else:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self._file.close()
+            self._file = None
+            self._thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+        return False
+
+
+class LockRegistry:
+    """
+    InterProcessLock partagés, fichiers de verrou dans un dossier commun
+
+    get(name) : un verrou par nom, pour un petit ensemble de noms fixes
+    striped(kind, key) : clés non bornées (slugs) réparties sur `stripes`
+    verrous par sorte (<kind>-XX.lock) ; fichiers et verrous en mémoire
+    restent en nombre fixe. Deux clés peuvent partager un verrou : ne jamais
+    tenir deux clés d'une même sorte à la fois (les sortes sont distinctes)
+    """
+
+    def __init__(self, lock_dir, stripes=LOCK_STRIPES):
+        self.lock_dir = Path(lock_dir)
+        self.stripes = stripes
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    def get(self, name):
+        with self._guard:
+            if name not in self._locks:
+                self._locks[name] = InterProcessLock(self.lock_dir / f'{name}.lock')
+            return self._locks[name]
+
+    def striped(self, kind, key):
+        # Empreinte stable entre processus (hash() est aléatoire par processus)
+        digest = hashlib.sha256(key.encode('utf-8')).digest()
+        index = int.from_bytes(digest[:4], 'big') % self.stripes
+        return self.get(f'{kind}-{index:02x}')
+
+
+def _fsync_dir(directory):
+    """Rend le rename durable (POSIX uniquement)"""
+    if fcntl is None:
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def atomic_write(path, data, encoding='utf-8', durable=False):
+    """
+    Écrit un fichier via un fichier temporaire du même dossier puis os.replace
+    data : str (encodé avec encoding) ou bytes
+    durable : fsync du fichier puis du dossier
+    """
+    import tempfile
+
+    path = Path(path)
+    if isinstance(data, str):
+        data = data.encode(encoding)
+
+    # mkstemp crée le fichier en 0600 : garder les droits du fichier remplacé
+    try:
+        mode = path.stat().st_mode & 0o777
+    except FileNotFoundError:
+        mode = 0o644
+
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            if durable:
+                f.flush()
+                os.fsync(f.fileno())
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+        if durable:
+            _fsync_dir(path.parent)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+def write_if_changed(path, data, encoding='utf-8', durable=False):
+    """
+    atomic_write() seulement si le contenu diffère du fichier existant
+    Retourne True si le fichier a été (ré)écrit : une génération sans
+    changement ne modifie aucun fichier (dates, ETags et caches conservés)
+    """
+    path = Path(path)
+    if isinstance(data, str):
+        data = data.encode(encoding)
+    try:
+        if path.stat().st_size == len(data) and path.read_bytes() == data:
+            return False
+    except FileNotFoundError:
+        pass
+    atomic_write(path, data, durable=durable)
+    return True
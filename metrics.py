@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+metrics.py - Compteurs et histogrammes au format texte Prometheus
+N'a AUCUNE dépendance avec Flask/app.py
+
+Contrairement à instrumentation.py (mesures ponctuelles d'une génération),
+ces métriques sont toujours actives et cumulées sur la vie du processus :
+
+    REQUESTS = metrics.counter('wiki_requests_total', "Requêtes", ('endpoint',))
+    REQUESTS.labels('viewer').inc()
+
+    with SAVE_STAGE.labels('write').time():
+        ...
+
+    metrics.render()  # texte à servir sur /metrics
+
+Le coût d'une observation est une recherche dans un dict (enfant mis en
+cache par valeurs de labels) et un bisect sous verrou.
+
+Plusieurs workers (gunicorn.conf.py) : si PROMETHEUS_MULTIPROC_DIR est
+défini, les métriques sont créées avec prometheus_client en mode
+multi-processus (un fichier par worker dans ce dossier) et render()
+agrège celles de tous les workers. La variable doit être définie avant
+l'import de ce module.
+"""
+
+import os
+import threading
+import time
+from bisect import bisect_left
+
+MULTIPROCESS_DIR = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+
+if MULTIPROCESS_DIR:
+    try:
+        import prometheus_client
+        from prometheus_client import multiprocess
+    except ImportError as e:
+        raise ImportError("PROMETHEUS_MULTIPROC_DIR nécessite prometheus_client : pip install prometheus_client") from e
+else:
+    prometheus_client = None
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry = []
+_registry_lock = threading.Lock()
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        """Retourne la série correspondant aux valeurs de labels (créée au besoin)"""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name}: labels attendus {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def collect(self):
+        """Lignes du format d'exposition texte"""
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        for values, child in sorted(self._children.items()):
+            lines.extend(child.collect(self.name, self.labelnames, values))
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def collect(self, name, labelnames, values):
+        return [f'{name}{_format_labels(labelnames, values)} {_format_value(self.value)}']
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+
+class _Timer:
+    __slots__ = ('child', 'start')
+
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.start)
+        return False
+
+class _HistogramChild:
+    __slots__ = ('bounds', 'counts', 'sum', '_lock')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def time(self):
+        """Contexte qui observe la durée du bloc (secondes)"""
+        return _Timer(self)
+
+    def collect(self, name, labelnames, values):
+        with self._lock:
+            counts = list(self.counts)
+            total_sum = self.sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip((*self.bounds, float('inf')), counts):
+            cumulative += count
+            labels = _format_labels(labelnames, values, ('le', _format_value(float(bound))))
+            lines.append(f'{name}_bucket{labels} {cumulative}')
+        labels = _format_labels(labelnames, values)
+        lines.append(f'{name}_sum{labels} {_format_value(total_sum)}')
+        lines.append(f'{name}_count{labels} {cumulative}')
+        return lines
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.bounds = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.bounds)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+
+def _register(metric):
+    if prometheus_client is not None:
+        return _register_multiprocess(metric)
+    with _registry_lock:
+        for existing in _registry:
+            if existing.name == metric.name:
+                return existing
+        _registry.append(metric)
+    return metric
+
+# Métriques prometheus_client par nom (mode multi-processus)
+_multiprocess_metrics = {}
+
+def _register_multiprocess(metric):
+    """Équivalent prometheus_client d'une métrique (mêmes labels(), inc(), observe(), time())"""
+    with _registry_lock:
+        existing = _multiprocess_metrics.get(metric.name)
+        if existing is None:
+            if metric.kind == 'counter':
+                existing = prometheus_client.Counter(metric.name, metric.documentation, metric.labelnames)
+            else:
+                existing = prometheus_client.Histogram(
+                    metric.name, metric.documentation, metric.labelnames, buckets=metric.bounds)
+            _multiprocess_metrics[metric.name] = existing
+        return existing
+
+def mark_process_dead(pid):
+    """À appeler quand un worker se termine (hook child_exit de gunicorn.conf.py)"""
+    if prometheus_client is not None:
+        multiprocess.mark_process_dead(pid)
+
+def counter(name, documentation, labelnames=()):
+    """Déclare (ou retrouve) un compteur"""
+    return _register(Counter(name, documentation, labelnames))
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+    """Déclare (ou retrouve) un histogramme"""
+    return _register(Histogram(name, documentation, labelnames, buckets))
+
+def render():
+    """Toutes les métriques au format d'exposition texte Prometheus"""
+    if prometheus_client is not None:
+        # Agrégation des fichiers de tous les workers
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return prometheus_client.generate_latest(registry).decode('utf-8')
+    with _registry_lock:
+        metrics = list(_registry)
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.collect())
+    return '\n'.join(lines) + '\n'
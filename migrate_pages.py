@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+migrate_pages.py - Change la répartition des dossiers de pages sur le disque
+
+    pages/<slug>/           --levels 0 (par défaut, répartition historique)
+    pages/3f/<slug>/        --levels 1 --width 2 (256 sous-dossiers)
+    pages/3f/a0/<slug>/     --levels 2 --width 2 (65 536 sous-dossiers)
+
+Les préfixes sont ceux du sha256 du slug (voir core/storage.get_page_dir) :
+les URL /pages/<slug>/ ne changent pas. La répartition est enregistrée dans
+pages/.sharding.json et lue une fois par processus : arrêter le serveur et
+watch.py avant de migrer. Une migration interrompue se reprend en relançant
+la même commande (les pages déjà déplacées sont ignorées).
+
+Usage:
+    python migrate_pages.py --levels 2 [--width 2] [--dry-run]
+"""
+
+import argparse
+import os
+import sys
+
+import json_codec
+import locks
+from core import layouts, storage
+
+if sys.platform.startswith('win'):
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
+
+
+def plan_moves(current, target):
+    """
+    Déplacements nécessaires pour passer de la répartition current à target
+    Retourne (moves [(slug, source, destination)], conflicts [slug], ignored [dossier])
+    """
+    slugs = {p['slug'] for p in storage.load_inventory()}
+
+    # Dossiers de répartition de la cible déjà créés (reprise d'une migration) :
+    # à ne pas confondre avec des pages hors inventaire
+    shard_dirs = set()
+    target_dirs = set()
+    for slug in slugs:
+        target_dirs.add(storage.shard_page_dir(slug, *target))
+        shard_dirs.update(storage.shard_page_dir(slug, *target).parents)
+
+    ignored = []
+    for page_dir in storage.iter_page_dirs(current):
+        if page_dir.name in slugs or page_dir in shard_dirs:
+            continue
+        if not target_dirs.isdisjoint(page_dir.parents):
+            continue                     # sous-dossier d'une page déjà déplacée
+        if any((page_dir / name).exists() for name in layouts.FILENAMES):
+            slugs.add(page_dir.name)     # page hors inventaire : déplacée aussi
+        else:
+            ignored.append(page_dir)
+
+    moves = []
+    conflicts = []
+    for slug in sorted(slugs):
+        source = storage.shard_page_dir(slug, *current)
+        destination = storage.shard_page_dir(slug, *target)
+        if source == destination or not source.exists():
+            continue
+        if destination.exists():
+            conflicts.append(slug)
+            continue
+        moves.append((slug, source, destination))
+    return moves, conflicts, ignored
+
+def prune_shard_dirs(levels):
+    """Supprime les dossiers de répartition vides (du plus profond au plus haut)"""
+    removed = 0
+    for depth in range(levels, 0, -1):
+        for shard_dir in storage.PAGES_DIR.glob('/'.join(['*'] * depth)):
+            if shard_dir.is_dir() and not shard_dir.name.startswith('.') and not any(shard_dir.iterdir()):
+                shard_dir.rmdir()
+                removed += 1
+    return removed
+
+def write_sharding(levels, width):
+    if levels:
+        locks.atomic_write(storage.SHARDING_FILE, json_codec.dumps({'levels': levels, 'width': width}) + '\n')
+    elif storage.SHARDING_FILE.exists():
+        storage.SHARDING_FILE.unlink()
+
+def migrate(levels, width, dry_run=False):
+    """Déplace les dossiers de pages puis enregistre la nouvelle répartition"""
+    current = storage.load_sharding(refresh=True)
+    target = (levels, width if levels else 0)
+
+    with storage.inventory_lock():
+        moves, conflicts, ignored = plan_moves(current, target)
+        if dry_run:
+            return {'moved': len(moves), 'conflicts': conflicts, 'ignored': ignored, 'pruned': 0}
+
+        for slug, source, destination in moves:
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            os.rename(source, destination)
+
+        # Enregistrée après les déplacements : une reprise relit l'ancienne répartition
+        write_sharding(*target)
+        pruned = prune_shard_dirs(current[0]) if current[0] else 0
+        storage.load_sharding(refresh=True)
+
+    return {'moved': len(moves), 'conflicts': conflicts, 'ignored': ignored, 'pruned': pruned}
+
+
+def main(argv=None):
+    """Point d'entrée principal"""
+    parser = argparse.ArgumentParser(description="Répartition des dossiers de pages")
+    parser.add_argument('--levels', type=int, required=True,
+                        help="Niveaux de sous-dossiers (0 = pages/<slug>/)")
+    parser.add_argument('--width', type=int, default=2,
+                        help="Caractères hexadécimaux par niveau (défaut : 2)")
+    parser.add_argument('--dry-run', action='store_true', help="Affiche le plan sans rien déplacer")
+    args = parser.parse_args(argv)
+
+    if not 0 <= args.levels <= storage.MAX_SHARD_LEVELS or not 1 <= args.width <= storage.MAX_SHARD_WIDTH:
+        parser.error(f"--levels entre 0 et {storage.MAX_SHARD_LEVELS}, --width entre 1 et {storage.MAX_SHARD_WIDTH}")
+
+    try:
+        current = storage.load_sharding(refresh=True)
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"\n📁 Répartition actuelle : {current[0]} niveau(x) × {current[1]} caractère(s)")
+    print(f"📁 Nouvelle répartition : {args.levels} niveau(x) × {args.width if args.levels else 0} caractère(s)")
+
+    stats = migrate(args.levels, args.width, dry_run=args.dry_run)
+
+    verb = "à déplacer" if args.dry_run else "déplacée(s)"
+    print(f"\n✅ {stats['moved']} page(s) {verb}")
+    if stats['pruned']:
+        print(f"   • {stats['pruned']} dossier(s) de répartition vide(s) supprimé(s)")
+    for slug in stats['conflicts']:
+        print(f"   ⚠️ {slug} : présente dans les deux répartitions, laissée en place")
+    for page_dir in stats['ignored']:
+        print(f"   ⚠️ {page_dir.relative_to(storage.BASE_DIR)} : sans layout ni entrée d'inventaire, ignoré")
+    if not args.dry_run:
+        print("\n💡 Redémarrez le serveur et watch.py pour utiliser la nouvelle répartition")
+    return 1 if stats['conflicts'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
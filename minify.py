@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+minify.py - Minification optionnelle des pages générées (HTML, CSS et JS en ligne)
+N'a AUCUNE dépendance avec Flask/app.py
+
+Activée par WIKI_MINIFY=1 ou par l'option --minify de regenerate_all.py,
+generate_wiki_pages.py et export.py (enable() la transmet aux processus
+lancés ensuite).
+
+Transformations sûres uniquement :
+- HTML : commentaires supprimés (sauf marqueurs à conserver), blancs réduits
+  à un espace ou un retour à la ligne, supprimés entre balises de bloc ;
+  <pre> et <textarea> intacts, attributs jamais modifiés
+- CSS : commentaires et blancs superflus supprimés, chaînes intactes
+- JS : commentaires et indentation supprimés, retours à la ligne conservés
+  (insertion automatique des points-virgules), chaînes, templates et
+  expressions régulières intacts
+
+    html, before, after = minify.process(html)   # tailles en octets
+"""
+
+import os
+import re
+
+import instrumentation
+
+ENV_VAR = 'WIKI_MINIFY'
+
+_enabled = os.environ.get(ENV_VAR, '').lower() not in ('', '0', 'false', 'no')
+
+
+def enable():
+    """Active la minification (ce processus et ceux qu'il lance)"""
+    global _enabled
+    _enabled = True
+    os.environ[ENV_VAR] = '1'
+
+def is_enabled():
+    return _enabled
+
+
+# --- CSS ---
+
+_CSS_TOKEN = re.compile(r'("[^"\\]*(?:\\.[^"\\]*)*"|\'[^\'\\]*(?:\\.[^\'\\]*)*\')|/\*.*?\*/', re.DOTALL)
+
+def _minify_css_text(text):
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'\s*([{};,>])\s*', r'\1', text)
+    return re.sub(r':\s+', ':', text).replace(';}', '}')
+
+def minify_css(css):
+    parts = []
+    text = ''           # CSS entre deux chaînes, commentaires remplacés par un espace
+    position = 0
+    for match in _CSS_TOKEN.finditer(css):
+        text += css[position:match.start()]
+        position = match.end()
+        if match.group(1):
+            parts.append(_minify_css_text(text))
+            parts.append(match.group(1))
+            text = ''
+        else:
+            text += ' '
+    parts.append(_minify_css_text(text + css[position:]))
+    return ''.join(parts).strip()
+
+
+# --- JS ---
+
+_JS_STRING = r'"[^"\\\n]*(?:\\.[^"\\\n]*)*"|\'[^\'\\\n]*(?:\\.[^\'\\\n]*)*\''
+_JS_STRING_PATTERN = re.compile(_JS_STRING)
+
+# code : suite de caractères sans blanc ni "/" et de chaînes complètes (un
+# JSON compact en ligne forme un seul jeton)
+_JS_TOKEN = re.compile(rf'''
+    (?P<code>(?:[^"'`/ \t\r\n\f\v]+|{_JS_STRING})+)
+  | (?P<template>`)
+  | (?P<line_comment>//[^\n]*)
+  | (?P<block_comment>/\*.*?(?:\*/|\Z))
+  | (?P<space>[ \t\r\n\f\v]+)
+  | (?P<slash>/)
+  | (?P<other>.)
+''', re.DOTALL | re.VERBOSE)
+
+_JS_REGEX = re.compile(r'/(?:[^/\\\[\n]|\\.|\[(?:[^\]\\\n]|\\.)*\])+/[A-Za-z]*')
+
+# Après ces caractères ou mots-clés, "/" ouvre une expression régulière
+_REGEX_PRECEDERS = set('(,=:[!&|?{};+-*%<>~^')
+_REGEX_KEYWORDS = {'return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'new',
+                   'delete', 'void', 'throw', 'instanceof', 'yield', 'await'}
+
+_IDENTIFIER_TAIL = re.compile(r'[A-Za-z0-9_$]+$')
+
+def _is_identifier_char(char):
+    return char.isalnum() or char in '_$\\' or ord(char) > 127
+
+def _skip_template(code, position):
+    """Fin d'un template `...` (expressions ${...} comprises) à partir de son ouverture"""
+    end = len(code)
+    i = position + 1
+    while i < end:
+        char = code[i]
+        if char == '\\':
+            i += 2
+        elif char == '`':
+            return i + 1
+        elif char == '$' and code.startswith('{', i + 1):
+            depth = 1
+            i += 2
+            while i < end and depth:
+                char = code[i]
+                if char in '"\'':
+                    match = _JS_STRING_PATTERN.match(code, i)
+                    i = match.end() if match else i + 1
+                    continue
+                if char == '`':
+                    i = _skip_template(code, i)
+                    continue
+                if char == '{':
+                    depth += 1
+                elif char == '}':
+                    depth -= 1
+                i += 1
+        else:
+            i += 1
+    return end
+
+def minify_js(code):
+    out = []
+    last = ''          # dernier caractère émis
+    last_word = ''     # dernier identifiant émis (détection des regex)
+    pending = ''       # '', ' ' ou '\n' : blanc à émettre avant le prochain jeton
+    position = 0
+    end = len(code)
+
+    while position < end:
+        match = _JS_TOKEN.match(code, position)
+        kind = match.lastgroup
+        token = match.group()
+
+        if kind == 'space' or kind == 'block_comment':
+            if '\n' in token:
+                pending = '\n'
+            elif not pending:
+                pending = ' '
+            position = match.end()
+            continue
+        if kind == 'line_comment':
+            position = match.end()
+            continue
+        if kind == 'template':
+            token = code[position:_skip_template(code, position)]
+        elif kind == 'slash':
+            regex_allowed = not last or last in _REGEX_PRECEDERS or last_word in _REGEX_KEYWORDS
+            regex = _JS_REGEX.match(code, position) if regex_allowed else None
+            if regex is not None:
+                token = regex.group()
+
+        if out and pending == '\n':
+            out.append('\n')
+        elif out and pending == ' ' and (
+            (_is_identifier_char(last) and _is_identifier_char(token[0]))
+            or (last == token[0] and last in '+-/')
+            or (last.isdigit() and token[0] == '.')
+        ):
+            out.append(' ')
+        pending = ''
+
+        out.append(token)
+        last = token[-1]
+        tail = _IDENTIFIER_TAIL.search(token[-16:]) if kind == 'code' else None
+        last_word = tail.group() if tail else ''
+        position += len(token)
+
+    return ''.join(out)
+
+
+# --- HTML ---
+
+_HTML_TOKEN = re.compile(
+    r'<!--.*?-->|<(pre|textarea|script|style)\b([^>]*)>(.*?)</\1\s*>',
+    re.DOTALL | re.IGNORECASE
+)
+
+_BLOCK_TAGS = (
+    'html|head|body|meta|link|title|script|style|noscript|div|nav|main|header|footer|'
+    'section|article|aside|form|ul|ol|li|p|h[1-6]|table|thead|tbody|tfoot|tr|td|th|br|hr|'
+    'video|source|iframe|!DOCTYPE'
+)
+_SPACE_BEFORE_BLOCK = re.compile(rf'(?<=>)\s+(?=</?(?:{_BLOCK_TAGS})\b)', re.IGNORECASE)
+_SPACE_AFTER_BLOCK = re.compile(rf'(</?(?:{_BLOCK_TAGS})\b[^>]*>)\s+(?=<)', re.IGNORECASE)
+
+_JS_TYPES = ('', 'text/javascript', 'application/javascript', 'module')
+
+def _collapse_whitespace(text):
+    return re.sub(r'\s+', lambda m: '\n' if '\n' in m.group() else ' ', text)
+
+def _script_type(attrs):
+    match = re.search(r'\btype\s*=\s*["\']?([^"\'\s>]+)', attrs, re.IGNORECASE)
+    return match.group(1).lower() if match else ''
+
+def minify_html(html, keep_comments=()):
+    """
+    keep_comments : commentaires à conserver tels quels (marqueurs remplacés
+    plus tard, ex. trigram_index.DID_YOU_MEAN_MARKER)
+    """
+    html = html.replace('\0', '')
+    kept = []       # blocs conservés, remplacés par <nom\0index> le temps des passes
+    parts = []
+    position = 0
+    for match in _HTML_TOKEN.finditer(html):
+        parts.append(_collapse_whitespace(html[position:match.start()]))
+        position = match.end()
+
+        token = match.group()
+        tag = match.group(1)
+        if tag is None:
+            if token in keep_comments or token.startswith('<!--['):
+                parts.append(f'<!--\0{len(kept)}>')
+                kept.append(token)
+            continue
+        if tag.lower() == 'script' and _script_type(match.group(2)) in _JS_TYPES:
+            token = f'<{tag}{match.group(2)}>{minify_js(match.group(3))}</{tag}>'
+        elif tag.lower() == 'style':
+            token = f'<{tag}{match.group(2)}>{minify_css(match.group(3))}</{tag}>'
+        parts.append(f'<{tag}\0{len(kept)}>')
+        kept.append(token)
+    parts.append(_collapse_whitespace(html[position:]))
+
+    html = ''.join(parts)
+    html = _SPACE_BEFORE_BLOCK.sub('', html)
+    html = _SPACE_AFTER_BLOCK.sub(r'\1', html)
+    html = re.sub(r'<(?:!--|[A-Za-z]+)\0(\d+)>', lambda m: kept[int(m.group(1))], html)
+    return html.strip() + '\n'
+
+
+def process(html, keep_comments=()):
+    """
+    Post-traitement d'une page générée : (html, octets avant, octets après)
+    html est rendu tel quel si la minification est désactivée
+    """
+    before = len(html.encode('utf-8'))
+    if not _enabled:
+        return html, before, before
+    with instrumentation.span('minify'):
+        html = minify_html(html, keep_comments)
+    after = len(html.encode('utf-8'))
+    instrumentation.count('minify_bytes_before', before)
+    instrumentation.count('minify_bytes_after', after)
+    return html, before, after
+
+def describe(before, after):
+    """'52.1 Ko → 40.3 Ko, -22.6 %' pour les rapports de génération"""
+    saved = 100 * (before - after) / before if before else 0
+    return f"{before / 1024:.1f} Ko → {after / 1024:.1f} Ko, -{saved:.1f} %"
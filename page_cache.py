@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+page_cache.py - Cache mémoire (LRU) des pages HTML générées
+N'a AUCUNE dépendance avec Flask/app.py
+
+Chaque entrée est validée par un simple os.stat (date + taille) : une page
+régénérée par un autre worker ou par generate_wiki_pages.py (sous-processus)
+est donc relue automatiquement. Les écritures du processus courant appellent
+en plus invalidate().
+
+    cache = PageCache()
+    entry = cache.get(path)   # None si le fichier n'existe pas
+    entry.body, entry.etag, entry.last_modified
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+# Taille totale max des pages gardées en mémoire
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+class CachedFile:
+    __slots__ = ('body', 'key', 'etag', 'last_modified')
+
+    def __init__(self, body, key):
+        self.body = body
+        self.key = key
+        mtime_ns, size = key
+        self.etag = f'"{mtime_ns:x}-{size:x}"'
+        # email.utils est lent à importer : seulement au premier fichier mis en cache
+        from email.utils import formatdate
+        self.last_modified = formatdate(mtime_ns / 1e9, usegmt=True)
+
+
+class PageCache:
+    """LRU borné en octets, sûr entre threads"""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _stat_key(path):
+        try:
+            stat = os.stat(path)
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def peek(self, path):
+        """Entrée en cache encore valide, sans lecture disque (None sinon)"""
+        path = Path(path)
+        key = self._stat_key(path)
+        if key is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None or entry.key != key:
+                return None
+            self._entries.move_to_end(path)
+            self.hits += 1
+            return entry
+
+    def get(self, path):
+        """Entrée du fichier (lu si absent du cache ou modifié), None s'il n'existe pas"""
+        entry = self.peek(path)
+        if entry is not None:
+            return entry
+
+        path = Path(path)
+        key = self._stat_key(path)
+        if key is None:
+            return None
+        try:
+            body = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        # Fichier remplacé pendant la lecture : la clé doit correspondre au contenu lu
+        if len(body) != key[1]:
+            key = self._stat_key(path) or key
+
+        entry = CachedFile(body, key)
+        with self._lock:
+            self.misses += 1
+            previous = self._entries.pop(path, None)
+            if previous is not None:
+                self._size -= len(previous.body)
+            if len(body) <= self.max_bytes:
+                self._entries[path] = entry
+                self._size += len(body)
+                while self._size > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._size -= len(evicted.body)
+        return entry
+
+    def invalidate(self, path=None):
+        """Retire une page du cache (toutes si path est None)"""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                self._size = 0
+                return
+            entry = self._entries.pop(Path(path), None)
+            if entry is not None:
+                self._size -= len(entry.body)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._size,
+                'hits': self.hits,
+                'misses': self.misses
+            }
@@ -1,22 +1,37 @@
 # regenerate_all.py
-from app import load_inventory, get_layout_file, generate_html, generate_pages_metadata
-import json
+# Usage: python regenerate_all.py [--minify] [--profile[=fichier.json|fichier.prof]]
+import sys
 
-# Générer les métadonnées d'abord
-print("🔄 Génération des métadonnées...")
-generate_pages_metadata()
+import instrumentation
+import minify
+from core.render import generate_html
+from core.storage import load_inventory, get_layout_file, load_layout, generate_pages_metadata
 
-# Régénérer chaque page
-inventory = load_inventory()
-for page in inventory:
-    slug = page['slug']
-    layout_file = get_layout_file(slug)
-    
-    if layout_file.exists():
-        with open(layout_file, 'r', encoding='utf-8') as f:
-            layout = json.load(f)
+def main():
+    # Générer les métadonnées d'abord
+    print("🔄 Génération des métadonnées...")
+    with instrumentation.span('metadata'):
+        generate_pages_metadata()
+
+    # Régénérer chaque page
+    inventory = load_inventory()
+    for page in inventory:
+        slug = page['slug']
+        layout_file = get_layout_file(slug)
         
-        print(f"🔄 Régénération: {page['title']} ({slug})")
-        generate_html(slug, layout)
+        if layout_file.exists():
+            layout = load_layout(slug)
+            
+            print(f"🔄 Régénération: {page['title']} ({slug})")
+            generate_html(slug, layout)
+        else:
+            instrumentation.count('pages_skipped')
+
+    print("\n✅ Toutes les pages ont été régénérées !")
 
-print("\n✅ Toutes les pages ont été régénérées !")
\ No newline at end of file
+if __name__ == '__main__':
+    # --minify : HTML/CSS/JS minifiés (comme WIKI_MINIFY=1)
+    if '--minify' in sys.argv[1:]:
+        minify.enable()
+    with instrumentation.maybe_profiling(instrumentation.get_profile_option(sys.argv[1:])):
+        main()
@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+"""
+revisions.py - Historique des révisions des layouts
+N'a AUCUNE dépendance avec Flask/app.py
+
+Chaque page possède un dossier `revisions/` contenant :
+- index.jsonl : journal des révisions (une ligne JSON par révision)
+- rNNNNNNNN.json.gz : contenu compressé (snapshot complet ou delta)
+
+Les deltas sont calculés au niveau composant (clé = id du composant).
+Un snapshot complet est écrit toutes les SNAPSHOT_INTERVAL révisions
+pour borner la longueur des chaînes à rejouer lors d'une restauration.
+"""
+
+import gzip
+import hashlib
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+
+import json_codec
+
+REVISIONS_DIRNAME = 'revisions'
+INDEX_FILENAME = 'index.jsonl'
+
+# Un snapshot complet toutes les N révisions (borne la chaîne de deltas)
+SNAPSHOT_INTERVAL = 20
+
+# Paliers de rétention : (âge maximum en secondes, granularité en secondes)
+# - granularité 0 : toutes les révisions sont conservées
+# - âge None : palier sans limite d'âge
+RETENTION_TIERS = [
+    (3600, 0),              # Toutes les sauvegardes de la dernière heure
+    (86400, 3600),          # Une par heure pendant 24h
+    (None, 86400),          # Une par jour au-delà
+]
+
+
+# --- Helpers ---
+
+def get_revisions_dir(page_dir):
+    """Retourne le dossier des révisions d'une page"""
+    return Path(page_dir) / REVISIONS_DIRNAME
+
+def layout_hash(layout):
+    """Empreinte stable d'un layout (indépendante de l'indentation)"""
+    return hashlib.sha1(json_codec.dumpb(layout, sort_keys=True)).hexdigest()
+
+def _blob_name(rev, base=None):
+    if base is None:
+        return f'r{rev:08d}.json.gz'
+    return f'r{rev:08d}-{base:08d}.json.gz'
+
+def _write_blob(revisions_dir, filename, payload):
+    data = json_codec.dumpb(payload)
+    compressed = gzip.compress(data, compresslevel=6)
+    with open(revisions_dir / filename, 'wb') as f:
+        f.write(compressed)
+    return len(compressed)
+
+def _read_blob(revisions_dir, entry):
+    with open(revisions_dir / entry['file'], 'rb') as f:
+        return json_codec.loads(gzip.decompress(f.read()))
+
+def _component_ids(layout):
+    """Liste des ids, ou None si un delta par composant est impossible"""
+    ids = [comp.get('id') if isinstance(comp, dict) else None for comp in layout]
+    if None in ids or len(set(ids)) != len(ids):
+        return None
+    return ids
+
+
+# --- Deltas ---
+
+def compute_delta(old_layout, new_layout):
+    """
+    Calcule un delta par composant entre deux layouts
+    Retourne None si les layouts ne sont pas indexables par id
+    """
+    old_ids = _component_ids(old_layout)
+    new_ids = _component_ids(new_layout)
+    if old_ids is None or new_ids is None:
+        return None
+
+    old_by_id = dict(zip(old_ids, old_layout))
+    new_id_set = set(new_ids)
+
+    changed = {
+        comp['id']: comp
+        for comp in new_layout
+        if old_by_id.get(comp['id']) != comp
+    }
+    removed = [comp_id for comp_id in old_ids if comp_id not in new_id_set]
+
+    delta = {'set': changed, 'del': removed}
+
+    # L'ordre n'est stocké que s'il diffère de l'ordre "naturel" du patch
+    natural_order = [comp_id for comp_id in old_ids if comp_id in new_id_set]
+    natural_order += [comp_id for comp_id in new_ids if comp_id not in old_by_id]
+    if natural_order != new_ids:
+        delta['order'] = new_ids
+
+    return delta
+
+def apply_delta(layout, delta):
+    """Applique un delta calculé par compute_delta()"""
+    by_id = {comp['id']: comp for comp in layout}
+    order = [comp['id'] for comp in layout]
+
+    for comp_id in delta.get('del', []):
+        by_id.pop(comp_id, None)
+
+    for comp_id, comp in delta.get('set', {}).items():
+        if comp_id not in by_id:
+            order.append(comp_id)
+        by_id[comp_id] = comp
+
+    if 'order' in delta:
+        order = delta['order']
+
+    return [by_id[comp_id] for comp_id in order if comp_id in by_id]
+
+
+# --- Index ---
+
+def list_revisions(page_dir):
+    """Retourne les entrées de l'index, de la plus ancienne à la plus récente"""
+    index_file = get_revisions_dir(page_dir) / INDEX_FILENAME
+    if not index_file.exists():
+        return []
+
+    entries = []
+    with open(index_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entries.append(json_codec.loads(line))
+            except ValueError:
+                print(f"⚠️ Ligne d'index de révision ignorée: {index_file}")
+    return entries
+
+# Taille des blocs lus depuis la fin de l'index (head_revision)
+TAIL_CHUNK_SIZE = 4096
+
+def _last_line(f):
+    """Dernière ligne non vide d'un fichier binaire, lue depuis la fin"""
+    end = f.seek(0, os.SEEK_END)
+    position = end
+    data = b''
+    while position > 0:
+        size = min(TAIL_CHUNK_SIZE, position)
+        position -= size
+        f.seek(position)
+        data = f.read(size) + data
+        stripped = data.rstrip()
+        if b'\n' in stripped:
+            return stripped.rsplit(b'\n', 1)[1]
+    return data.strip()
+
+def head_revision(page_dir):
+    """
+    Retourne l'entrée de la dernière révision (ou None)
+    Seule la dernière ligne de l'index est lue : coût indépendant de la
+    longueur de l'historique (chemin des ETag de chaque lecture)
+    """
+    index_file = get_revisions_dir(page_dir) / INDEX_FILENAME
+    try:
+        with open(index_file, 'rb') as f:
+            line = _last_line(f)
+    except FileNotFoundError:
+        return None
+    if not line:
+        return None
+    try:
+        return json_codec.loads(line)
+    except ValueError:
+        # Dernière ligne illisible : même résultat que list_revisions (ligne ignorée)
+        entries = list_revisions(page_dir)
+        return entries[-1] if entries else None
+
+def _append_index(revisions_dir, entry):
+    with open(revisions_dir / INDEX_FILENAME, 'a', encoding='utf-8') as f:
+        f.write(json_codec.dumps(entry) + '\n')
+
+def _rewrite_index(revisions_dir, entries):
+    index_file = revisions_dir / INDEX_FILENAME
+    tmp_file = index_file.with_suffix('.jsonl.tmp')
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        for entry in entries:
+            f.write(json_codec.dumps(entry) + '\n')
+    os.replace(tmp_file, index_file)
+
+
+# --- Lecture / restauration ---
+
+def _materialize(revisions_dir, entries_by_rev, rev):
+    """Reconstruit un layout en remontant jusqu'au dernier snapshot"""
+    chain = []
+    entry = entries_by_rev[rev]
+    while entry['kind'] != 'snapshot':
+        chain.append(entry)
+        entry = entries_by_rev[entry['base']]
+
+    layout = _read_blob(revisions_dir, entry)
+    for delta_entry in reversed(chain):
+        layout = apply_delta(layout, _read_blob(revisions_dir, delta_entry))
+    return layout
+
+def load_revision(page_dir, rev=None):
+    """
+    Restaure le layout d'une révision (la dernière si rev est None)
+    Lève KeyError si la révision n'existe pas
+    """
+    entries = list_revisions(page_dir)
+    if not entries:
+        raise KeyError(rev)
+
+    entries_by_rev = {entry['rev']: entry for entry in entries}
+    if rev is None:
+        rev = entries[-1]['rev']
+    if rev not in entries_by_rev:
+        raise KeyError(rev)
+
+    return _materialize(get_revisions_dir(page_dir), entries_by_rev, rev)
+
+
+# --- Écriture ---
+
+def _import_legacy_backups(page_dir, revisions_dir):
+    """Importe les anciennes sauvegardes backups/layout_*.json dans l'historique"""
+    backup_dir = Path(page_dir) / 'backups'
+    if not backup_dir.exists():
+        return
+
+    imported = 0
+    for backup_file in sorted(backup_dir.glob('layout_*.json')):
+        try:
+            layout = json_codec.load_file(backup_file)
+            stamp = backup_file.stem[len('layout_'):]
+            ts = datetime.strptime(stamp, '%Y%m%d_%H%M%S').timestamp()
+        except Exception as e:
+            print(f"⚠️ Sauvegarde ignorée {backup_file.name}: {e}")
+            continue
+        _append_revision(page_dir, revisions_dir, layout, ts)
+        imported += 1
+
+    if imported:
+        print(f"📦 {imported} ancienne(s) sauvegarde(s) importée(s) dans l'historique")
+
+def _append_revision(page_dir, revisions_dir, layout, ts, entries=None):
+    if entries is None:
+        entries = list_revisions(page_dir)
+    head = entries[-1] if entries else None
+    digest = layout_hash(layout)
+
+    if head and head['sha'] == digest:
+        return head, entries
+
+    rev = head['rev'] + 1 if head else 1
+
+    # Snapshot si pas de base, si la chaîne est trop longue ou si le delta est impossible
+    payload = None
+    if head:
+        chain_length = head.get('depth', 0) + 1
+        if chain_length < SNAPSHOT_INTERVAL:
+            entries_by_rev = {entry['rev']: entry for entry in entries}
+            previous = _materialize(revisions_dir, entries_by_rev, head['rev'])
+            payload = compute_delta(previous, layout)
+
+    if payload is None:
+        kind, base, depth = 'snapshot', None, 0
+        payload = layout
+    else:
+        kind, base, depth = 'delta', head['rev'], head.get('depth', 0) + 1
+
+    filename = _blob_name(rev, base)
+    size = _write_blob(revisions_dir, filename, payload)
+    entry = {
+        'rev': rev,
+        'ts': ts,
+        'kind': kind,
+        'base': base,
+        'depth': depth,
+        'file': filename,
+        'sha': digest,
+        'count': len(layout),
+        'size': size
+    }
+    _append_index(revisions_dir, entry)
+    entries.append(entry)
+    return entry, entries
+
+def record_revision(page_dir, layout, ts=None):
+    """
+    Enregistre un layout comme nouvelle révision
+    - Ne fait rien si le layout est identique à la dernière révision
+    - Déclenche un élagage à chaque nouveau snapshot
+    Retourne l'entrée d'index de la révision courante
+    """
+    revisions_dir = get_revisions_dir(page_dir)
+    if not revisions_dir.exists():
+        revisions_dir.mkdir(parents=True, exist_ok=True)
+        _import_legacy_backups(page_dir, revisions_dir)
+
+    entry, entries = _append_revision(
+        page_dir, revisions_dir, layout, ts if ts is not None else time.time()
+    )
+
+    if entry['kind'] == 'snapshot' and len(entries) > 1:
+        prune_revisions(page_dir)
+
+    return entry
+
+
+# --- Rétention ---
+
+def select_retained(entries, now=None, tiers=None):
+    """Retourne l'ensemble des numéros de révision à conserver"""
+    now = now if now is not None else time.time()
+    tiers = tiers if tiers is not None else RETENTION_TIERS
+
+    keep = set()
+    seen_buckets = set()
+
+    # Parcours du plus récent au plus ancien : on garde la plus récente de chaque tranche
+    for entry in reversed(entries):
+        age = now - entry['ts']
+        for tier_index, (max_age, granularity) in enumerate(tiers):
+            if max_age is not None and age > max_age:
+                continue
+            if not granularity:
+                keep.add(entry['rev'])
+            else:
+                bucket = (tier_index, int(entry['ts'] // granularity))
+                if bucket not in seen_buckets:
+                    seen_buckets.add(bucket)
+                    keep.add(entry['rev'])
+            break
+
+    if entries:
+        keep.add(entries[-1]['rev'])
+    return keep
+
+def prune_revisions(page_dir, now=None, tiers=None):
+    """
+    Applique les paliers de rétention
+    Les révisions conservées sont ré-encodées (snapshot + deltas) sans
+    changer leur numéro. Retourne le nombre de révisions supprimées.
+    """
+    revisions_dir = get_revisions_dir(page_dir)
+    entries = list_revisions(page_dir)
+    keep = select_retained(entries, now, tiers)
+
+    if len(keep) == len(entries):
+        return 0
+
+    entries_by_rev = {entry['rev']: entry for entry in entries}
+    new_entries = []
+    previous_layout = None
+    previous_entry = None
+
+    for entry in entries:
+        if entry['rev'] not in keep:
+            continue
+
+        layout = _materialize(revisions_dir, entries_by_rev, entry['rev'])
+        payload = None
+        if previous_entry and previous_entry['depth'] + 1 < SNAPSHOT_INTERVAL:
+            payload = compute_delta(previous_layout, layout)
+
+        new_entry = dict(entry)
+        if payload is None:
+            new_entry.update(kind='snapshot', base=None, depth=0)
+            payload = layout
+        else:
+            new_entry.update(kind='delta', base=previous_entry['rev'], depth=previous_entry['depth'] + 1)
+
+        # Le blob n'est réécrit que si son encodage change (nouveau fichier,
+        # l'ancien reste valide tant que l'index n'a pas été remplacé)
+        if (new_entry['kind'], new_entry['base']) != (entry['kind'], entry['base']):
+            new_entry['file'] = _blob_name(entry['rev'], new_entry['base'])
+            new_entry['size'] = _write_blob(revisions_dir, new_entry['file'], payload)
+
+        new_entries.append(new_entry)
+        previous_layout = layout
+        previous_entry = new_entry
+
+    _rewrite_index(revisions_dir, new_entries)
+
+    # Suppression des fichiers qui ne sont plus référencés
+    referenced = {entry['file'] for entry in new_entries}
+    for entry in entries:
+        if entry['file'] not in referenced:
+            (revisions_dir / entry['file']).unlink(missing_ok=True)
+
+    return len(entries) - len(new_entries)
+
+
+# --- Comparaison ---
+
+GEOMETRY_KEYS = ('x', 'y', 'w', 'h', 'z')
+
+def diff_layouts(old_layout, new_layout):
+    """
+    Compare deux layouts composant par composant
+    - added / removed : composants apparus ou supprimés
+    - moved : composants dont seule la géométrie (x, y, w, h, z) a changé
+    - modified : composants dont le contenu a changé
+    """
+    old_by_id = {comp.get('id'): comp for comp in old_layout}
+    new_by_id = {comp.get('id'): comp for comp in new_layout}
+
+    result = {'added': [], 'removed': [], 'moved': [], 'modified': []}
+
+    for comp_id, comp in new_by_id.items():
+        if comp_id not in old_by_id:
+            result['added'].append(comp)
+
+    for comp_id, old_comp in old_by_id.items():
+        new_comp = new_by_id.get(comp_id)
+        if new_comp is None:
+            result['removed'].append(old_comp)
+            continue
+        if new_comp == old_comp:
+            continue
+
+        old_rest = {k: v for k, v in old_comp.items() if k not in GEOMETRY_KEYS}
+        new_rest = {k: v for k, v in new_comp.items() if k not in GEOMETRY_KEYS}
+        if old_rest == new_rest:
+            result['moved'].append({
+                'id': comp_id,
+                'from': {k: old_comp.get(k) for k in GEOMETRY_KEYS},
+                'to': {k: new_comp.get(k) for k in GEOMETRY_KEYS}
+            })
+        else:
+            result['modified'].append(comp_id)
+
+    return result
@@ -72,15 +72,21 @@ export class API {
      * Sauvegarder le layout d'une page
      * @param {string} slug - Slug de la page
      * @param {Array} layout - Layout (liste des composants)
+     * @param {number} version - Version de départ (If-Match, optionnel)
      * @returns {Promise<Object>}
      */
-    static async savePage(slug, layout) {
+    static async savePage(slug, layout, version = null) {
         try {
+            const headers = {
+                'Content-Type': 'application/json'
+            };
+            if (version !== null) {
+                headers['If-Match'] = `"r${version}"`;
+            }
+
             const response = await fetch(`/api/pages/${slug}`, {
                 method: 'PUT',
-                headers: {
-                    'Content-Type': 'application/json'
-                },
+                headers,
                 body: JSON.stringify({ layout })
             });
 
@@ -96,6 +102,85 @@ export class API {
         }
     }
 
+    /**
+     * Calculer les opérations par composant entre deux layouts
+     * @param {Array} previous - Layout de référence (dernière sauvegarde)
+     * @param {Array} current - Layout actuel
+     * @returns {Array} Opérations (upsert, update, delete, reorder)
+     */
+    static diffLayout(previous, current) {
+        const geometryKeys = ['x', 'y', 'w', 'h'];
+        const previousById = new Map(previous.map(c => [c.id, c]));
+        const currentIds = new Set(current.map(c => c.id));
+        const ops = [];
+        const zChanges = {};
+
+        current.forEach(comp => {
+            const old = previousById.get(comp.id);
+            if (!old) {
+                ops.push({ op: 'upsert', component: comp });
+                return;
+            }
+
+            const keys = new Set([...Object.keys(old), ...Object.keys(comp)]);
+            const changed = [...keys].filter(k => JSON.stringify(old[k]) !== JSON.stringify(comp[k]));
+            if (changed.length === 0) return;
+
+            if (changed.every(k => k === 'z')) {
+                zChanges[comp.id] = comp.z;
+            } else if (changed.every(k => geometryKeys.includes(k) || k === 'z')) {
+                const changes = {};
+                changed.forEach(k => { changes[k] = comp[k]; });
+                ops.push({ op: 'update', id: comp.id, changes });
+            } else {
+                ops.push({ op: 'upsert', component: comp });
+            }
+        });
+
+        previous.forEach(comp => {
+            if (!currentIds.has(comp.id)) {
+                ops.push({ op: 'delete', id: comp.id });
+            }
+        });
+
+        if (Object.keys(zChanges).length > 0) {
+            ops.push({ op: 'reorder', z: zChanges });
+        }
+
+        return ops;
+    }
+
+    /**
+     * Sauvegarde incrémentale du layout (opérations par composant)
+     * @param {string} slug - Slug de la page
+     * @param {number} version - Version attendue côté serveur
+     * @param {Array} ops - Opérations (voir diffLayout)
+     * @param {string} client - Id de collaboration de l'éditeur (optionnel)
+     * @returns {Promise<Object>} { version, touched, merged }
+     */
+    static async patchLayout(slug, version, ops, client = null) {
+        const response = await fetch(`/api/pages/${slug}/layout`, {
+            method: 'PATCH',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({ version, ops, client })
+        });
+
+        const data = await response.json().catch(() => ({}));
+
+        if (!response.ok) {
+            const error = new Error(data.error || `HTTP ${response.status}`);
+            error.status = response.status;
+            error.version = data.version;
+            error.conflicts = data.conflicts || [];
+            console.error('Erreur lors de la sauvegarde incrémentale:', error);
+            throw error;
+        }
+
+        return data;
+    }
+
     /**
      * Créer une nouvelle page
      * @param {string} title - Titre de la page
@@ -155,6 +240,39 @@ export class API {
         }
     }
 
+    /**
+     * Opérations groupées sur les pages (une seule régénération côté serveur)
+     * @param {Array<Object>} ops - {op: 'create'|'update-tags'|'set-visibility'|'delete', ...}
+     * @returns {Promise<Object>} {success, results, pages}
+     */
+    static async batchPages(ops) {
+        try {
+            const response = await fetch('/api/pages/batch', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json'
+                },
+                body: JSON.stringify({ ops })
+            });
+
+            const data = await response.json();
+
+            if (!response.ok) {
+                const error = new Error(data.error || `HTTP ${response.status}`);
+                error.index = data.index;
+                throw error;
+            }
+
+            // Rafraîchir le cache
+            await this.refreshPages();
+
+            return data;
+        } catch (error) {
+            console.error('Erreur lors des opérations groupées:', error);
+            throw error;
+        }
+    }
+
     /**
      * Copier le layout d'une page vers une autre
      * @param {string} targetSlug - Slug de la page destination
@@ -182,6 +300,47 @@ export class API {
         }
     }
 
+    /**
+     * Lister l'historique des révisions d'une page
+     * @param {string} slug - Slug de la page
+     * @returns {Promise<Object>} { head, revisions: [...] }
+     */
+    static async getRevisions(slug) {
+        return await this.get(`/api/pages/${slug}/revisions`);
+    }
+
+    /**
+     * Récupérer le layout d'une révision
+     * @param {string} slug - Slug de la page
+     * @param {number} rev - Numéro de révision
+     * @returns {Promise<Object>}
+     */
+    static async getRevision(slug, rev) {
+        return await this.get(`/api/pages/${slug}/revisions/${rev}`);
+    }
+
+    /**
+     * Comparer une révision à une autre (par défaut la précédente)
+     * @param {string} slug - Slug de la page
+     * @param {number} rev - Numéro de révision
+     * @param {number} against - Révision de référence (optionnel)
+     * @returns {Promise<Object>} { added, removed, moved, modified }
+     */
+    static async diffRevision(slug, rev, against = null) {
+        const query = against !== null ? `?against=${against}` : '';
+        return await this.get(`/api/pages/${slug}/revisions/${rev}/diff${query}`);
+    }
+
+    /**
+     * Restaurer une révision
+     * @param {string} slug - Slug de la page
+     * @param {number} rev - Numéro de révision
+     * @returns {Promise<Object>}
+     */
+    static async restoreRevision(slug, rev) {
+        return await this.post(`/api/pages/${slug}/revisions/${rev}/restore`, {});
+    }
+
     /**
      * Changer la visibilité d'une page
      * @param {string} slug - Slug de la page
@@ -0,0 +1,245 @@
+// core/collab.js - Édition collaborative en temps réel
+
+/**
+ * Diffuse les modifications locales aux autres éditeurs de la page
+ * et applique les leurs (flux SSE + lots d'opérations par composant).
+ * L'unité de conflit est le composant : une opération distante sur le
+ * composant en cours d'édition locale est ignorée.
+ */
+export class Collaboration {
+    constructor(state, options) {
+        this.state = state;
+        this.slug = options.slug;
+        this.canvas = options.canvas;
+        this.onRemoteChange = options.onRemoteChange || (() => {});
+        this.onPresenceChange = options.onPresenceChange || (() => {});
+        this.onResync = options.onResync || (() => {});
+
+        this.clientId = `client-${Date.now().toString(36)}-${Math.random().toString(36).substr(2, 6)}`;
+        this.eventSource = null;
+        this.connected = false;
+        this.clients = new Set();
+
+        // Opérations en attente, envoyées une fois par frame
+        this.pendingOps = [];
+        this.frameRequested = false;
+
+        // Vrai pendant l'application d'opérations distantes (pas de rediffusion)
+        this.applyingRemote = false;
+
+        this.bindStateEvents();
+    }
+
+    /**
+     * Ouvrir le flux d'événements de la page
+     */
+    connect() {
+        if (typeof EventSource === 'undefined') {
+            console.warn('⚠️ EventSource non supporté, collaboration désactivée');
+            return;
+        }
+
+        this.eventSource = new EventSource(`/api/pages/${this.slug}/events?client=${this.clientId}`);
+
+        this.eventSource.addEventListener('hello', (e) => {
+            const data = JSON.parse(e.data);
+            this.connected = true;
+            this.clients = new Set(data.clients.filter(id => id !== this.clientId));
+            this.onPresenceChange(this.clients.size);
+        });
+
+        this.eventSource.addEventListener('join', (e) => {
+            this.clients.add(JSON.parse(e.data).client);
+            this.onPresenceChange(this.clients.size);
+        });
+
+        this.eventSource.addEventListener('leave', (e) => {
+            this.clients.delete(JSON.parse(e.data).client);
+            this.onPresenceChange(this.clients.size);
+        });
+
+        this.eventSource.addEventListener('ops', (e) => {
+            this.applyRemoteOps(JSON.parse(e.data).ops);
+        });
+
+        this.eventSource.addEventListener('saved', (e) => {
+            const data = JSON.parse(e.data);
+            console.log(`💾 Page sauvegardée par un autre éditeur (version ${data.version})`);
+        });
+
+        // Messages perdus (client trop lent) : recharger le layout puis se reconnecter
+        this.eventSource.addEventListener('resync', async () => {
+            console.warn('⚠️ Opérations d\'autres éditeurs manquées, rechargement du layout');
+            this.disconnect();
+            try {
+                await this.onResync();
+            } finally {
+                this.connect();
+            }
+        });
+
+        this.eventSource.onerror = () => {
+            // EventSource se reconnecte automatiquement
+            this.connected = false;
+        };
+    }
+
+    disconnect() {
+        if (this.eventSource) {
+            this.eventSource.close();
+            this.eventSource = null;
+        }
+        this.connected = false;
+    }
+
+    /**
+     * Capturer les modifications locales depuis les événements du state
+     */
+    bindStateEvents() {
+        this.state.on('componentAdded', (component) => {
+            this.queue({ op: 'upsert', component: { ...component } });
+        });
+
+        this.state.on('componentUpdated', ({ id, updates }) => {
+            const changes = { ...updates };
+            delete changes.id;
+            this.queue({ op: 'update', id, changes });
+        });
+
+        this.state.on('componentRemoved', (id) => {
+            this.queue({ op: 'delete', id });
+        });
+
+        this.state.on('zIndexChanged', ({ id, z }) => {
+            this.queue({ op: 'reorder', z: { [id]: z } });
+        });
+    }
+
+    /**
+     * Mettre une opération en attente (envoi groupé à la prochaine frame)
+     */
+    queue(op) {
+        if (this.applyingRemote || !this.connected || this.clients.size === 0) return;
+
+        this.pendingOps.push(op);
+
+        if (!this.frameRequested) {
+            this.frameRequested = true;
+            requestAnimationFrame(() => this.flush());
+        }
+    }
+
+    /**
+     * Envoyer le lot d'opérations de la frame
+     */
+    async flush() {
+        this.frameRequested = false;
+        const ops = Collaboration.compact(this.pendingOps);
+        this.pendingOps = [];
+
+        if (ops.length === 0) return;
+
+        try {
+            await fetch(`/api/pages/${this.slug}/ops`, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json'
+                },
+                body: JSON.stringify({ client: this.clientId, ops })
+            });
+        } catch (error) {
+            console.error('Erreur diffusion des opérations:', error);
+        }
+    }
+
+    /**
+     * Fusionner les mises à jour successives d'un même composant
+     */
+    static compact(ops) {
+        const result = [];
+        const lastUpdate = new Map();
+
+        ops.forEach(op => {
+            if (op.op === 'update' && lastUpdate.has(op.id)) {
+                Object.assign(result[lastUpdate.get(op.id)].changes, op.changes);
+                return;
+            }
+
+            if (op.op === 'update') {
+                lastUpdate.set(op.id, result.length);
+                result.push({ ...op, changes: { ...op.changes } });
+                return;
+            }
+
+            // Toute autre opération coupe la fusion pour les composants concernés
+            const ids = op.op === 'reorder' ? Object.keys(op.z) : [op.id || op.component.id];
+            ids.forEach(id => lastUpdate.delete(id));
+            result.push(op);
+        });
+
+        return result;
+    }
+
+    /**
+     * Id du composant en cours d'édition locale (prioritaire sur les opérations distantes)
+     */
+    getLocallyEditedId() {
+        if (this.state.isEditorLocked()) {
+            return this.state.lockedComponentId;
+        }
+        return this.state.getSelectedComponent();
+    }
+
+    /**
+     * Appliquer les opérations d'un autre éditeur
+     */
+    applyRemoteOps(ops) {
+        const editedId = this.getLocallyEditedId();
+        this.applyingRemote = true;
+
+        try {
+            ops.forEach(op => {
+                switch (op.op) {
+                    case 'upsert': {
+                        if (op.component.id === editedId) return;
+                        const exists = !!this.state.getComponent(op.component.id);
+                        this.state.upsertComponent(op.component);
+                        if (exists) this.canvas.removeComponent(op.component.id);
+                        this.canvas.renderComponent(op.component);
+                        break;
+                    }
+                    case 'update': {
+                        if (op.id === editedId || !this.state.getComponent(op.id)) return;
+                        this.state.updateComponent(op.id, op.changes);
+                        const geometryOnly = Object.keys(op.changes).every(k => ['x', 'y', 'w', 'h', 'z'].includes(k));
+                        if (geometryOnly) {
+                            this.canvas.updateComponent(op.id);
+                        } else {
+                            this.canvas.removeComponent(op.id);
+                            this.canvas.renderComponent(this.state.getComponent(op.id));
+                        }
+                        break;
+                    }
+                    case 'delete': {
+                        if (op.id === editedId) return;
+                        this.state.removeComponent(op.id);
+                        this.canvas.removeComponent(op.id);
+                        break;
+                    }
+                    case 'reorder': {
+                        Object.entries(op.z).forEach(([id, z]) => {
+                            if (id === editedId || !this.state.getComponent(id)) return;
+                            this.state.updateComponent(id, { z });
+                            this.canvas.updateZIndex(id);
+                        });
+                        break;
+                    }
+                }
+            });
+        } finally {
+            this.applyingRemote = false;
+        }
+
+        this.onRemoteChange(ops);
+    }
+}
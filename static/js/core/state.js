@@ -282,6 +282,24 @@ export class State {
         }
     }
 
+    /**
+     * Ajoute ou remplace un composant reçu tel quel (ex: d'un autre éditeur)
+     */
+    upsertComponent(component) {
+        const index = this.components.findIndex(c => c.id === component.id);
+
+        if (index !== -1) {
+            this.components[index] = component;
+            this.emit('componentUpdated', { id: component.id, updates: component });
+            return;
+        }
+
+        this.components.push(component);
+        this.usedIds.add(component.id);
+        this.componentCounter = Math.max(this.componentCounter, this.calculateMaxCounter());
+        this.emit('componentAdded', component);
+    }
+
     changeZIndex(id, delta) {
         const component = this.getComponent(id);
         if (component) {
@@ -2,6 +2,7 @@
 
 import { State } from './core/state.js';
 import { Canvas } from './core/canvas.js';
+import { Collaboration } from './core/collab.js';
 import { Toolbar } from './ui/toolbar.js';
 import { PropertiesPanel } from './ui/properties-panel.js';
 import { ComponentsList } from './ui/components-list.js';
@@ -18,11 +19,16 @@ const state = new State({
     isEditingText: false
 });
 
+// Dernière version sauvegardée (base des sauvegardes incrémentales)
+let savedLayout = JSON.parse(JSON.stringify(INITIAL_LAYOUT || []));
+let layoutVersion = window.INITIAL_VERSION || 0;
+
 // Instances des modules principaux
 let canvas;
 let toolbar;
 let propertiesPanel;
 let componentsList;
+let collaboration;
 
 // Initialisation
 async function init() {
@@ -65,6 +71,18 @@ async function init() {
             onMove: handleComponentMove
         });
 
+        // Collaboration temps réel avec les autres éditeurs de la page
+        collaboration = new Collaboration(state, {
+            slug: SLUG,
+            canvas,
+            onRemoteChange: () => componentsList.update(),
+            onResync: handleResync,
+            onPresenceChange: (count) => {
+                if (count > 0) console.log(`👥 ${count} autre(s) éditeur(s) sur cette page`);
+            }
+        });
+        collaboration.connect();
+
         // Charger les pages disponibles
         await API.loadPages();
 
@@ -148,14 +166,47 @@ async function handleSave() {
             contentLength: c.content ? c.content.length : 0
         })));
         
-        await API.savePage(SLUG, components);
+        // Envoyer uniquement les composants modifiés
+        const ops = API.diffLayout(savedLayout, components);
+        if (ops.length > 0) {
+            const result = await API.patchLayout(SLUG, layoutVersion, ops, collaboration?.clientId);
+            layoutVersion = result.version;
+            savedLayout = JSON.parse(JSON.stringify(components));
+            if (result.merged) {
+                console.log('🔀 Modifications fusionnées avec celles d\'un autre éditeur');
+            }
+        }
         alert('✅ Sauvegardé avec succès !');
     } catch (error) {
         console.error('Erreur lors de la sauvegarde:', error);
-        alert('❌ Erreur lors de la sauvegarde');
+        if (error.status === 409) {
+            const details = error.conflicts.length > 0 ? `\nComposants en conflit : ${error.conflicts.join(', ')}` : '';
+            alert(`⚠️ La page a été modifiée ailleurs. Rechargez l'éditeur avant de sauvegarder.${details}`);
+        } else {
+            alert('❌ Erreur lors de la sauvegarde');
+        }
     }
 }
 
+async function handleResync() {
+    // Modifications locales non sauvegardées : l'utilisateur choisit
+    const unsaved = API.diffLayout(savedLayout, state.getComponents()).length > 0;
+    if (unsaved && !confirm('Des modifications d\'autres éditeurs ont été manquées. Recharger la page depuis le serveur ?\n(Vos modifications non sauvegardées seront perdues)')) {
+        return;
+    }
+
+    const page = await API.getPage(SLUG);
+    state.importState({ ...state.exportState(), components: page.layout });
+    savedLayout = JSON.parse(JSON.stringify(page.layout));
+    layoutVersion = page.version;
+
+    state.setSelectedComponent(null);
+    propertiesPanel.hide();
+    canvas.renderAll();
+    componentsList.update();
+    console.log(`🔄 Layout rechargé (version ${layoutVersion})`);
+}
+
 function handleCopyPage() {
     toolbar.showCopyModal();
 }
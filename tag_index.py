@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+tag_index.py - Index des tags : tag -> ensemble des pages (bitmap)
+N'a AUCUNE dépendance avec Flask/app.py
+
+Les pages sont numérotées dans l'ordre des slugs ; chaque tag correspond à
+un bitmap (bit i = page i). Une requête ET/OU/SAUF et le comptage des tags
+de la sélection (facettes) sont des opérations sur ces bitmaps : le coût
+dépend du nombre de tags, pas d'une relecture de chaque page.
+
+app.py garde l'index de tout l'inventaire (IndexLoader, /api/tags et
+/api/tags/query), generate_wiki_pages.py publie celui des pages visibles
+dans wiki/tags.json et l'intègre à la page d'accueil pour filterPages().
+
+Format (JSON compact) :
+    {"v": 1,
+     "pages": [[slug, titre], ...],
+     "tags": {"pays": [0, 3, 1], ...}}   # ids de pages triés, codés en écarts
+"""
+
+import os
+import threading
+from pathlib import Path
+
+import json_codec
+
+INDEX_FORMAT_VERSION = 1
+INDEX_FILENAME = 'tags.json'
+
+
+def popcount(bits):
+    return bin(bits).count('1')
+
+
+class TagIndex:
+    """Bitmaps des tags, construit depuis l'inventaire ou le JSON"""
+
+    def __init__(self, pages, bitmaps):
+        self.pages = pages        # [(slug, titre)] triés par slug
+        self.bitmaps = bitmaps    # {tag: int}
+        self.ids = {slug: page_id for page_id, (slug, _) in enumerate(pages)}
+        self.all = (1 << len(pages)) - 1
+
+    @classmethod
+    def from_pages(cls, pages):
+        """pages : entrées d'inventaire (slug, title, tags)"""
+        entries = []
+        bitmaps = {}
+        for page_id, page in enumerate(sorted(pages, key=lambda p: p['slug'])):
+            entries.append((page['slug'], page.get('title', page['slug'])))
+            for tag in page.get('tags', []):
+                bitmaps[tag] = bitmaps.get(tag, 0) | (1 << page_id)
+        return cls(entries, bitmaps)
+
+    @classmethod
+    def from_json(cls, data):
+        if data.get('v') != INDEX_FORMAT_VERSION:
+            raise ValueError(f"Format d'index inconnu: {data.get('v')}")
+        bitmaps = {}
+        for tag, deltas in data['tags'].items():
+            bits = 0
+            page_id = 0
+            for delta in deltas:
+                page_id += delta
+                bits |= 1 << page_id
+            bitmaps[tag] = bits
+        return cls([tuple(p) for p in data['pages']], bitmaps)
+
+    def to_json(self):
+        """JSON compact et reproductible (clés triées, ids codés en écarts)"""
+        tags = {}
+        for tag, bits in self.bitmaps.items():
+            previous = 0
+            deltas = []
+            for page_id in self.page_ids(bits):
+                deltas.append(page_id - previous)
+                previous = page_id
+            tags[tag] = deltas
+        data = {
+            'v': INDEX_FORMAT_VERSION,
+            'pages': [list(p) for p in self.pages],
+            'tags': tags
+        }
+        return json_codec.dumps(data, sort_keys=True)
+
+    def page_ids(self, bits):
+        """Ids des pages d'un bitmap, dans l'ordre croissant"""
+        digits = bin(bits)[:1:-1]    # bit de poids faible en premier
+        ids = []
+        page_id = digits.find('1')
+        while page_id != -1:
+            ids.append(page_id)
+            page_id = digits.find('1', page_id + 1)
+        return ids
+
+    def select(self, all_of=(), any_of=(), none_of=()):
+        """
+        Bitmap des pages qui ont tous les tags all_of, au moins un des tags
+        any_of (si non vide) et aucun des tags none_of
+        """
+        bits = self.all
+        for tag in all_of:
+            bits &= self.bitmaps.get(tag, 0)
+        if any_of:
+            union = 0
+            for tag in any_of:
+                union |= self.bitmaps.get(tag, 0)
+            bits &= union
+        for tag in none_of:
+            bits &= ~self.bitmaps.get(tag, 0)
+        return bits
+
+    def slugs(self, bits):
+        return [self.pages[page_id][0] for page_id in self.page_ids(bits)]
+
+    def facets(self, bits=None):
+        """[(tag, nombre de pages de la sélection)] par nombre décroissant, sans les zéros"""
+        bits = self.all if bits is None else bits
+        counts = [(tag, popcount(tag_bits & bits)) for tag, tag_bits in self.bitmaps.items()]
+        return sorted((c for c in counts if c[1]), key=lambda c: (-c[1], c[0]))
+
+
+class IndexLoader:
+    """Index de l'inventaire, reconstruit seulement si le fichier a changé (os.stat)"""
+
+    def __init__(self, inventory_file):
+        self.inventory_file = Path(inventory_file)
+        self._key = None
+        self._index = TagIndex.from_pages([])
+        self._lock = threading.Lock()
+
+    def get(self):
+        """TagIndex courant (vide si l'inventaire est absent ou illisible)"""
+        try:
+            stat = os.stat(self.inventory_file)
+        except FileNotFoundError:
+            return TagIndex.from_pages([])
+        key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if key != self._key:
+                try:
+                    with open(self.inventory_file, 'rb') as f:
+                        content = f.read().strip()
+                    self._index = TagIndex.from_pages(json_codec.loads(content) if content else [])
+                except (OSError, ValueError, KeyError) as e:
+                    print(f"⚠️ Index des tags : {self.inventory_file.name} illisible: {e}")
+                    self._index = TagIndex.from_pages([])
+                self._key = key
+            return self._index
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+trigram_index.py - Index de trigrammes des pages pour le "Vouliez-vous dire" de la 404
+N'a AUCUNE dépendance avec Flask/app.py
+
+generate_wiki_pages.py écrit l'index dans wiki/did-you-mean.json ; le script
+de la page 404 le télécharge et classe les pages proches de l'URL demandée,
+app.py (page_not_found) utilise le même index côté serveur.
+
+Format (JSON compact) :
+    {"v": 1,
+     "pages": [[slug, titre, nb_trigrammes], ...],
+     "grams": {" un": [0, 3, 1], ...}}   # ids de pages triés, codés en écarts
+
+Score : coefficient de Dice entre les trigrammes de la requête et ceux de la
+page (slug + titre). Seules les listes des trigrammes de la requête sont
+parcourues : le coût ne dépend pas du nombre total de pages.
+"""
+
+import html
+import os
+import re
+import threading
+import unicodedata
+from pathlib import Path
+from urllib.parse import unquote
+
+import json_codec
+
+INDEX_FORMAT_VERSION = 1
+INDEX_FILENAME = 'did-you-mean.json'
+
+# Remplacé par les suggestions dans 404.html (côté serveur ou navigateur)
+DID_YOU_MEAN_MARKER = '<!-- did-you-mean -->'
+
+DEFAULT_LIMIT = 3
+MIN_SCORE = 0.25
+
+
+def normalize(text):
+    """Minuscules sans accents, mots alphanumériques séparés par un espace"""
+    text = unicodedata.normalize('NFD', text)
+    text = ''.join(c for c in text if not unicodedata.combining(c)).lower()
+    return ' '.join(re.findall(r'[a-z0-9]+', text))
+
+def trigrams(text):
+    """Trigrammes de chaque mot entouré d'espaces (' union ' -> ' un', 'uni'...)"""
+    grams = set()
+    for word in normalize(text).split():
+        padded = f' {word} '
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
+
+def path_query(path):
+    """Texte recherché pour une URL : /pages/union-federal/ -> 'union-federal'"""
+    segments = [s for s in unquote(path).split('/') if s and s != 'index.html']
+    if not segments:
+        return ''
+    last = segments[-1]
+    if last.endswith('.html'):
+        last = last[:-len('.html')]
+    return '' if last in ('pages', 'wiki') else last
+
+
+class TrigramIndex:
+    """Index trigramme -> ids de pages, construit depuis l'inventaire ou le JSON"""
+
+    def __init__(self, pages, grams):
+        self.pages = pages    # [(slug, titre, nb_trigrammes)]
+        self.grams = grams    # {trigramme: [id de page, ...]} (ids absolus)
+
+    @classmethod
+    def from_pages(cls, pages):
+        """pages : entrées d'inventaire (slug, title)"""
+        entries = []
+        grams = {}
+        for page_id, page in enumerate(sorted(pages, key=lambda p: p['slug'])):
+            page_grams = trigrams(page['slug']) | trigrams(page.get('title', ''))
+            entries.append((page['slug'], page.get('title', page['slug']), len(page_grams)))
+            for gram in page_grams:
+                grams.setdefault(gram, []).append(page_id)
+        return cls(entries, grams)
+
+    @classmethod
+    def from_json(cls, data):
+        if data.get('v') != INDEX_FORMAT_VERSION:
+            raise ValueError(f"Format d'index inconnu: {data.get('v')}")
+        grams = {}
+        for gram, deltas in data['grams'].items():
+            ids = []
+            page_id = 0
+            for delta in deltas:
+                page_id += delta
+                ids.append(page_id)
+            grams[gram] = ids
+        return cls([tuple(p) for p in data['pages']], grams)
+
+    def to_json(self):
+        """JSON compact et reproductible (clés triées, ids codés en écarts)"""
+        grams = {}
+        for gram, ids in self.grams.items():
+            previous = 0
+            deltas = []
+            for page_id in ids:
+                deltas.append(page_id - previous)
+                previous = page_id
+            grams[gram] = deltas
+        data = {
+            'v': INDEX_FORMAT_VERSION,
+            'pages': [list(p) for p in self.pages],
+            'grams': grams
+        }
+        return json_codec.dumps(data, sort_keys=True)
+
+    def search(self, query, limit=DEFAULT_LIMIT, min_score=MIN_SCORE):
+        """Pages les plus proches de query : [(slug, titre, score)] par score décroissant"""
+        query_grams = trigrams(query)
+        if not query_grams:
+            return []
+        common = {}
+        for gram in query_grams:
+            for page_id in self.grams.get(gram, ()):
+                common[page_id] = common.get(page_id, 0) + 1
+
+        results = []
+        for page_id, count in common.items():
+            slug, title, page_count = self.pages[page_id]
+            score = 2 * count / (len(query_grams) + page_count)
+            if score >= min_score:
+                results.append((slug, title, score))
+        results.sort(key=lambda r: (-r[2], r[0]))
+        return results[:limit]
+
+
+def render_matches_html(matches):
+    """Bloc "Vouliez-vous dire" (même balisage que le script de 404.html)"""
+    if not matches:
+        return ''
+    cards = ''.join(
+        f'<a href="/pages/{html.escape(slug)}/" class="suggestion-card">'
+        f'<h3>{html.escape(title)}</h3><p>{html.escape(slug)}</p></a>'
+        for slug, title, _ in matches
+    )
+    return (
+        '<div class="suggestions did-you-mean" id="did-you-mean">'
+        '<h2>Vouliez-vous dire…</h2>'
+        f'<div class="suggestions-grid">{cards}</div></div>'
+    )
+
+
+class IndexLoader:
+    """Index lu depuis le disque, relu seulement si le fichier a changé (os.stat)"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._key = None
+        self._index = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """TrigramIndex courant (None si le fichier est absent ou illisible)"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        key = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if key != self._key:
+                try:
+                    self._index = TrigramIndex.from_json(json_codec.load_file(self.path))
+                except (OSError, ValueError, KeyError) as e:
+                    print(f"⚠️ Index {self.path.name} illisible: {e}")
+                    self._index = None
+                self._key = key
+            return self._index
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+watch.py - Reconstruction incrémentale à la modification des sources
+
+Surveille le layout de chaque page, data/inventory.json et static/ puis ne
+reconstruit que les sorties concernées :
+- layout d'une page : cette page (toutes si les aperçus changent)
+- inventory.json : pages modifiées, accueil et 404
+- static/ : rien en local (les pages pointent vers static/), export sinon ;
+  toutes les pages si une feuille dont le CSS critique est en ligne change
+
+Utilise inotify (module inotify_simple) si disponible, sinon un polling.
+
+Usage:
+    python watch.py [--export DOSSIER] [--interval SECONDES]
+"""
+
+import argparse
+import contextlib
+import io
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import critical_css
+import json_codec
+from core import layouts, storage
+
+try:
+    from inotify_simple import INotify, flags as inotify_flags
+except ImportError:
+    INotify = None
+
+if sys.platform.startswith('win'):
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
+
+BASE_DIR = Path(__file__).parent
+PAGES_DIR = storage.PAGES_DIR
+DATA_DIR = BASE_DIR / 'data'
+STATIC_DIR = BASE_DIR / 'static'
+INVENTORY_FILE = DATA_DIR / 'inventory.json'
+
+# Feuilles dont une partie est en ligne dans chaque page
+CRITICAL_CSS_FILES = {BASE_DIR / source for source in critical_css.SOURCES}
+
+# Délai sans nouvel événement avant de reconstruire (secondes)
+DEBOUNCE_DELAY = 0.2
+
+# Intervalle du polling (secondes)
+POLL_INTERVAL = 0.5
+
+
+# --- Détection des changements ---
+
+def scan_sources():
+    """Retourne {chemin: (mtime_ns, taille)} des fichiers surveillés"""
+    files = {}
+    candidates = [INVENTORY_FILE, *(storage.get_layout_file(d.name) for d in storage.iter_page_dirs())]
+    if STATIC_DIR.exists():
+        candidates += [p for p in STATIC_DIR.rglob('*') if p.is_file()]
+    for path in candidates:
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        files[path] = (stat.st_mtime_ns, stat.st_size)
+    return files
+
+def is_page_tree_dir(path):
+    """Dossier de répartition (pages/3f/...) ou dossier de page à surveiller"""
+    if PAGES_DIR not in path.parents:
+        return False
+    levels, _ = storage.load_sharding()
+    return len(path.relative_to(PAGES_DIR).parts) <= levels + 1
+
+class PollingWatcher:
+    """Compare périodiquement les dates/tailles des fichiers surveillés"""
+
+    def __init__(self, interval=POLL_INTERVAL):
+        self.interval = interval
+        self.state = scan_sources()
+
+    def read(self, timeout):
+        time.sleep(min(timeout, self.interval))
+        current = scan_sources()
+        changed = {
+            path for path in current.keys() | self.state.keys()
+            if current.get(path) != self.state.get(path)
+        }
+        self.state = current
+        return changed
+
+class InotifyWatcher:
+    """Événements noyau inotify (Linux) sur les dossiers surveillés"""
+
+    def __init__(self):
+        self.inotify = INotify()
+        self.mask = (inotify_flags.CLOSE_WRITE | inotify_flags.MOVED_TO
+                     | inotify_flags.CREATE | inotify_flags.DELETE)
+        self.dirs = {}
+        self.watch_dir(DATA_DIR)
+        self.watch_dir(PAGES_DIR)
+        levels, _ = storage.load_sharding()
+        for depth in range(1, levels + 2):
+            for sub_dir in sorted(PAGES_DIR.glob('/'.join(['*'] * depth))):
+                if sub_dir.is_dir():
+                    self.watch_dir(sub_dir)
+        if STATIC_DIR.exists():
+            self.watch_dir(STATIC_DIR)
+            for sub_dir in STATIC_DIR.rglob('*'):
+                if sub_dir.is_dir():
+                    self.watch_dir(sub_dir)
+
+    def watch_dir(self, path):
+        wd = self.inotify.add_watch(str(path), self.mask)
+        self.dirs[wd] = Path(path)
+
+    def read(self, timeout):
+        changed = set()
+        for event in self.inotify.read(timeout=int(timeout * 1000)):
+            parent = self.dirs.get(event.wd)
+            if parent is None:
+                continue
+            path = parent / event.name
+            # Nouveau dossier de page ou sous-dossier de static/ : le surveiller aussi
+            if event.mask & inotify_flags.ISDIR:
+                if event.mask & (inotify_flags.CREATE | inotify_flags.MOVED_TO) and (
+                    is_page_tree_dir(path) or STATIC_DIR in path.parents
+                ):
+                    self.watch_dir(path)
+                continue
+            changed.add(path)
+        return changed
+
+def create_watcher(interval=POLL_INTERVAL):
+    if INotify is not None:
+        try:
+            return InotifyWatcher(), 'inotify'
+        except OSError as e:
+            print(f"⚠️ inotify indisponible ({e}), bascule en polling")
+    return PollingWatcher(interval), 'polling'
+
+
+# --- Reconstruction ---
+
+def classify(changed):
+    """Répartit les fichiers modifiés : (slugs, inventaire modifié, static modifié)"""
+    slugs = set()
+    inventory_changed = False
+    static_changed = False
+    for path in changed:
+        if path == INVENTORY_FILE:
+            inventory_changed = True
+        elif path.name in layouts.FILENAMES and storage.get_page_dir(path.parent.name) == path.parent:
+            slugs.add(path.parent.name)
+        elif STATIC_DIR in path.parents:
+            static_changed = True
+    return slugs, inventory_changed, static_changed
+
+class Rebuilder:
+    """Garde l'état précédent (inventaire, métadonnées) pour limiter les reconstructions"""
+
+    def __init__(self, export_dir=None):
+        from core import render
+        self.storage = storage
+        self.render = render
+        self.export_dir = export_dir
+        self.inventory = {p['slug']: p for p in storage.load_inventory()}
+        self.metadata = self._read_metadata()
+
+    def _read_metadata(self):
+        try:
+            return json_codec.load_file(DATA_DIR / 'pages-metadata.json')
+        except Exception:
+            return {}
+
+    def rebuild(self, changed):
+        """Reconstruit les sorties affectées, retourne un résumé"""
+        import generate_wiki_pages as wiki
+
+        storage = self.storage
+        slugs, inventory_changed, static_changed = classify(changed)
+        pages = set(slugs)
+        site = False
+
+        if CRITICAL_CSS_FILES & set(changed):
+            pages |= set(self.inventory)
+
+        if inventory_changed:
+            inventory = {p['slug']: p for p in storage.load_inventory()}
+            pages |= {
+                slug for slug in inventory.keys() | self.inventory.keys()
+                if inventory.get(slug) != self.inventory.get(slug)
+            }
+            self.inventory = inventory
+            site = True
+
+        if slugs or inventory_changed:
+            metadata = storage.generate_pages_metadata()
+            if metadata != self.metadata:
+                # Les métadonnées sont intégrées dans chaque page
+                pages |= set(metadata)
+                site = True
+            self.metadata = metadata
+
+        errors = []
+        built = 0
+        for slug in sorted(pages):
+            if slug not in self.inventory or not storage.get_layout_file(slug).exists():
+                continue
+            try:
+                self.render.generate_html(slug, storage.load_layout(slug))
+                built += 1
+            except Exception as e:
+                errors.append(f"{slug}: {e}")
+
+        if site:
+            wiki.generate_wiki_home()
+            wiki.generate_404_page()
+
+        exported = False
+        if self.export_dir and (built or site or static_changed):
+            import export
+            export.export_site(self.export_dir, incremental=True)
+            exported = True
+
+        return {
+            'pages': built,
+            'site': site,
+            'static': static_changed,
+            'exported': exported,
+            'errors': errors
+        }
+
+
+def format_status(summary, duration):
+    parts = []
+    if summary['pages']:
+        parts.append(f"{summary['pages']} page(s)")
+    if summary['site']:
+        parts.append("accueil + 404")
+    if summary['exported']:
+        parts.append("export")
+    if not parts:
+        parts.append("static/ modifié, rien à reconstruire" if summary['static'] else "rien à reconstruire")
+    status = f"⏱️ {datetime.now():%H:%M:%S} • {', '.join(parts)} en {duration * 1000:.0f} ms"
+    if summary['errors']:
+        status += f" • ❌ {len(summary['errors'])} erreur(s)"
+    return status
+
+
+def watch(export_dir=None, interval=POLL_INTERVAL, debounce=DEBOUNCE_DELAY):
+    """Boucle principale : accumule les changements puis reconstruit après le délai"""
+    watcher, mode = create_watcher(interval)
+    rebuilder = Rebuilder(export_dir)
+    print(f"👀 Surveillance active ({mode}) — Ctrl+C pour arrêter")
+
+    pending = set()
+    while True:
+        changed = watcher.read(debounce if pending else 1.0)
+        if changed:
+            pending |= changed
+            continue
+        if not pending:
+            continue
+
+        started = time.perf_counter()
+        # Les messages des générateurs sont masqués pour garder une ligne d'état lisible
+        with contextlib.redirect_stdout(io.StringIO()):
+            summary = rebuilder.rebuild(pending)
+        duration = time.perf_counter() - started
+        pending = set()
+
+        sys.stdout.write('\r\033[K' + format_status(summary, duration))
+        sys.stdout.flush()
+        for error in summary['errors']:
+            print(f"\n   ❌ {error}")
+
+
+def main(argv=None):
+    """Point d'entrée principal"""
+    parser = argparse.ArgumentParser(description="Reconstruction automatique du wiki")
+    parser.add_argument('--export', default=None, help="Maintenir aussi un export statique dans ce dossier")
+    parser.add_argument('--interval', type=float, default=POLL_INTERVAL, help="Intervalle du polling (secondes)")
+    args = parser.parse_args(argv)
+
+    try:
+        watch(export_dir=args.export, interval=args.interval)
+    except KeyboardInterrupt:
+        print("\n👋 Surveillance arrêtée")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
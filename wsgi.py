@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+"""
+wsgi.py - Point d'entrée WSGI de production
+
+Usage (plusieurs workers, sans collaboration temps réel) :
+    pip install gunicorn prometheus_client
+    gunicorn -c gunicorn.conf.py
+
+En mode collaboration (WIKI_COLLAB=1), gunicorn.conf.py sert asgi.py sur un seul worker.
+
+Le serveur de développement reste disponible : python app.py
+"""
+
+from app import create_app
+
+application = create_app()